@@ -1,22 +1,36 @@
+import errno
+import fcntl
+import json
 import os
 import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 raw_data_dir = "raw"
 energy_traces_dir = f"{raw_data_dir}/energy_traces"
 ebpf_traces_dir = f"{raw_data_dir}/ebpf_traces"
 output_dir = "grouped_experiments"
+manifest_path = os.path.join(output_dir, "manifest.json")
+max_workers = 8
+
+# ioctl request to clone a file (reflink) on copy-on-write filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+
+interval_re = re.compile(r"(\d+\.?\d*S)")
+size_re = re.compile(r"(\d+(?:[KMG]?B))", re.IGNORECASE)
+network_re = re.compile(r"(WIFI|LTE|ETH)", re.IGNORECASE)
+
 
 # --- Extract Parameters ---
 def extract_parameters(name):
     try:
-        interval = re.search(r"(\d+\.?\d*S)", name).group(1)
-        size_match = re.search(r"(\d+(?:[KMG]?B))", name, re.IGNORECASE)
+        interval = interval_re.search(name).group(1)
+        size_match = size_re.search(name)
         if not size_match:
             raise ValueError(f"Size not found in: {name}")
         size = size_match.group(1).upper()
-        network_match = re.search(r"(WIFI|LTE|ETH)", name, re.IGNORECASE)
+        network_match = network_re.search(name)
         if not network_match:
             raise ValueError(f"Network type not found in: {name}")
         network = network_match.group(1).upper()
@@ -25,72 +39,153 @@ def extract_parameters(name):
         print(f"Error parsing '{name}': {e}")
         return None
 
+
+# --- Link Files ---
+def link_file(src, dst):
+    """Place src at dst without copying data when possible: reflink, then hardlink, then copy."""
+    if os.path.exists(dst):
+        os.remove(dst)
+
+    # Reflink (independent copy sharing the same blocks)
+    try:
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        shutil.copystat(src, dst)
+        return "reflink"
+    except OSError as e:
+        if os.path.exists(dst):
+            os.remove(dst)
+        if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+            raise
+
+    # Hardlink (same file, same filesystem only)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def file_info(path):
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_organized(entry, files, group_dir):
+    """Check if a group is already organized from the same source files (by size and mtime)."""
+    if entry is None or set(entry["files"]) != set(files):
+        return False
+    for dst_name, src in files.items():
+        if entry["files"][dst_name] != file_info(src) or not os.path.exists(os.path.join(group_dir, dst_name)):
+            return False
+    return True
+
+
+# --- Organize Group ---
+def organize_group(params, otii_folder, ebpf_folder, entry):
+    interval, size, network = params
+    group_name = f"{interval}_{size}_{network}"
+    group_dir = os.path.join(output_dir, group_name)
+    messages = []
+
+    # Source file of each trace of the group
+    files = {}
+    src_power_csv = os.path.join(otii_folder, "Main power - Ace.csv")
+    if os.path.exists(src_power_csv):
+        files["power_trace.csv"] = src_power_csv
+    else:
+        messages.append(f"Warning: 'Main power - Ace.csv' not found in {otii_folder}")
+
+    src_gpi_csv = os.path.join(otii_folder, "GPI 1 - Ace.csv")
+    if os.path.exists(src_gpi_csv):
+        files["gpi_trace.csv"] = src_gpi_csv
+    else:
+        messages.append(f"Note: 'GPI 1 - Ace.csv' not found in {otii_folder}")
+
+    files["ebpf_trace.csv"] = os.path.join(ebpf_folder, "ebpf_trace.csv")
+
+    src_markers = os.path.join(ebpf_folder, "markers.json")
+    if os.path.exists(src_markers):
+        files["markers.json"] = src_markers
+    else:
+        messages.append(f"Note: markers.json not found for {group_name}")
+
+    if is_organized(entry, files, group_dir):
+        messages.append(f"Up to date: {group_name}")
+        return group_name, entry, messages
+
+    os.makedirs(group_dir, exist_ok=True)
+    methods = set()
+    for dst_name, src in files.items():
+        methods.add(link_file(src, os.path.join(group_dir, dst_name)))
+
+    messages.append(f"Organized: {group_name} ({', '.join(sorted(methods))})")
+    entry = {
+        "interval": interval,
+        "size": size,
+        "network": network,
+        "files": {dst_name: file_info(src) for dst_name, src in files.items()}
+    }
+
+    return group_name, entry, messages
+
+
 # --- Group Files ---
 energy_groups = {}
 ebpf_groups = {}
 
 # Populate energy_groups from folders inside energy_traces_dir
-for folder in os.listdir(energy_traces_dir):
-    params = extract_parameters(folder)
-    if params:
-        energy_groups[params] = folder
+with os.scandir(energy_traces_dir) as entries:
+    for folder in entries:
+        params = extract_parameters(folder.name)
+        if params:
+            energy_groups[params] = folder.path
 
 # Populate ebpf_groups from subfolders that contain ebpf_trace.csv
-for folder in os.listdir(ebpf_traces_dir):
-    folder_path = os.path.join(ebpf_traces_dir, folder)
-    if os.path.isdir(folder_path):
-        params = extract_parameters(folder)
-        if params:
-            ebpf_csv_path = os.path.join(folder_path, "ebpf_trace.csv")
-            if os.path.exists(ebpf_csv_path):
-                ebpf_groups[params] = folder_path  # Store the folder path now
-            else:
-                print(f"Warning: ebpf_trace.csv not found in {folder_path}")
+with os.scandir(ebpf_traces_dir) as entries:
+    for folder in entries:
+        if folder.is_dir():
+            params = extract_parameters(folder.name)
+            if params:
+                ebpf_csv_path = os.path.join(folder.path, "ebpf_trace.csv")
+                if os.path.exists(ebpf_csv_path):
+                    ebpf_groups[params] = folder.path  # Store the folder path now
+                else:
+                    print(f"Warning: ebpf_trace.csv not found in {folder.path}")
 
 # --- Organize Files ---
 os.makedirs(output_dir, exist_ok=True)
 
-for params in energy_groups:
-    if params in ebpf_groups:
-        interval, size, network = params
-        group_name = f"{interval}_{size}_{network}"
-        group_dir = os.path.join(output_dir, group_name)
-        os.makedirs(group_dir, exist_ok=True)
-
-        # === Copy Main power file ===
-        otii_folder = os.path.join(energy_traces_dir, energy_groups[params])
-        src_power_csv = os.path.join(otii_folder, "Main power - Ace.csv")
-        dst_power_csv = os.path.join(group_dir, "power_trace.csv")
+manifest = {}
+if os.path.exists(manifest_path):
+    with open(manifest_path) as f:
+        manifest = json.load(f)
 
-        if os.path.exists(src_power_csv):
-            shutil.copy(src_power_csv, dst_power_csv)
+with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    futures = []
+    for params in energy_groups:
+        if params in ebpf_groups:
+            group_name = "_".join(params)
+            futures.append(executor.submit(organize_group, params, energy_groups[params], ebpf_groups[params],
+                                           manifest.get(group_name)))
         else:
-            print(f"Warning: 'Main power - Ace.csv' not found in {otii_folder}")
+            print(f"Warning: No eBPF match for Otii experiment {params}")
 
-        # === Copy GPI trace if available ===
-        src_gpi_csv = os.path.join(otii_folder, "GPI 1 - Ace.csv")
-        dst_gpi_csv = os.path.join(group_dir, "gpi_trace.csv")
+    for future in futures:
+        try:
+            group_name, entry, messages = future.result()
+        except Exception as e:
+            print(f"Error organizing group: {e}")
+            continue
+        manifest[group_name] = entry
+        for message in messages:
+            print(message)
 
-        if os.path.exists(src_gpi_csv):
-            shutil.copy(src_gpi_csv, dst_gpi_csv)
-        else:
-            print(f"Note: 'GPI 1 - Ace.csv' not found in {otii_folder}")
-
-        # === Copy eBPF trace ===
-        src_ebpf = os.path.join(ebpf_groups[params], "ebpf_trace.csv")
-        dst_ebpf = os.path.join(group_dir, "ebpf_trace.csv")
-        shutil.copy(src_ebpf, dst_ebpf)
-
-        # === Copy markers.json if available ===
-        src_markers = os.path.join(ebpf_groups[params], "markers.json")
-        dst_markers = os.path.join(group_dir, "markers.json")
-        if os.path.exists(src_markers):
-            shutil.copy(src_markers, dst_markers)
-        else:
-            print(f"Note: markers.json not found for {group_name}")
-
-        print(f"Organized: {group_name}")
-    else:
-        print(f"Warning: No eBPF match for Otii experiment {params}")
+# Save manifest of organized groups (written last, groups are skipped only once fully organized)
+with open(manifest_path, "w") as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
 
 print(f"Done! Organized data saved to: {output_dir}")
@@ -13,7 +13,7 @@ for i = 1:num_experiments
        
     % --- Load and Trim GPI-based Power Trace ---
     gpi_file = fullfile(data_dir, experiments(i).name, 'gpi_trace.csv');
-    gpi_data = readtable(gpi_file); % Columns: Timestamp, Value
+    gpi_data = read_trace(gpi_file); % Columns: Timestamp, Value
     
     % Find first two rising edges (Value == 1)
     rising_edges = gpi_data.Timestamp(gpi_data.Value == 1);
@@ -25,7 +25,7 @@ for i = 1:num_experiments
     
     % Load full power trace
     power_file = fullfile(data_dir, experiments(i).name, 'power_trace.csv');
-    power_data = readtable(power_file);
+    power_data = read_trace(power_file);
     
     % Trim power trace to [start_time, end_time]
     in_range = power_data.Timestamp >= start_time & power_data.Timestamp <= end_time;
@@ -40,7 +40,7 @@ for i = 1:num_experiments
 
     % --- Load eBPF Network Data ---
     ebpf_file = fullfile(data_dir, experiments(i).name, 'ebpf_trace.csv');
-    ebpf_data = readtable(ebpf_file);
+    ebpf_data = read_trace(ebpf_file);
     ebpf_timestamps_ns = ebpf_data.Timestamp_ns_; % Nanoseconds
     packet_lengths = ebpf_data.PacketLength;
     iat_ns = ebpf_data.IAT_ns_;                % IAT in nanoseconds
@@ -142,6 +142,8 @@ aggregated_features = vertcat(all_features{:});
 %% Remove Rows with Any NaNs
 aggregated_features = rmmissing(aggregated_features);
 save(fullfile('results', 'aggregated_features.mat'), 'aggregated_features', 'experiment_settings');
+% Reference table for the Python feature extraction (python -m otii_automation.features compare)
+writetable(aggregated_features, fullfile('results', 'aggregated_features.csv'));
 %% Check Data Distrubtion
 figure;  
 histogram(aggregated_features.MeanPower);  
@@ -0,0 +1,44 @@
+%% Load Trained Model
+load(fullfile('results', 'trained_cnn_model.mat'));  % Loads net, mu, sigma, sequence_length, use_log_target
+
+%% Export Model for the On-Device Estimator
+% Same input features as in train_cnn_energy_model.m
+model.type = 'cnn';
+model.features = {'TXBytes', 'RXBytes', 'MeanIAT', 'TXRatio'};
+model.sequence_length = sequence_length;
+model.use_log_target = use_log_target;
+model.mu = export_array(mu);
+model.sigma = export_array(sigma);
+model.layers = {};
+
+for i = 1:numel(net.Layers)
+    layer = net.Layers(i);
+    if isa(layer, 'nnet.cnn.layer.Convolution1DLayer')
+        model.layers{end+1} = struct('type', 'conv1d', 'weights', export_array(layer.Weights), ...
+            'bias', export_array(layer.Bias), 'padding', layer.PaddingSize);
+    elseif isa(layer, 'nnet.cnn.layer.BatchNormalizationLayer')
+        model.layers{end+1} = struct('type', 'batchnorm', 'mean', export_array(layer.TrainedMean), ...
+            'variance', export_array(layer.TrainedVariance), 'offset', export_array(layer.Offset), ...
+            'scale', export_array(layer.Scale), 'epsilon', layer.Epsilon);
+    elseif isa(layer, 'nnet.cnn.layer.SigmoidLayer')
+        model.layers{end+1} = struct('type', 'sigmoid');
+    elseif isa(layer, 'nnet.cnn.layer.GlobalAveragePooling1DLayer')
+        model.layers{end+1} = struct('type', 'gap');
+    elseif isa(layer, 'nnet.cnn.layer.FullyConnectedLayer')
+        model.layers{end+1} = struct('type', 'fc', 'weights', export_array(layer.Weights), ...
+            'bias', export_array(layer.Bias));
+    elseif ~isa(layer, 'nnet.cnn.layer.SequenceInputLayer') && ~isa(layer, 'nnet.cnn.layer.RegressionOutputLayer')
+        error('Layer not supported by the on-device estimator: %s', class(layer));
+    end
+end
+
+%% Save Model
+fid = fopen(fullfile('results', 'cnn_model.json'), 'w');
+fprintf(fid, '%s', jsonencode(model));
+fclose(fid);
+
+%% Helper Functions
+% Arrays are exported with their size and values in column-major order
+function exported = export_array(values)
+    exported = struct('size', size(values), 'data', double(values(:))');
+end
@@ -0,0 +1,67 @@
+function data = read_trace(csv_file)
+% READ_TRACE Load a trace CSV as a table, memory-mapping its columnar copy (.col) when available.
+%   Columnar copies are created with: python -m otii_automation.trace <csv files>
+%   The returned table has the same variables readtable produces for the CSV.
+
+[folder, name, ~] = fileparts(csv_file);
+col_file = fullfile(folder, [name '.col']);
+if ~isfile(col_file)
+    data = readtable(csv_file);
+    return;
+end
+col_info = dir(col_file);
+csv_info = dir(csv_file);
+if ~isempty(csv_info) && col_info.datenum < csv_info.datenum
+    data = readtable(csv_file); % Columnar copy is out of date
+    return;
+end
+
+% --- Parse header (magic, version, header length, JSON header) ---
+fid = fopen(col_file, 'r', 'ieee-le');
+magic = fread(fid, 8, '*char')';
+if ~strcmp(magic, 'TRACECOL')
+    fclose(fid);
+    error('Invalid columnar trace: %s', col_file);
+end
+fread(fid, 1, 'uint32'); % Version
+header_len = fread(fid, 1, 'uint32');
+header = jsondecode(char(fread(fid, header_len, '*uint8')'));
+fclose(fid);
+
+% --- Map columns ---
+values = struct();
+for k = 1:numel(header.columns)
+    column = header.columns(k);
+    class_name = matlab_class(column.dtype);
+    if header.rows == 0
+        values.(column.name) = zeros(0, 1, class_name);
+    else
+        m = memmapfile(col_file, 'Offset', column.offset, ...
+            'Format', {class_name, [header.rows 1], 'x'}, 'Repeat', 1);
+        values.(column.name) = m.Data.x;
+    end
+end
+
+% --- Build table with readtable variable names ---
+if strcmp(header.meta.kind, 'ebpf')
+    direction = repmat("Incoming", header.rows, 1);
+    direction(values.direction == 1) = "Outgoing";
+    data = table(double(values.timestamp_ns), double(values.iat_ns), double(values.packet_length), direction, ...
+        'VariableNames', {'Timestamp_ns_', 'IAT_ns_', 'PacketLength', 'Direction'});
+else
+    data = table(double(values.timestamp_ns) / 1e9, double(values.value), ...
+        'VariableNames', {'Timestamp', 'Value'});
+end
+end
+
+function class_name = matlab_class(dtype)
+% MATLAB class of a numpy dtype name (integer names are the same)
+switch dtype
+    case 'float64'
+        class_name = 'double';
+    case 'float32'
+        class_name = 'single';
+    otherwise
+        class_name = dtype;
+end
+end
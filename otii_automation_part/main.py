@@ -9,6 +9,9 @@ def main():
         if mode == Mode.DEVICE:
             from otii_automation.device import device
             device()
+        elif mode == Mode.ESTIMATE:
+            from otii_automation.device import estimate
+            estimate(Environment.args.model, Environment.args.iface, Environment.args.bin_size)
         elif mode == Mode.CONTROLLER:
             from otii_automation.controller import controller
             controller()
@@ -0,0 +1,92 @@
+import asyncio
+
+from ..rdt.message import Message
+from .otii import SimpleOtii
+from .util import download_results, download_device_logs
+
+
+class AsyncRdt:
+    """ asyncio wrapper of an RDT (and its UDT): blocking calls run in a worker thread, one at a time """
+
+    def __init__(self, rdt):
+        self.rdt = rdt
+        self.lock = asyncio.Lock()
+
+    async def _call(self, function, *args, **kwargs):
+        async with self.lock:
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    async def send(self, code: Message, payload: dict = None, **kwargs) -> None:
+        await self._call(self.rdt.send, code, payload, **kwargs)
+
+    async def receive(self, timeout=None) -> [dict, float]:
+        return await self._call(self.rdt.receive, timeout)
+
+    async def udt_send(self, code: Message, payload: dict = None) -> None:
+        await self._call(self.rdt.udt_send, code, payload)
+
+
+class AsyncOtii:
+    """ asyncio wrapper of SimpleOtii
+
+    Requests to the Otii server and messages on the UART run in worker threads. Each channel serves one call at a
+    time, but the two are independent: e.g. energy statistics of a recording can be retrieved while waiting for
+    the device on the UART.
+    """
+
+    def __init__(self, otii: SimpleOtii):
+        self.otii = otii
+        self.rdt = AsyncRdt(otii.rdt)
+        self.lock = asyncio.Lock()
+
+    async def _call(self, function, *args, **kwargs):
+        async with self.lock:
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    async def create_project(self) -> None:
+        await self._call(self.otii.create_project)
+
+    async def save_project(self, path: str) -> None:
+        await self._call(self.otii.save_project, path)
+
+    async def start_recording(self) -> None:
+        await self._call(self.otii.start_recording)
+
+    async def stop_recording(self, trace_name: str):
+        return await self._call(self.otii.stop_recording, trace_name)
+
+    async def get_energy(self, start: float, stop: float, recording=None) -> dict:
+        return await self._call(self.otii.get_energy, start, stop, recording)
+
+    async def export_channels(self, recording, directory: str, trace: str) -> dict:
+        # Not holding the lock: the export serializes its own requests, other calls interleave with them
+        return await asyncio.to_thread(self.otii.export_channels, recording, directory, trace)
+
+    async def recent_current(self, window: float) -> [float, float]:
+        return await self._call(self.otii.recent_current, window)
+
+    async def reset(self, project_path: str) -> None:
+        await self._call(self.otii.reset, project_path)
+
+    def link_metrics(self) -> dict:
+        """ UART link counters since the previous call (None if disabled) """
+        return self.otii.link_metrics()
+
+    async def send(self, code: Message, payload: dict = None, **kwargs) -> None:
+        if kwargs.pop('udt', False) is True:
+            await self.rdt.udt_send(code, payload)
+        else:
+            # Options such as no_ack are not supported by all RDTs, as in SimpleOtii.send
+            await self.rdt.send(code, payload)
+
+    async def receive(self, timeout=None) -> [dict, float]:
+        return await self.rdt.receive(timeout)
+
+
+async def download_results_async(trace) -> dict:
+    """ Download results from server without blocking the event loop """
+    return await asyncio.to_thread(download_results, trace)
+
+
+async def download_device_logs_async() -> None:
+    await asyncio.to_thread(download_device_logs)
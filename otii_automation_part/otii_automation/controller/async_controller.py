@@ -0,0 +1,86 @@
+import asyncio
+import os
+import traceback
+
+from ..environment import Environment as Env
+from ..rdt import Message
+from ..rdt.exception import RdtException
+from .aio import AsyncOtii
+from .controller import initialize, run_config, post_process
+from .pipeline import PostProcessor
+from .results import ResultStore
+from .ssh import pool as ssh_pool
+from .util import logger
+
+
+async def async_controller() -> None:
+    """ Controller loop on asyncio, overlapping the post-processing of a configuration with the next one
+
+    Configurations run the steps of the synchronous controller (run_config, post_process) in worker threads:
+    post-processing, including the project save, runs on the same bounded PostProcessor.
+    """
+    try:
+        # Initialize components
+        simple_otii, experiment = await asyncio.to_thread(initialize)
+        otii = AsyncOtii(simple_otii)
+        store = ResultStore(os.path.join(Env.base_dir, 'results.db'))
+        processor = PostProcessor(Env.config['meta'].get('post_processing_queue', 4))
+        logger.info('Initialization completed')
+    except Exception as ex:
+        logger.error(f'Initialization failed: {ex}')
+        logger.error(traceback.format_exc())
+        return
+
+    logger.info(f'Running {len(experiment)} configurations')
+
+    try:
+        # Run all iterations
+        for it in range(0, Env.config['meta']['repetition']):
+            # Recordings being post-processed belong to the previous project
+            await asyncio.to_thread(processor.drain)
+            await otii.create_project()
+
+            # Run all configurations
+            for config in experiment.iteration(it):
+                completed = False
+                while completed is not True:
+                    try:
+                        results, recording = await asyncio.to_thread(run_config, simple_otii, config)
+
+                        # Blocks while the post-processing queue is full
+                        await asyncio.to_thread(processor.submit, results['trace_name'], post_process, simple_otii,
+                                                store, results, recording,
+                                                os.path.join(Env.otii_dir, f'Iteration_{Env.iteration}'))
+                        completed = True
+                    except Exception as ex:
+                        logger.error(f'Configuration failed: {ex}')
+                        logger.error(traceback.format_exc())
+
+                        if not isinstance(ex, RdtException):
+                            # Recordings being post-processed use the connection closed by reset
+                            await asyncio.to_thread(processor.drain)
+                            await asyncio.sleep(10)
+                            project_path = os.path.join(Env.otii_dir, f'Iteration_{it}') if (
+                                    (Env.trace_counter % len(experiment)) != 1) else None
+                            await otii.reset(project_path)
+
+                Env.trace_counter += 1
+
+            logger.info(f'Iteration {it} completed\n')
+            Env.iteration += 1
+
+        # End experiment
+        for _ in range(3):
+            await otii.send(Message.END_EXPERIMENT, no_ack=True)
+
+        logger.info('Experiment completed')
+    except Exception as ex:
+        logger.error(f'Experiment failed: {ex}')
+        logger.error(traceback.format_exc())
+    finally:
+        await asyncio.to_thread(processor.close)
+
+        # Legacy summary for existing tooling
+        store.export_all(Env.base_dir)
+        store.close()
+        ssh_pool.close()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import traceback
@@ -6,27 +7,27 @@ from time import sleep
 from ..environment import Environment as Env
 from ..rdt import Message
 from .experiment import Experiment
+from .idle import IdleDetector, idle_config, wait_idle
 from .otii import SimpleOtii
+from .pipeline import PostProcessor
+from .results import ResultStore
+from .ssh import pool as ssh_pool
 from .util import  logger, build_config_message, build_trace_name
 from ..rdt.exception import RdtException
 
 otii: SimpleOtii
+store: ResultStore
+processor: PostProcessor
 
 
-def launch_config(params: dict) -> bool:
-    trace = build_trace_name(params)
-
-    logger.info(f'Start configuration: {trace}')
+def wait_configuration(channel, trace: str, params: dict, recent_current=None) -> dict:
+    """ Wait for the device to complete a configuration, channel receives its messages (SimpleOtii, Rdt)
 
-    logger.info(f'Network constraints configured')
-
-    # Start trace recording on Otii
-    otii.start_recording()
-    logger.info(f'Recording started')
-
-    # Send configuration message to device via UART
-    otii.send(Message.START_CONFIG, build_config_message(params, trace))
-    logger.info(f'Configuration message sent')
+    With idle detection, recent_current(window) -> (end, average) reads the current of the device on the running
+    recording: the device is told when it is idle after the requests, instead of waiting a fixed time.
+    """
+    idle = None if recent_current is None else idle_config()
+    detector = None
 
     while True:
 
@@ -35,21 +36,30 @@ def launch_config(params: dict) -> bool:
             'energy': None,
             'device': None,
             'messages': [],
-            'config': params
+            'config': params,
+            'idle': None
         }
 
         # Wait for device to complete configuration
         while True:
-            message, timestamp = otii.receive(timeout=150)
+            message, timestamp = channel.receive(timeout=150)
             results['messages'].append({'timestamp': timestamp, 'message': message['code']})
 
             if message['code'] == Message.START_REQ.value:
                 results['req_start'] = timestamp
                 logger.info('Request start')
-                sleep(50)
+                if idle is None:
+                    sleep(50)
+                else:
+                    detector = IdleDetector(**idle)
+                    detector.set_baseline(recent_current(detector.window)[1])
             elif message['code'] == Message.STOP_REQ.value:
                 results['req_stop'] = timestamp
                 logger.info('Request stop')
+                if detector is not None:
+                    results['idle'] = wait_idle(detector, recent_current)
+                    channel.send(Message.IDLE)
+                    logger.info(f'Device idle: {results["idle"]}')
             elif message['code'] == Message.STOP_CONFIG.value:
                 break
             else:
@@ -58,52 +68,115 @@ def launch_config(params: dict) -> bool:
         if len(results['messages']) == 3:
             break
 
+    return results
+
+
+def run_config(otii: SimpleOtii, params: dict) -> [dict, any]:
+    """ Run a configuration on the device, return its results (without energy) and its recording """
+    trace = build_trace_name(params)
+
+    logger.info(f'Start configuration: {trace}')
+
+    logger.info(f'Network constraints configured')
+
+    # Start trace recording on Otii
+    otii.start_recording()
+    logger.info(f'Recording started')
+
+    # Send configuration message to device via UART
+    otii.send(Message.START_CONFIG, build_config_message(params, trace))
+    logger.info(f'Configuration message sent')
+
+    results = wait_configuration(otii, trace, params, otii.recent_current)
+
     # Stop trace recording on Otii
-    otii.stop_recording(trace)
+    recording = otii.stop_recording(trace)
     logger.info(f'Recording stopped')
 
-    # Retrieve energy results
-    results['energy'] = otii.get_energy(results['req_start'], results['req_stop'])
-    # Needed by legacy code
-    results['energy']['diff_t'] = results['req_stop'] - results['req_start']
-    results['energy']['diff_ej'] = results['energy'].pop('energy')
+    # UART link counters of the configuration
+    results['link'] = otii.link_metrics()
 
     # Dump observed messages
     if Env.config['meta']['experiment'] == 'aoi':
         observer.dump_observed(os.path.join(Env.base_dir, f'{trace}_observer.json'))
 
-    # Dump results
-    summary_path = os.path.join(Env.base_dir, 'summary.json')
-    summary = []
-    if os.path.exists(summary_path):
-        with open(summary_path, 'r') as fp:
-            summary = json.load(fp)
+    return results, recording
 
-    with open(summary_path, 'w') as fp:
-        summary.append(results)
-        json.dump(summary, fp, indent=2)
 
-    # Save Otii project
-    otii.save_project(os.path.join(Env.otii_dir, f'Iteration_{Env.iteration}'))
+def launch_config(params: dict) -> bool:
+    results, recording = run_config(otii, params)
 
-    logger.info(f'Configuration completed: {trace}')
+    # Energy, results and project save run in background, the next configuration can start
+    processor.submit(results['trace_name'], post_process, otii, store, results, recording,
+                     os.path.join(Env.otii_dir, f'Iteration_{Env.iteration}'))
 
     return True
 
 
+def post_process(otii: SimpleOtii, store: ResultStore, results: dict, recording, project_path: str) -> None:
+    """ Retrieve energy results and channel data of a completed configuration, store them and save the Otii project """
+    # Raw channel data, next to the results
+    results['channels'] = otii.export_channels(recording, Env.base_dir, results['trace_name'])
+
+    try:
+        results['energy'] = otii.get_energy(results['req_start'], results['req_stop'], recording)
+        # Needed by legacy code
+        results['energy']['diff_t'] = results['req_stop'] - results['req_start']
+        results['energy']['diff_ej'] = results['energy'].pop('energy')
+    finally:
+        # Store results (summary.json is exported at the end of the experiment), without energy if it failed
+        store.append(results)
+
+    # Save Otii project
+    otii.save_project(project_path)
+
+    logger.info(f'Configuration completed: {results["trace_name"]}')
+
+
+def initialize() -> [SimpleOtii, Experiment]:
+    """ Connect to Otii, build the experiment and dump its metadata """
+    simple_otii = SimpleOtii()
+    experiment = Experiment()
+    dump_meta(experiment)
+
+    return simple_otii, experiment
+
+
+def dump_meta(experiment: Experiment, **extra) -> None:
+    meta = Env.config['meta']
+    meta['seed'] = experiment.seed
+    # Configuration order of the even iterations (odd ones are reversed when scheduled)
+    meta['order'] = experiment.configs
+    if experiment.costs is not None:
+        meta['schedule'] = {'costs': experiment.costs, 'switching_time': experiment.switching_time()}
+    meta['config'] = Env.config['params']
+    meta['config'].update(Env.config['params'])
+    meta.update(extra)
+    with open(os.path.join(Env.base_dir, 'meta.json'), 'w') as fp:
+        json.dump(meta, fp, indent=1)
+
+
 def controller() -> None:
     global otii
     global observer
+    global store
+    global processor
+
+    if 'devices' in Env.config['otii']:
+        from .multi_controller import multi_controller
+        multi_controller()
+        return
+
+    if Env.config['meta'].get('async', False):
+        from .async_controller import async_controller
+        asyncio.run(async_controller())
+        return
+
     try:
         # Initialize components
-        otii = SimpleOtii()
-        experiment = Experiment()
-        meta = Env.config['meta']
-        meta['seed'] = experiment.seed
-        meta['config'] = Env.config['params']
-        meta['config'].update(Env.config['params'])
-        with open(os.path.join(Env.base_dir, 'meta.json'), 'w') as fp:
-            json.dump(meta, fp, indent=1)
+        otii, experiment = initialize()
+        store = ResultStore(os.path.join(Env.base_dir, 'results.db'))
+        processor = PostProcessor(Env.config['meta'].get('post_processing_queue', 4))
         logger.info('Initialization completed')
     except Exception as ex:
         logger.error(f'Initialization failed: {ex}')
@@ -115,10 +188,12 @@ def controller() -> None:
     try:
         # Run all iterations
         for it in range(0, Env.config['meta']['repetition']):
+            # Recordings being post-processed belong to the previous project
+            processor.drain()
             otii.create_project()
 
             # Run all configurations
-            for config in experiment:
+            for config in experiment.iteration(it):
                 completed = False
                 while completed is not True:
                     try:
@@ -128,6 +203,8 @@ def controller() -> None:
                         logger.error(traceback.format_exc())
 
                         if not isinstance(ex, RdtException):
+                            # Recordings being post-processed use the connection closed by reset
+                            processor.drain()
                             sleep(10)
                             project_path = os.path.join(Env.otii_dir, f'Iteration_{it}') if (
                                     (Env.trace_counter % len(experiment)) != 1) else None
@@ -147,3 +224,10 @@ def controller() -> None:
     except Exception as ex:
         logger.error(f'Experiment failed: {ex}')
         logger.error(traceback.format_exc())
+    finally:
+        processor.close()
+
+        # Legacy summary for existing tooling
+        store.export_all(Env.base_dir)
+        store.close()
+        ssh_pool.close()
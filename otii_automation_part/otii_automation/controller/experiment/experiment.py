@@ -1,13 +1,18 @@
 import itertools
+import logging
 import random
 import time
 
 from ...environment import Environment
+from .schedule import schedule, schedule_costs, sequence_cost
+
+logger = logging.getLogger('controller')
 
 
 class Experiment:
     def __init__(self):
-        self.seed = time.time_ns()
+        # Seed of the configuration order, [meta] seed to reproduce a campaign
+        self.seed = Environment.config['meta'].get('seed', time.time_ns())
         random.seed(self.seed)
         param_values = []
         param_names = []
@@ -17,7 +22,28 @@ class Experiment:
                 param_names.append(key)
 
         self.configs = [{k: v for k, v in zip(param_names, config)} for config in itertools.product(*param_values)]
-        random.shuffle(self.configs)
+
+        # Random order, or ordered by transition cost with [meta.schedule]
+        self.costs = schedule_costs(Environment.config['meta'])
+        if self.costs is None:
+            random.shuffle(self.configs)
+        else:
+            self.configs = schedule(self.configs, self.costs)
+            logger.info(f'Configurations scheduled, switching time per iteration: {self.switching_time():.0f} s')
+
+    def iteration(self, it: int) -> list:
+        """ Configurations of an iteration: scheduled iterations alternate direction, to continue from the last one """
+        if self.costs is not None and it % 2 == 1:
+            return self.configs[::-1]
+
+        return self.configs
+
+    def switching_time(self) -> float:
+        """ Estimated switching time of an iteration (transition costs, None if not scheduled) """
+        if self.costs is None:
+            return None
+
+        return sequence_cost(self.configs, self.costs)
 
     def __iter__(self):
         return iter(self.configs)
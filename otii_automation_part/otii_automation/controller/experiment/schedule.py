@@ -0,0 +1,87 @@
+import random
+
+# Switching time of a parameter change (seconds), overridden by the [meta.schedule] section. Changing the radio
+# generation re-initializes the module (config_radio_5G), bandwidth and delay reconfigure the server.
+DEFAULT_COSTS = {
+    'radio_generation': 18.0,
+    'bandwidth': 1.0,
+    'delay': 1.0
+}
+
+
+def schedule_costs(meta: dict) -> dict:
+    """ Transition costs of the [meta.schedule] section, None if disabled (no section or enabled = false) """
+    schedule = meta.get('schedule')
+    if schedule is None or not schedule.get('enabled', True):
+        return None
+
+    return dict(DEFAULT_COSTS, **{key: value for key, value in schedule.items() if key != 'enabled'})
+
+
+def transition_cost(previous: dict, config: dict, costs: dict) -> float:
+    """ Switching time from a configuration to the next one (None: first configuration) """
+    if previous is None:
+        return 0.0
+
+    return sum(costs.get(name, 0.0) for name, value in config.items() if previous.get(name) != value)
+
+
+def sequence_cost(configs: list, costs: dict, previous: dict = None) -> float:
+    cost = 0.0
+    for config in configs:
+        cost += transition_cost(previous, config, costs)
+        previous = config
+
+    return cost
+
+
+def _snake(blocks: list, names: list, orders: dict, reversed_levels: list, level: int = 0) -> list:
+    """ Blocks ordered by parameter, outer parameters first, each level alternating its direction (reflected
+    mixed-radix Gray code): consecutive blocks differ by a single parameter """
+    if level == len(names):
+        return blocks
+
+    name = names[level]
+    values = [value for value in orders[name] if any(block[0][name] == value for block in blocks)]
+    if reversed_levels[level]:
+        values.reverse()
+
+    ordered = []
+    for value in values:
+        ordered += _snake([block for block in blocks if block[0][name] == value], names, orders, reversed_levels,
+                          level + 1)
+    reversed_levels[level] = not reversed_levels[level]
+
+    return ordered
+
+
+def schedule(configs: list, costs: dict, rng: random.Random = random) -> list:
+    """ Order configurations to minimize the total switching time
+
+    Configurations with the same values of the costly parameters form a block, shuffled. Blocks are ordered with the
+    most costly parameter changing least often and one parameter changing between consecutive blocks; the order of
+    the values of each parameter is random.
+    """
+    if len(configs) == 0:
+        return []
+
+    names = sorted((name for name in configs[0] if costs.get(name, 0.0) > 0), key=lambda name: -costs[name])
+
+    blocks = {}
+    for config in configs:
+        blocks.setdefault(tuple(repr(config[name]) for name in names), []).append(config)
+    for block in blocks.values():
+        rng.shuffle(block)
+
+    orders = {}
+    for name in names:
+        values = []
+        for config in configs:
+            if config[name] not in values:
+                values.append(config[name])
+        rng.shuffle(values)
+        orders[name] = values
+
+    ordered = _snake(list(blocks.values()), names, orders, [False] * len(names))
+
+    return [config for block in ordered for config in block]
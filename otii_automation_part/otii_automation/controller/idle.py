@@ -0,0 +1,107 @@
+import time
+
+from ..environment import Environment as Env
+
+# Defaults of the [meta.idle] section
+DEFAULT_IDLE = {
+    # Idle current (A), None: average current of the window before the start request
+    'baseline': None,
+    # Length of the current averages (s), also the polling interval
+    'window': 0.5,
+    # Idle if the average current is at most baseline * (1 + threshold) + margin (A)
+    'threshold': 0.2,
+    'margin': 0.005,
+    # Time the current must stay idle (s)
+    'hold': 2.0,
+    # Upper bound of the wait after the stop request (s), the fixed wait of the device
+    'timeout': 25.0
+}
+
+
+def idle_config() -> dict:
+    """ Idle detection parameters, None if disabled (no [meta.idle] section, enabled = false or aoi experiment) """
+    idle = Env.config['meta'].get('idle')
+    if idle is None or not idle.get('enabled', True) or Env.config['meta']['experiment'] == 'aoi':
+        return None
+
+    return dict(DEFAULT_IDLE, **{key: value for key, value in idle.items() if key != 'enabled'})
+
+
+class IdleDetector:
+    """ Detection of the end of the radio tail on the current of the device
+
+    The baseline is the average current before the traffic starts (or a configured idle current). After the stop
+    request, the device is idle once the average current of each window stays close to the baseline for hold
+    seconds; the tail is the time from the stop request to the beginning of this idle period. Times are in the
+    recording time base.
+    """
+
+    def __init__(self, baseline: float = DEFAULT_IDLE['baseline'], window: float = DEFAULT_IDLE['window'],
+                 threshold: float = DEFAULT_IDLE['threshold'], margin: float = DEFAULT_IDLE['margin'],
+                 hold: float = DEFAULT_IDLE['hold'], timeout: float = DEFAULT_IDLE['timeout']):
+        self.baseline = baseline
+        self.window = window
+        self.threshold = threshold
+        self.margin = margin
+        self.hold = hold
+        self.timeout = timeout
+
+        self.stop = None
+        self.idle_since = None
+        self.end = None
+        self.tail = None
+
+    def set_baseline(self, average: float) -> None:
+        """ Average current before the traffic, unless configured """
+        if self.baseline is None:
+            self.baseline = average
+
+    def start(self, stop: float) -> None:
+        """ Start waiting for idle, stop is the time of the stop request """
+        self.stop = stop
+        self.idle_since = None
+        self.end = stop
+        self.tail = None
+
+    def limit(self) -> float:
+        return self.baseline * (1 + self.threshold) + self.margin
+
+    def update(self, end: float, average: float) -> bool:
+        """ Process the average current of the window ending at end, return True when the wait is over """
+        self.end = end
+        if self.baseline is not None and average <= self.limit():
+            if self.idle_since is None:
+                self.idle_since = max(end - self.window, self.stop)
+        else:
+            self.idle_since = None
+
+        if self.idle_since is not None and end - self.idle_since >= self.hold:
+            self.tail = self.idle_since - self.stop
+            return True
+
+        return end - self.stop >= self.timeout
+
+    def result(self) -> dict:
+        return {
+            'baseline': self.baseline,
+            'limit': None if self.baseline is None else self.limit(),
+            'tail': self.tail,
+            'waited': None if self.stop is None else self.end - self.stop,
+            'timeout': self.tail is None
+        }
+
+
+def wait_idle(detector: IdleDetector, recent_current) -> dict:
+    """ Poll recent_current(window) -> (end, average) until the device is idle, return the detection results """
+    end, _ = recent_current(detector.window)
+    detector.start(end)
+
+    # Bound in wall time too, in case the recording stalls
+    deadline = time.time() + detector.timeout + detector.window
+    while time.time() < deadline:
+        time.sleep(detector.window)
+        end, average = recent_current(detector.window)
+        if detector.update(end, average):
+            break
+
+    return detector.result()
@@ -0,0 +1,166 @@
+import os
+import threading
+import traceback
+
+from ..environment import Environment as Env
+from ..rdt import Message
+from ..rdt.exception import RdtException
+from .controller import wait_configuration, dump_meta
+from .experiment import Experiment
+from .otii import OtiiGroup
+from .otii.simple_otii import build_rdt
+from .results import ResultStore
+from .ssh import pool as ssh_pool
+from .util import logger, build_config_message, build_trace_name
+
+
+def device_configs() -> list:
+    """ Devices of the [otii] section: name, Otii server, Arc (None: any discovered one) and UART port """
+    devices = []
+    for i, device in enumerate(Env.config['otii']['devices']):
+        devices.append({
+            'name': device.get('name', device.get('arc', f'device_{i}')),
+            'hostname': device.get('hostname', Env.config['otii']['hostname']),
+            'port': device.get('port', Env.config['otii']['port']),
+            'arc': device.get('arc'),
+            'uart': device['uart']
+        })
+
+    return devices
+
+
+def pair_devices(devices: list, rounds_per_project: int) -> dict:
+    """ Connect to the Otii servers and pair each device with an Arc, return the groups by server """
+    groups = {}
+    for device in devices:
+        server = (device['hostname'], device['port'])
+        if server not in groups:
+            project_dir = Env.otii_dir if len(groups) == 0 else os.path.join(Env.otii_dir, f'{server[0]}_{server[1]}')
+            groups[server] = OtiiGroup(server[0], server[1], project_dir, rounds_per_project)
+            groups[server].discover()
+
+    # Devices without Arc get the discovered ones not claimed by others, by name
+    for server, group in groups.items():
+        claimed = {device['arc'] for device in devices if (device['hostname'], device['port']) == server}
+        free = sorted(name for name in group.arcs if name not in claimed)
+        for device in devices:
+            if (device['hostname'], device['port']) != server:
+                continue
+            if device['arc'] is None:
+                if len(free) == 0:
+                    raise Exception(f'No Arc left on {server[0]} for {device["name"]}')
+                device['arc'] = free.pop(0)
+            elif device['arc'] not in group.arcs:
+                raise Exception(f'Device {device["arc"]} not found on {server[0]}')
+
+            group.join(device['arc'])
+            logger.info(f'{device["name"]}: Arc {device["arc"]} on {server[0]}, UART {device["uart"]}')
+
+    return groups
+
+
+def device_worker(group: OtiiGroup, device: dict, rdt, queue: list, store: ResultStore) -> None:
+    """ Run the configurations of a device, one per round of its Otii group """
+    name = device['name']
+    try:
+        for counter, (iteration, params) in enumerate(queue, start=1):
+            completed = False
+            while completed is not True:
+                trace = f'{name}_{build_trace_name(params, counter, iteration)}'
+
+                group.start_round()
+                logger.info(f'Start configuration: {trace}')
+
+                results = None
+                reset = False
+                try:
+                    rdt.send(Message.START_CONFIG, build_config_message(params, trace))
+                    results = wait_configuration(rdt, trace, params,
+                                                 lambda window: group.recent_current(device['arc'], window))
+                except Exception as ex:
+                    logger.error(f'Configuration failed: {trace}: {ex}')
+                    logger.error(traceback.format_exc())
+                    reset = not isinstance(ex, RdtException)
+
+                if results is None:
+                    group.end_round(device['arc'], reset=reset)
+                    continue
+
+                energy = group.end_round(device['arc'], trace, results['req_start'], results['req_stop'])
+
+                # Needed by legacy code
+                results['energy'] = energy
+                results['energy']['diff_t'] = results['req_stop'] - results['req_start']
+                results['energy']['diff_ej'] = results['energy'].pop('energy')
+                results['link'] = None if rdt.metrics is None else rdt.metrics.snapshot(reset=True)
+
+                store.append(results, name)
+                logger.info(f'Configuration completed: {trace}')
+                completed = True
+
+        # End experiment
+        for _ in range(3):
+            rdt.send(Message.END_EXPERIMENT)
+
+        logger.info(f'{name}: experiment completed')
+    except Exception as ex:
+        logger.error(f'{name}: experiment failed: {ex}')
+        logger.error(traceback.format_exc())
+    finally:
+        group.leave()
+
+
+def multi_controller() -> None:
+    """ Controller driving several devices concurrently, each paired with an Arc and a UART
+
+    The configurations of all iterations are split among the devices, each device runs its queue in its own worker.
+    """
+    try:
+        # Initialize components
+        experiment = Experiment()
+        devices = device_configs()
+        rounds_per_project = max(len(experiment) // len(devices), 1)
+        groups = pair_devices(devices, rounds_per_project)
+        channels = {device['name']: build_rdt(device['uart']) for device in devices}
+        for device in devices:
+            os.makedirs(os.path.join(Env.base_dir, device['name']), exist_ok=True)
+
+        dump_meta(experiment, devices=devices)
+        logger.info('Initialization completed')
+    except Exception as ex:
+        logger.error(f'Initialization failed: {ex}')
+        logger.error(traceback.format_exc())
+        return
+
+    # Configurations of all iterations, split among the devices in contiguous parts (keeping the scheduled order)
+    campaign = [(it, config) for it in range(0, Env.config['meta']['repetition'])
+                for config in experiment.iteration(it)]
+    parts = [campaign[i * len(campaign) // len(devices):(i + 1) * len(campaign) // len(devices)]
+             for i in range(len(devices))]
+    logger.info(f'Running {len(campaign)} configurations on {len(devices)} devices')
+
+    store = ResultStore(os.path.join(Env.base_dir, 'results.db'))
+    workers = []
+    for i, device in enumerate(devices):
+        group = groups[(device['hostname'], device['port'])]
+        worker = threading.Thread(
+            target=device_worker,
+            args=(group, device, channels[device['name']], parts[i], store),
+            name=device['name']
+        )
+        workers.append(worker)
+
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    for group in groups.values():
+        group.close()
+
+    # Legacy summaries for existing tooling, of all devices and of each one
+    store.export_all(Env.base_dir)
+    store.close()
+    ssh_pool.close()
+
+    logger.info('Experiment completed')
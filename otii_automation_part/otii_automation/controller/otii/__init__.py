@@ -1 +1,2 @@
 from .simple_otii import SimpleOtii
+from .otii_group import OtiiGroup
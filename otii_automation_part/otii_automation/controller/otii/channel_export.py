@@ -0,0 +1,99 @@
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from otii_tcp_client.arc import Arc
+from otii_tcp_client.recording import Recording
+
+from ...environment import Environment as Env
+from ...trace.chunked import ChunkedColumnWriter, EXTENSION
+
+logger = logging.getLogger('otii')
+
+# Channels exported by default, when recorded: main current and voltage, GPI 1, UART
+EXPORT_CHANNELS = ('mc', 'mv', 'i1', 'rx')
+
+# Samples fetched per request (the server page size)
+EXPORT_CHUNK = 40000
+
+# Value type of each channel (as the Otii CSV conversion, see trace.convert)
+CHANNEL_DTYPES = {
+    'mc': np.float64,
+    'mv': np.float64,
+    'i1': np.uint8,
+    'rx': None
+}
+
+
+def exported_channels(recorded: list) -> list:
+    """ Channels to export after each configuration ([otii] export: true, false or list), among the recorded ones """
+    export = Env.config['otii'].get('export', True)
+    if export is True:
+        return [channel for channel in EXPORT_CHANNELS if channel in recorded]
+    if export is False:
+        return []
+
+    return list(export)
+
+
+def channel_columns(channel: str, data: dict) -> dict:
+    """ Columns of a page of channel data: timestamp_ns and value """
+    if 'interval' in data:
+        # Analog channel: first timestamp, sample interval and values
+        values = np.asarray(data['values'], dtype=CHANNEL_DTYPES.get(channel) or np.float64)
+        timestamps = data['timestamp'] + np.arange(len(values)) * data['interval']
+    else:
+        # Digital and log channels: timestamped values
+        timestamps = np.fromiter((value['timestamp'] for value in data['values']), dtype=np.float64)
+        if channel == 'rx':
+            values = np.array([value['value'].encode('utf-8') for value in data['values']], dtype=np.bytes_)
+        else:
+            values = np.fromiter((value['value'] for value in data['values']),
+                                 dtype=CHANNEL_DTYPES.get(channel) or np.float64)
+
+    return {'timestamp_ns': np.rint(timestamps * 1e9).astype(np.int64), 'value': values}
+
+
+def export_channel(recording: Recording, arc: Arc, channel: str, path: str, lock, chunk: int = EXPORT_CHUNK) -> int:
+    """ Stream a channel of a recording to a chunked columnar file, one page at a time, return the samples """
+    with lock:
+        count = recording.get_channel_data_count(arc.id, channel)
+
+    meta = {'kind': 'otii', 'channel': channel, 'device': arc.name, 'recording': recording.name}
+    with ChunkedColumnWriter(path, meta) as writer:
+        for index in range(0, count, chunk):
+            with lock:
+                data = recording.get_channel_data(arc.id, channel, index, min(chunk, count - index))
+            if len(data['values']) > 0:
+                writer.write_chunk(channel_columns(channel, data))
+
+    return count
+
+
+def export_recording(recording: Recording, arc: Arc, channels: list, directory: str, trace: str, lock) -> dict:
+    """ Export channels of a recording to <directory>/<trace>_<channel>.colz, return the files (None if failed)
+
+    Channels are exported by concurrent workers: the requests share the server connection (serialized by lock),
+    while decoding, compression and writes of the other channels overlap them.
+    """
+    def export(channel: str) -> str:
+        path = os.path.join(directory, f'{trace}_{channel}{EXTENSION}')
+        start = time.perf_counter()
+        try:
+            count = export_channel(recording, arc, channel, path, lock)
+            elapsed = time.perf_counter() - start
+            logger.info(f'Channel {channel} of {trace} exported: {count} samples in {elapsed:.2f} s')
+            return path
+        except Exception as ex:
+            logger.warning(f'Export of channel {channel} of {trace} failed: {ex}')
+            logger.error(traceback.format_exc())
+            return None
+
+    if len(channels) == 0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(channels), thread_name_prefix='export') as executor:
+        return dict(zip(channels, executor.map(export, channels)))
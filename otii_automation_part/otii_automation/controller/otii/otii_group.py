@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import traceback
+
+from otii_tcp_client.otii import Otii
+from otii_tcp_client.otii_connection import OtiiConnection
+from otii_tcp_client.arc import Arc
+from otii_tcp_client.recording import Recording
+from otii_tcp_client.project import Project
+
+from .simple_otii import configure_arc, login, recent_current
+
+logger = logging.getLogger('otii')
+
+
+class OtiiGroup:
+    """ Arcs connected to one Otii server, driven by concurrent workers (one per Arc)
+
+    An Otii project records all its Arcs at once, so workers run in rounds: the recording starts when all active
+    workers are ready (start_round) and stops when all of them completed their configuration (end_round).
+    Every rounds_per_project rounds a new project is created. Requests to the server are serialized.
+    """
+
+    def __init__(self, hostname: str, port: int, project_dir: str, rounds_per_project: int):
+        self.hostname = hostname
+        self.port = port
+        self.project_dir = project_dir
+        self.rounds_per_project = rounds_per_project
+
+        self.lock = threading.RLock()
+        self.otii: Otii = None
+        self.project: Project = None
+        self.arcs: dict = {}
+        self.used = []
+        self._connect(try_for_seconds=3)
+
+        # Rounds
+        self.condition = threading.Condition()
+        self.workers = 0
+        self.arrived = []
+        self.action = None
+        self.generation = 0
+        self.result = None
+        self.round = 0
+
+    def _connect(self, try_for_seconds: int) -> None:
+        connection = OtiiConnection(self.hostname, self.port)
+        connection.connect_to_server(try_for_seconds=try_for_seconds)
+        self.otii = Otii(connection)
+        login(self.otii)
+
+    def discover(self) -> list:
+        """ Names of the Arcs connected to the server """
+        with self.lock:
+            devices: list[Arc] = self.otii.get_devices()
+            for device in devices:
+                logger.info(f'Device found on {self.hostname}: {device.name}')
+
+            self.arcs = {device.name: device for device in devices}
+
+        return list(self.arcs)
+
+    def _init_devices(self) -> None:
+        """ Configure the Arcs of the workers after opening a project """
+        self.discover()
+        for name in self.used:
+            if name not in self.arcs:
+                raise Exception(f'Device {name} not found')
+            configure_arc(self.otii, self.arcs[name])
+
+    def _project_path(self) -> str:
+        return os.path.join(self.project_dir, f'Iteration_{self.round // self.rounds_per_project}')
+
+    def join(self, name: str) -> None:
+        """ Register the worker of an Arc, before the first round """
+        with self.condition:
+            self.workers += 1
+            self.used.append(name)
+
+    def leave(self) -> None:
+        """ Unregister a worker, the following rounds go on without it """
+        with self.condition:
+            self.workers -= 1
+            if self.arrived and len(self.arrived) >= self.workers:
+                self._complete()
+
+    def _complete(self) -> None:
+        """ Run the action of the last worker reaching the barrier and release the others """
+        try:
+            self.result = self.action(self.arrived)
+        except Exception as ex:
+            logger.error(f'Round action failed on {self.hostname}: {ex}')
+            logger.error(traceback.format_exc())
+            self.result = ex
+
+        self.arrived = []
+        self.action = None
+        self.generation += 1
+        self.condition.notify_all()
+
+    def _barrier(self, action, value=None):
+        """ Wait for all workers, the last one runs action on the values passed by the workers """
+        with self.condition:
+            generation = self.generation
+            self.action = action
+            self.arrived.append(value)
+            if len(self.arrived) >= self.workers:
+                self._complete()
+            else:
+                while generation == self.generation:
+                    self.condition.wait()
+
+            if isinstance(self.result, Exception):
+                raise self.result
+
+            return self.result
+
+    def _start(self, _) -> None:
+        with self.lock:
+            if self.round % self.rounds_per_project == 0 or self.project is None:
+                self.project: Project = self.otii.create_project()
+                self._init_devices()
+
+            self.project.start_recording()
+            logger.info(f'Round {self.round} recording started on {self.hostname}')
+
+    def _end(self, values: list) -> dict:
+        traces = [value['trace'] for value in values if value['trace'] is not None]
+        energy = {}
+
+        with self.lock:
+            self.project.stop_recording()
+            recording: Recording = self.project.get_last_recording()
+            recording.rename('+'.join(traces) if traces else f'failed_round_{self.round}')
+            logger.info(f'Round {self.round} recording stopped on {self.hostname}')
+
+            # Energy of each completed configuration, on its Arc
+            for value in values:
+                if value['trace'] is not None:
+                    arc = self.arcs[value['name']]
+                    energy[value['name']] = recording.get_channel_statistics(arc.id, 'mc', value['start'],
+                                                                             value['stop'])
+
+            self.project.save_as(os.path.join(os.getcwd(), self._project_path()), force=True)
+
+            if any(value['reset'] for value in values):
+                self._reset()
+
+        self.round += 1
+
+        return energy
+
+    def start_round(self) -> None:
+        """ Wait for the other workers and start the recording """
+        self._barrier(self._start)
+
+    def end_round(self, name: str, trace: str = None, start: float = None, stop: float = None,
+                  reset: bool = False) -> dict:
+        """ Wait for the other workers, stop the recording and return the energy between start and stop on the Arc
+
+        trace is None if the configuration failed (energy is None). With reset, the server connection is reset after
+        the recording, as SimpleOtii.reset does.
+        """
+        energy = self._barrier(self._end, {'name': name, 'trace': trace, 'start': start, 'stop': stop,
+                                           'reset': reset})
+
+        return energy.get(name)
+
+    def recent_current(self, name: str, window: float) -> [float, float]:
+        """ End and average current of the last window seconds of the running recording on the Arc """
+        with self.lock:
+            return recent_current(self.project.get_last_recording(), self.arcs[name], window)
+
+    def _reset(self) -> None:
+        try:
+            self.project.close()
+            self.otii.connection.close_connection()
+        except Exception as ex:
+            logger.warning(f'Failed to release resources during reset: {ex}')
+            logger.error(traceback.format_exc())
+
+        self._connect(try_for_seconds=10)
+        self.project: Project = self.otii.open_project(os.path.join(os.getcwd(), self._project_path()))
+        self._init_devices()
+
+    def close(self) -> None:
+        try:
+            self.otii.connection.close_connection()
+            logger.info(f'Disconnected from Otii server {self.hostname}')
+        except Exception as ex:
+            logger.warning(f'Failed to release resources: {ex}')
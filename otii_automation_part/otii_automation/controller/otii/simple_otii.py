@@ -1,5 +1,7 @@
 import logging
+import math
 import os
+import threading
 import time
 import traceback
 
@@ -9,50 +11,207 @@ from otii_tcp_client.arc import Arc
 from otii_tcp_client.recording import Recording
 from otii_tcp_client.project import Project
 
-from ...rdt import Rdt
+from ...rdt import Rdt, BinaryRdt, WindowRdt, LinkMetrics
 from ...rdt.message import Message
-from ...rdt.udt.uart_otii import UdtUartOtii
 from ...environment import Environment as Env
 from ...rdt.udt.uart_serial import UdtUartSerial
+from .channel_export import exported_channels, export_recording
 
 logger = logging.getLogger('otii')
 
 
+def build_rdt(port: str) -> Rdt:
+    """ RDT over the UART of a device, as configured in the [otii] section """
+    # Frame encoding: JSON (default) or binary
+    framing = Env.config['otii'].get('framing', 'json')
+
+    def build_framing(udt):
+        return Rdt(udt) if framing == 'json' else BinaryRdt(udt, framing)
+
+    rdt: Rdt = build_framing(None)
+    if Env.config['otii'].get('rdt') == 'window':
+        rdt = WindowRdt(None, Env.config['otii'].get('rdt_window', 8), build_framing)
+    rdt.udt = UdtUartSerial(port)
+
+    # UART link counters, attached to the results of each configuration
+    if Env.config['otii'].get('rdt_metrics', False):
+        rdt.metrics = LinkMetrics()
+
+    # Windowed RDT if the device supports it
+    if isinstance(rdt, WindowRdt):
+        rdt.negotiate()
+
+    return rdt
+
+
+# Desired Arc state, overridden by the [otii.profile] section (baudrate defaults to the [otii] one)
+DEFAULT_PROFILE = {
+    'range': 'high',
+    'main_voltage': 5,
+    'exp_voltage': 3.3,
+    'max_current': 4.5,
+    'channels': ['mc', 'mv', 'i1'],
+    'main': True,
+    # Settling time after a change of the power supplied to the device (s)
+    'settle': 0.5
+}
+
+# Longest wait for the login after a reconnection (s)
+LOGIN_TIMEOUT = 10
+
+
+def login(otii: Otii, timeout: float = LOGIN_TIMEOUT) -> None:
+    """ Log in, retrying with an increasing delay while the server is not ready """
+    deadline = time.time() + timeout
+    delay = 0.1
+    while True:
+        try:
+            otii.login(Env.config['otii']['license_user'], Env.config['otii']['license_psw'])
+            return
+        except Exception as ex:
+            if time.time() + delay > deadline:
+                raise ex
+            logger.debug(f'Login failed, retrying in {delay:.1f} s: {ex}')
+            time.sleep(delay)
+            delay *= 2
+
+
+def recent_current(recording: Recording, arc: Arc, window: float) -> [float, float]:
+    """ End (recording time) and average current of the last window seconds of a recording on the Arc """
+    end = recording.get_channel_info(arc.id, 'mc')['to']
+    statistics = recording.get_channel_statistics(arc.id, 'mc', max(end - window, 0), end)
+
+    return end, statistics['average']
+
+
+def arc_profile() -> dict:
+    profile = dict(DEFAULT_PROFILE, baudrate=Env.config['otii']['baudrate'])
+    profile.update(Env.config['otii'].get('profile', {}))
+
+    return profile
+
+
+def _arc_steps(otii: Otii, arc: Arc, profile: dict) -> list:
+    """ Settings in application order: name, desired value, getter (None if not readable), setter, settling time """
+    settle = profile['settle']
+    steps = [
+        ('range', profile['range'], arc.get_range, arc.set_range, 0.0),
+        ('main_voltage', profile['main_voltage'], arc.get_main_voltage, arc.set_main_voltage, settle),
+        ('exp_voltage', profile['exp_voltage'], arc.get_exp_voltage, arc.set_exp_voltage, settle),
+        ('max_current', profile['max_current'], arc.get_max_current, arc.set_max_current, 0.0)
+    ]
+    for channel in profile['channels']:
+        steps.append((f'channel {channel}', True, None, lambda enable, c=channel: arc.enable_channel(c, enable), 0.0))
+    steps += [
+        # Main power of all devices
+        ('main', profile['main'], arc.get_main, otii.set_all_main, settle),
+        ('expansion port', True, None, arc.enable_exp_port, 0.0),
+        ('uart', True, None, arc.enable_uart, 0.0),
+        ('baudrate', profile['baudrate'], arc.get_uart_baudrate, arc.set_uart_baudrate, 0.0),
+        ('channel rx', True, None, lambda enable: arc.enable_channel('rx', enable), 0.0),
+        ('tx', True, None, arc.set_tx, 0.0)
+    ]
+
+    return steps
+
+
+def _same(actual, value) -> bool:
+    if isinstance(value, bool) or isinstance(value, str):
+        return actual == value
+
+    return math.isclose(actual, value, rel_tol=1e-3, abs_tol=1e-3)
+
+
+def configure_arc(otii: Otii, arc: Arc, profile: dict = None) -> None:
+    """ Apply the profile to an Arc
+
+    Readable settings are skipped if already in the desired state and verified after a change, settings that cannot
+    be read are always applied. Only changes of the power supplied to the device wait for settling.
+    """
+    profile = arc_profile() if profile is None else profile
+    start = time.perf_counter()
+    changed = 0
+
+    for name, value, getter, setter, settle in _arc_steps(otii, arc, profile):
+        step_start = time.perf_counter()
+        if getter is not None and _same(getter(), value):
+            logger.debug(f'{arc.name} {name}: {value} already set ({(time.perf_counter() - step_start) * 1e3:.0f} ms)')
+            continue
+
+        setter(value)
+        if getter is not None:
+            actual = getter()
+            if not _same(actual, value):
+                raise Exception(f'{arc.name} {name} is {actual} instead of {value}')
+            if settle > 0:
+                time.sleep(settle)
+        changed += 1
+
+        logger.debug(f'{arc.name} {name}: set to {value} ({(time.perf_counter() - step_start) * 1e3:.0f} ms)')
+
+    logger.info(f'{arc.name} configured in {time.perf_counter() - start:.2f} s ({changed} settings applied)')
+
+
 class SimpleOtii:
+    """ Otii server and UART of the device
+
+    Requests to the Otii server are serialized, so that a post-processing thread can use them while the main loop
+    runs the next configuration. The UART is not shared.
+    """
+
     def __init__(self):
+        self.lock = threading.RLock()
 
         # Connect to Otii Server
         connection = OtiiConnection(Env.config['otii']['hostname'], Env.config['otii']['port'])
         connection.connect_to_server(try_for_seconds=3)
 
         self.otii = Otii(connection)
-        self.otii.login(Env.config['otii']['license_user'], Env.config['otii']['license_psw'])
+        login(self.otii)
         self.project: Project = None
         self.arc: Arc = None
-        self.rdt: Rdt = Rdt(None)
-        self.rdt.udt = UdtUartSerial('COM5')
+        self.rdt = build_rdt(Env.config['otii'].get('uart', 'COM5'))
 
     def create_project(self) -> None:
         """ Create a new project """
-        self.project: Project = self.otii.create_project()
-        self._init_device()
+        with self.lock:
+            self.project: Project = self.otii.create_project()
+            self._init_device()
 
     def save_project(self, path: str) -> None:
-        self.project.save_as(os.path.join(os.getcwd(), path), force=True)
+        with self.lock:
+            self.project.save_as(os.path.join(os.getcwd(), path), force=True)
 
     def start_recording(self) -> None:
-        self.project.start_recording()
+        with self.lock:
+            self.project.start_recording()
+
+    def stop_recording(self, trace_name: str) -> Recording:
+        with self.lock:
+            self.project.stop_recording()
+            recording: Recording = self.project.get_last_recording()
+            recording.rename(trace_name)
 
-    def stop_recording(self, trace_name: str) -> None:
-        self.project.stop_recording()
-        recording: Recording = self.project.get_last_recording()
-        recording.rename(trace_name)
+        return recording
 
-    def get_energy(self, start: float, stop: float) -> dict:
-        """ Retrieve energy required by current configuration """
-        recording: Recording = self.project.get_last_recording()
+    def get_energy(self, start: float, stop: float, recording: Recording = None) -> dict:
+        """ Retrieve energy required by current configuration (or by the given recording) """
+        with self.lock:
+            if recording is None:
+                recording: Recording = self.project.get_last_recording()
 
-        return recording.get_channel_statistics(self.arc.id, 'mc', start, stop)
+            return recording.get_channel_statistics(self.arc.id, 'mc', start, stop)
+
+    def recent_current(self, window: float) -> [float, float]:
+        """ End (recording time) and average current of the last window seconds of the running recording """
+        with self.lock:
+            return recent_current(self.project.get_last_recording(), self.arc, window)
+
+    def export_channels(self, recording: Recording, directory: str, trace: str) -> dict:
+        """ Export the raw channel data of a recording to chunked columnar files, return them by channel """
+        channels = exported_channels(arc_profile()['channels'] + ['rx'])
+
+        return export_recording(recording, self.arc, channels, directory, trace, self.lock)
 
     def send(self, code: Message, payload: dict = None, **kwargs) -> None:
         """ Send message on uart channel """
@@ -66,10 +225,25 @@ class SimpleOtii:
         """ Receive message from uart channel """
         return self.rdt.receive(timeout)
 
+    def link_metrics(self) -> dict:
+        """ UART link counters since the previous call (None if disabled) """
+        if self.rdt.metrics is None:
+            return None
+
+        return self.rdt.metrics.snapshot(reset=True)
+
     def reset(self, project_path: str) -> None:
-        """ Reset Otii device """
+        """ Reset Otii device
+
+        The project still open on the server is kept (a recording left running is stopped and renamed failed),
+        it is reopened from project_path (or a new one is created if None) only if the server lost it.
+        """
+        with self.lock:
+            self._reset(project_path)
+
+    def _reset(self, project_path: str) -> None:
+        start = time.perf_counter()
         try:
-            self.project.close()
             self.otii.connection.close_connection()
         except Exception as ex:
             logger.warning(f'Failed to release resources during reset: {ex}')
@@ -78,15 +252,38 @@ class SimpleOtii:
         new_connection = OtiiConnection(Env.config['otii']['hostname'], Env.config['otii']['port'])
         new_connection.connect_to_server(try_for_seconds=10)
         self.otii = Otii(new_connection)
-        time.sleep(3)
-        self.otii.login(Env.config['otii']['license_user'], Env.config['otii']['license_psw'])
+        login(self.otii)
 
-        if project_path is not None:
-            self.project: Project = self.otii.open_project(os.path.join(os.getcwd(), project_path))
-        else:
-            self.project: Project = self.otii.create_project()
+        self.project: Project = self._recover_project()
+        if self.project is None:
+            if project_path is not None:
+                self.project: Project = self.otii.open_project(os.path.join(os.getcwd(), project_path))
+            else:
+                self.project: Project = self.otii.create_project()
+            logger.info(f'Project {"reopened" if project_path is not None else "created"} after reset')
 
         self._init_device()
+        logger.info(f'Otii reset in {time.perf_counter() - start:.2f} s')
+
+    def _recover_project(self) -> Project:
+        """ Project still open on the server, None if there is none or it is not usable """
+        try:
+            project: Project = self.otii.get_active_project()
+            if project is None:
+                return None
+
+            # Only a recording left running belongs to the failed configuration
+            recording: Recording = project.get_last_recording()
+            if recording is not None and recording.is_running():
+                project.stop_recording()
+                recording.rename('failed')
+                logger.info('Recording left running stopped')
+
+            logger.info('Project kept after reset')
+            return project
+        except Exception as ex:
+            logger.warning(f'Active project not usable after reset: {ex}')
+            return None
 
     def _init_device(self):
 
@@ -96,61 +293,18 @@ class SimpleOtii:
             logger.info(f'Device found: {device.name}')
         if len(devices) == 0:
             raise Exception("No devices found")
-        else:
-            self.arc: Arc = devices[0]
-
-        # Set range
-        self.arc.set_range("high")
-        time.sleep(0.5)
-
-        # Main voltage
-        self.arc.set_main_voltage(5)
-        time.sleep(0.5)
-
-        # Expansion voltage
-        self.arc.set_exp_voltage(3.3)
-        time.sleep(0.5)
-
-        # Max current (set cut-off)
-        self.arc.set_max_current(4.5)
-        time.sleep(0.5)
-
-        # Enable 'mc' channel
-        self.arc.enable_channel('mc', True)
-        time.sleep(0.5)
-
-        # Enable 'mv' channel
-        self.arc.enable_channel('mv', True)
-        time.sleep(0.5)
 
-        # Enable 'GPI1' channel
-        self.arc.enable_channel('i1', True)
-        time.sleep(0.5)
-
-
-        # Set main power to all devices
-        self.otii.set_all_main(True)
-        time.sleep(0.5)
-
-        # Enable expansion port
-        self.arc.enable_exp_port(True)
-        time.sleep(0.5)
-
-        # Enable uart channel
-        self.arc.enable_uart(True)
-        time.sleep(0.5)
-
-        # Set baudrate
-        self.arc.set_uart_baudrate(Env.config['otii']['baudrate'])
-        time.sleep(0.5)
-
-        # Enable rx channel
-        self.arc.enable_channel("rx", True)
-        time.sleep(0.5)
+        # Configured Arc, the first one otherwise
+        name = Env.config['otii'].get('arc')
+        if name is None:
+            self.arc: Arc = devices[0]
+        else:
+            matches = [device for device in devices if device.name == name]
+            if len(matches) == 0:
+                raise Exception(f'Device {name} not found')
+            self.arc: Arc = matches[0]
 
-        # Enable tx channel
-        self.arc.set_tx(True)
-        time.sleep(0.5)
+        configure_arc(self.otii, self.arc)
 
     def __del__(self):
         try:
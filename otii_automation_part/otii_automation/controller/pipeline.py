@@ -0,0 +1,59 @@
+import logging
+import queue
+import threading
+import time
+import traceback
+
+logger = logging.getLogger('controller')
+
+
+class PostProcessor:
+    """ Background worker post-processing completed configurations, in submission order
+
+    Each job belongs to a trace: a failing job is logged with its trace and recorded in failures, the following
+    jobs still run. The queue is bounded, submit blocks while max_pending jobs are waiting (back-pressure).
+    """
+
+    def __init__(self, max_pending: int = 4):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.failures = []
+        self.worker = threading.Thread(target=self._run, name='post-processing', daemon=True)
+        self.worker.start()
+
+    def submit(self, trace: str, job, *args) -> None:
+        """ Queue job(*args), post-processing of trace """
+        if self.queue.full():
+            logger.info(f'Post-processing queue full, waiting to queue {trace}')
+        self.queue.put((trace, job, args))
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+
+                trace, job, args = item
+                start = time.perf_counter()
+                try:
+                    job(*args)
+                    logger.info(f'Post-processing of {trace} completed in {time.perf_counter() - start:.2f} s')
+                except Exception as ex:
+                    logger.error(f'Post-processing failed for {trace}: {ex}')
+                    logger.error(traceback.format_exc())
+                    self.failures.append({'trace_name': trace, 'error': str(ex)})
+            finally:
+                self.queue.task_done()
+
+    def drain(self) -> None:
+        """ Wait for the queued jobs """
+        self.queue.join()
+
+    def close(self) -> None:
+        """ Run the queued jobs and stop the worker """
+        self.queue.put(None)
+        self.worker.join()
+
+        if self.failures:
+            logger.warning(f'Post-processing failed for {len(self.failures)} configurations: '
+                           f'{", ".join(failure["trace_name"] for failure in self.failures)}')
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from argparse import ArgumentParser
+
+logger = logging.getLogger('controller')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    trace_name TEXT NOT NULL,
+    device_name TEXT,
+    created REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_trace ON results (trace_name);
+CREATE TABLE IF NOT EXISTS params (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    name TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS params_value ON params (name, value, result_id);
+'''
+
+
+class ResultStore:
+    """ Append-only store of configuration results (SQLite)
+
+    Each record is committed in its own transaction, a crash loses at most the record being written. Records are
+    indexed by trace name and by configuration parameter (values compared as JSON). export_summary writes the
+    legacy summary.json (list of records in insertion order). The store can be shared by threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def append(self, results: dict, device_name: str = None) -> int:
+        """ Store the results of a configuration, return their id """
+        record = json.dumps(results)
+        params = [(name, json.dumps(value)) for name, value in (results.get('config') or {}).items()]
+
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO results (trace_name, device_name, created, record) VALUES (?, ?, ?, ?)',
+                (results['trace_name'], device_name, time.time(), record)
+            )
+            result_id = cursor.lastrowid
+            self.connection.executemany(
+                'INSERT INTO params (result_id, name, value) VALUES (?, ?, ?)',
+                [(result_id, name, value) for name, value in params]
+            )
+
+        return result_id
+
+    def find(self, trace_name: str = None, device_name: str = None, **params) -> list:
+        """ Records matching the trace name, the device and the configuration parameters, in insertion order """
+        query = 'SELECT results.record FROM results'
+        conditions = []
+        args = []
+        for i, (name, value) in enumerate(params.items()):
+            query += f' JOIN params AS p{i} ON p{i}.result_id = results.id AND p{i}.name = ? AND p{i}.value = ?'
+            args += [name, json.dumps(value)]
+        if trace_name is not None:
+            conditions.append('results.trace_name = ?')
+            args.append(trace_name)
+        if device_name is not None:
+            conditions.append('results.device_name = ?')
+            args.append(device_name)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY results.id'
+
+        with self.lock:
+            rows = self.connection.execute(query, args).fetchall()
+
+        return [json.loads(record) for record, in rows]
+
+    def records(self, device_name: str = None, with_device: bool = False) -> list:
+        """ All records (of a device), in insertion order, with their device_name if with_device """
+        query = 'SELECT record, device_name FROM results'
+        args = []
+        if device_name is not None:
+            query += ' WHERE device_name = ?'
+            args.append(device_name)
+        query += ' ORDER BY id'
+
+        with self.lock:
+            rows = self.connection.execute(query, args).fetchall()
+
+        records = []
+        for record, device in rows:
+            record = json.loads(record)
+            if with_device and device is not None:
+                record['device_name'] = device
+            records.append(record)
+
+        return records
+
+    def devices(self) -> list:
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT DISTINCT device_name FROM results WHERE device_name IS NOT NULL ORDER BY device_name'
+            ).fetchall()
+
+        return [device for device, in rows]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def export_summary(self, path: str, device_name: str = None) -> int:
+        """ Write the legacy summary.json (replaced atomically), return the number of records """
+        records = self.records(device_name, with_device=device_name is None)
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(records, fp, indent=2)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, path)
+
+        return len(records)
+
+    def export_all(self, base_dir: str) -> None:
+        """ Legacy summary.json of the experiment and of each device (in its folder) """
+        count = self.export_summary(os.path.join(base_dir, 'summary.json'))
+        for device in self.devices():
+            self.export_summary(os.path.join(base_dir, device, 'summary.json'), device)
+
+        logger.info(f'{count} results exported to summary.json')
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def main():
+    parser = ArgumentParser(description='Export the results store of an experiment to the legacy summary.json')
+    parser.add_argument('store', type=str, help='results store (results.db)')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='summary file, default: summary.json next to the store')
+    parser.add_argument('-d', '--device', type=str, default=None, help='export only the results of this device')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(name)-15s][%(levelname)-7s] - %(message)s')
+
+    output = args.output or os.path.join(os.path.dirname(args.store), 'summary.json')
+    store = ResultStore(args.store)
+    count = store.export_summary(output, args.device)
+    store.close()
+
+    logger.info(f'{count} records exported to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import logging
+import threading
+
+from paramiko.client import SSHClient, AutoAddPolicy
+from paramiko.sftp_client import SFTPClient
+
+from ..environment import Environment as Env
+
+logger = logging.getLogger('ssh')
+
+# Interval of the keep-alive packets on idle connections (seconds)
+KEEPALIVE_INTERVAL = 30
+
+# Line printed after each command of a remote script: marker, command index and exit status
+EXIT_MARKER = '__exit_status__'
+
+
+class SshConnection:
+    """ Persistent SSH connection to a host, reopened when dropped
+
+    Commands open a channel each on the shared transport, so they can run from several threads. The SFTP session
+    is opened once and reused, one transfer at a time.
+    """
+
+    def __init__(self, hostname: str, username: str, key_filename: str, port: int = 22):
+        self.hostname = hostname
+        self.username = username
+        self.key_filename = key_filename
+        self.port = port
+
+        self.lock = threading.Lock()
+        self.sftp_lock = threading.Lock()
+        self.client: SSHClient = None
+        self._sftp: SFTPClient = None
+
+    def _transport(self):
+        """ Transport of the connection, connecting first if needed """
+        with self.lock:
+            if self.client is None or not self.client.get_transport() or not self.client.get_transport().is_active():
+                self._close()
+
+                self.client = SSHClient()
+                self.client.set_missing_host_key_policy(AutoAddPolicy())
+                self.client.connect(hostname=self.hostname, port=self.port, username=self.username,
+                                    key_filename=self.key_filename)
+                self.client.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+                logger.debug(f'Connected to {self.username}@{self.hostname}')
+
+            return self.client.get_transport()
+
+    def run_script(self, commands: list, check: bool = True) -> list:
+        """ Run commands as one remote shell script, return their exit status and output (stdout and stderr)
+
+        The script stops at the first failing command, which raises an Exception if check.
+        """
+        channel = self._transport().open_session()
+        try:
+            channel.set_combine_stderr(True)
+            channel.exec_command('sh -s')
+            channel.sendall(build_script(commands).encode('utf-8'))
+            channel.shutdown_write()
+
+            output = bytearray()
+            while data := channel.recv(65536):
+                output += data
+            status = channel.recv_exit_status()
+        finally:
+            channel.close()
+
+        results = parse_script_output(commands, output.decode('utf-8', errors='replace'))
+        for result in results:
+            logger.debug(result['command'])
+            if result['output'] != '':
+                logger.debug(f'Output: {result["output"]}')
+
+        failed = [result for result in results if result['exit_status'] != 0]
+        if check and failed:
+            raise Exception(f'{failed[0]["command"]} failed ({failed[0]["exit_status"]}): {failed[0]["output"]}')
+        if check and status != 0:
+            raise Exception(f'Remote script failed ({status}): {output.decode("utf-8", errors="replace")}')
+
+        return results
+
+    def get(self, remote_path: str, local_path: str) -> None:
+        """ Download a file on the reused SFTP session """
+        with self.sftp_lock:
+            self.sftp().get(remote_path, local_path)
+
+    def read(self, remote_path: str) -> bytes:
+        """ Content of a remote file, on the reused SFTP session """
+        with self.sftp_lock:
+            with self.sftp().open(remote_path, 'rb') as fin:
+                fin.prefetch()
+                return fin.read()
+
+    def sftp(self) -> SFTPClient:
+        transport = self._transport()
+        with self.lock:
+            if self._sftp is None or self._sftp.get_channel().closed:
+                self._sftp = SFTPClient.from_transport(transport)
+
+            return self._sftp
+
+    def _close(self) -> None:
+        try:
+            if self._sftp is not None:
+                self._sftp.close()
+            if self.client is not None:
+                self.client.close()
+        except Exception as ex:
+            logger.warning(f'Failed to close connection to {self.hostname}: {ex}')
+
+        self._sftp = None
+        self.client = None
+
+    def close(self) -> None:
+        with self.lock:
+            self._close()
+
+
+def build_script(commands: list) -> str:
+    """ Shell script running the commands in order, each followed by its exit status marker """
+    lines = []
+    for i, command in enumerate(commands):
+        # Commands must not read the script (stdin)
+        lines.append(f'{{ {command}\n}} < /dev/null 2>&1')
+        lines.append(f'status=$?; printf "\\n{EXIT_MARKER} {i} %d\\n" $status; [ $status -eq 0 ] || exit $status')
+
+    return '\n'.join(lines) + '\n'
+
+
+def parse_script_output(commands: list, output: str) -> list:
+    """ Exit status and output of the commands run by build_script (the ones not run are missing) """
+    results = []
+    lines = []
+    for line in output.split('\n'):
+        if line.startswith(EXIT_MARKER):
+            _, i, status = line.split()
+            results.append({'command': commands[int(i)], 'exit_status': int(status),
+                            'output': '\n'.join(lines).strip()})
+            lines = []
+        else:
+            lines.append(line)
+
+    return results
+
+
+class SshPool:
+    """ SSH connections shared by the controller, one per host and user """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = {}
+
+    def connection(self, hostname: str, username: str, key_filename: str, port: int = 22) -> SshConnection:
+        key = (hostname, port, username, key_filename)
+        with self.lock:
+            if key not in self.connections:
+                self.connections[key] = SshConnection(hostname, username, key_filename, port)
+
+            return self.connections[key]
+
+    def close(self) -> None:
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections = {}
+
+
+pool = SshPool()
+
+
+def server() -> SshConnection:
+    """ Connection to the server of the experiment ([server] section) """
+    return pool.connection(Env.config['server']['host'], Env.config['server']['username'],
+                           Env.config['server']['key_file'])
@@ -20,40 +20,55 @@ def build_restore():
     ]
 
 
-def build_prio():
-    return [
-        # Outgoing packets (eth0)
-        'sudo tc qdisc add dev eth0 root handle 1: prio',
-        'sudo tc filter add dev eth0 parent 1:0 protocol ip prio 1 u32 match ip dst 131.114.0.0/16 flowid 2:1',
-        'sudo tc filter add dev eth0 parent 1:0 protocol ip prio 2 u32 match ip dst 0.0.0.0/0 flowid 2:2',
-
-        # Incoming packets (ifb0)
-        'sudo tc qdisc add dev ifb0 root handle 1: prio',
-        'sudo tc filter add dev ifb0 parent 1:0 protocol ip prio 1 u32 match ip src 131.114.0.0/16 flowid 2:1',
-        'sudo tc filter add dev ifb0 parent 1:0 protocol ip prio 2 u32 match ip src 0.0.0.0/0 flowid 2:2'
-    ]
+# Shaped devices: outgoing traffic (eth0) and incoming traffic redirected to ifb0, with the address matched by the
+# prio filters
+DEVICES = {'eth0': 'dst', 'ifb0': 'src'}
 
 
-def build_set_1(delay):
-    # return build_restore() + build_prio() + [
-    #     f'sudo tc qdisc add dev ifb0 root netem delay {delay}ms',
-    #     f'sudo tc qdisc add dev eth0 root netem delay {delay}ms'
-    # ]
-    return build_restore() + build_prio() + [
-        f'sudo tc qdisc add dev eth0 parent 1:2 handle 2: netem delay {delay}ms',
-        f'sudo tc qdisc add dev ifb0 parent 1:2 handle 2: netem delay {delay}ms'
-    ]
+def build_tree(dl_bandwidth, ul_bandwidth, delay) -> dict:
+    """ Qdisc tree of each device for a configuration: root qdisc (prio or netem) and netem parameters
 
+    The netem parameters are always complete: qdisc change keeps the options it is not given, so an unshaped device
+    has rate 0bit (no limit) rather than no rate.
+    """
+    if dl_bandwidth == '100%':
+        # netem on the default band of the prio qdisc (the 131.114.0.0/16 network is not shaped)
+        return {device: {'root': 'prio', 'netem': f'delay {delay}ms rate 0bit'} for device in DEVICES}
+    if ul_bandwidth is None:
+        return {
+            'eth0': {'root': 'netem', 'netem': f'delay {delay}ms rate {dl_bandwidth}mbit'},
+            'ifb0': {'root': 'netem', 'netem': f'delay {delay}ms rate 0bit'}
+        }
+
+    return {
+        'eth0': {'root': 'netem', 'netem': f'delay {delay}ms rate {ul_bandwidth}mbit'},
+        'ifb0': {'root': 'netem', 'netem': f'delay {delay}ms rate {dl_bandwidth}mbit'}
+    }
 
-def build_set_2(delay, bandwidth):
-    return build_restore() + build_prio() + [
-        f'sudo tc qdisc add dev ifb0 root netem delay {delay}ms',
-        f'sudo tc qdisc add dev eth0 root netem delay {delay}ms rate {bandwidth}mbit'
-    ]
 
+def build_diff(device, current, target) -> list:
+    """ tc batch lines turning the tree of a device from current (root None: default qdisc) into target """
+    if current == target:
+        return []
 
-def build_set_3(delay, dl_bandwidth, ul_bandwidth):
-    return build_restore() + build_prio() + [
-        f'sudo tc qdisc add dev ifb0 root netem delay {delay}ms rate {dl_bandwidth}mbit',
-        f'sudo tc qdisc add dev eth0 root netem delay {delay}ms rate {ul_bandwidth}mbit'
+    # Same tree, only netem parameters change
+    if current['root'] == target['root']:
+        parent = 'parent 1:2 handle 2:' if target['root'] == 'prio' else 'root'
+        return [f'qdisc change dev {device} {parent} netem {target["netem"]}']
+
+    # Replacing the root qdisc drops its children and filters
+    if target['root'] == 'netem':
+        return [f'qdisc replace dev {device} root netem {target["netem"]}']
+
+    match = DEVICES[device]
+    return [
+        f'qdisc replace dev {device} root handle 1: prio',
+        f'filter add dev {device} parent 1:0 protocol ip prio 1 u32 match ip {match} 131.114.0.0/16 flowid 2:1',
+        f'filter add dev {device} parent 1:0 protocol ip prio 2 u32 match ip {match} 0.0.0.0/0 flowid 2:2',
+        f'qdisc add dev {device} parent 1:2 handle 2: netem {target["netem"]}'
     ]
+
+
+def build_batch(lines) -> str:
+    """ One tc invocation running the lines, stopping at the first error """
+    return '\n'.join(["sudo tc -batch - <<'EOF'"] + lines + ['EOF'])
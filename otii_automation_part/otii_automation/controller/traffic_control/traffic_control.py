@@ -1,56 +1,90 @@
 import logging
 
-from paramiko.client import SSHClient, AutoAddPolicy
-
-from ...environment import Environment as Env
+from ..ssh import server
 from .scripts import *
 
 logger = logging.getLogger('traffic-ctrl')
 
 
-def exec_command(commands: str | list[str]):
+def exec_command(commands: str | list[str]) -> list:
+    """ Run commands on the server as one script, on the shared connection, stop at the first failing one """
     if not isinstance(commands, list):
         commands = [commands]
 
-    with SSHClient() as ssh:
-        ssh.set_missing_host_key_policy(AutoAddPolicy())
-        ssh.connect(username=Env.config['server']['username'],
-                    hostname=Env.config['server']['host'],
-                    key_filename=Env.config['server']['key_file'])
+    return server().run_script(commands)
+
+
+class TrafficControl:
+    """ Qdisc trees applied on the server, reconfigured with the minimal tc operations
+
+    The trees of eth0 and ifb0 are tracked after each change (None: unknown, e.g. after a failure). A new
+    configuration only changes what differs, e.g. the netem parameters, in one tc -batch invocation; the trees are
+    rebuilt from scratch only when unknown.
+    """
+
+    def __init__(self):
+        self.initialized = False
+        self.trees = None
+
+    def init(self) -> None:
+        """ Redirect incoming traffic to ifb0, once per campaign """
+        if self.initialized:
+            return
+
+        exec_command(build_init())
+        self.initialized = True
+        self.trees = {device: {'root': None} for device in DEVICES}
+
+    def set(self, dl_bandwidth, ul_bandwidth, delay) -> None:
+        target = build_tree(dl_bandwidth, ul_bandwidth, delay)
 
-        for cmd in commands:
-            _stdin, stdout, stderr = ssh.exec_command(cmd)
-            logger.debug(cmd)
-            if stdout.channel.recv_exit_status() != 0:
-                raise Exception(''.join(stderr.readlines()))
+        commands = []
+        current = self.trees
+        if current is None:
+            commands += build_restore()
+            current = {device: {'root': None} for device in DEVICES}
 
-            out = ''.join(stdout.readlines()).strip()
-            err = ''.join(stderr.readlines()).strip()
+        lines = [line for device in DEVICES for line in build_diff(device, current[device], target[device])]
+        if lines:
+            commands.append(build_batch(lines))
+        if not commands:
+            logger.debug('Network constraints unchanged')
+            return
 
-            if out != '':
-                logger.debug(f'Stdout: {out}')
-            if err != '':
-                logger.debug(f'Stderr: {err}')
+        try:
+            exec_command(commands)
+        except Exception:
+            self.trees = None
+            raise
+
+        self.trees = target
+        logger.debug(f'Network constraints changed with {len(lines)} tc operations')
+
+    def restore(self) -> None:
+        try:
+            exec_command(build_restore())
+        except Exception:
+            self.trees = None
+            raise
+
+        self.trees = {device: {'root': None} for device in DEVICES}
+
+
+traffic_control = TrafficControl()
 
 
 def init_bandwidth_and_delay():
     """ Init simulated network on server """
 
-    # Init command
-
-    exec_command(build_init())
+    # Init command, once per campaign
+    traffic_control.init()
 
 
 def set_bandwidth_and_delay(dl_bandwidth, ul_bandwidth, delay):
     """ Set bandwidth limit and additional delay on server """
 
-    if dl_bandwidth == "100%":
-        exec_command(build_set_1(delay))
-    else:
-        if ul_bandwidth is None:
-            exec_command(build_set_2(delay, dl_bandwidth))
-        else:
-            exec_command(build_set_3(delay, dl_bandwidth, ul_bandwidth))
+    # Only the differences with the applied network constraints
+    traffic_control.set(dl_bandwidth, ul_bandwidth, delay)
 
     if dl_bandwidth == '100%':
         logger.debug(f'Bandwidth: {dl_bandwidth}')
@@ -64,4 +98,4 @@ def restore_bandwidth_and_delay():
     """ Restore network """
 
     # Restore command
-    exec_command(build_restore())
+    traffic_control.restore()
@@ -2,32 +2,17 @@ import json
 import logging
 import os
 
-from paramiko.client import SSHClient, AutoAddPolicy
-from scp import SCPClient
 from ..environment import Environment as Env
+from .idle import idle_config
+from .ssh import server
 
 logger = logging.getLogger('controller')
 
 
 def download_results(trace) -> dict:
-    """ Download results from server """
+    """ Download results from server (read in memory on the shared SFTP session) """
     try:
-        with SSHClient() as ssh:
-            ssh.set_missing_host_key_policy(AutoAddPolicy())
-            ssh.connect(
-                hostname=Env.config['server']['host'],
-                username=Env.config['server']['username'],
-                key_filename=Env.config['server']['key_file']
-            )
-
-            with SCPClient(ssh.get_transport()) as scp:
-                scp.get(Env.config['server']['path'] + f'{trace}.json', '.tmp.json')
-
-            with open('.tmp.json') as fp:
-                device_res = json.load(fp)
-
-        os.remove('.tmp.json')
-        return device_res
+        return json.loads(server().read(Env.config['server']['path'] + f'{trace}.json'))
     except Exception as ex:
         logger.warning(f'Download results {trace} failed: {ex}')
         raise ex
@@ -35,17 +20,7 @@ def download_results(trace) -> dict:
 
 def download_device_logs() -> None:
     try:
-        with SSHClient() as ssh:
-            ssh.set_missing_host_key_policy(AutoAddPolicy())
-            ssh.connect(
-                hostname=Env.config['server']['host'],
-                username=Env.config['server']['username'],
-                key_filename=Env.config['server']['key_file']
-            )
-
-            with SCPClient(ssh.get_transport()) as scp:
-                scp.get(Env.config['server']['path'] + f'device.log', os.path.join(Env.log_dir, 'device.log'))
-
+        server().get(Env.config['server']['path'] + f'device.log', os.path.join(Env.log_dir, 'device.log'))
     except Exception as ex:
         logger.warning(f'Download logs failed: {ex}')
         raise ex
@@ -64,18 +39,24 @@ def build_config_message(params: dict, trace: str) -> dict:
         'radio_generation': params['radio_generation'],
         'bandwidth': params['bandwidth'],
         'delay': params['delay'],
+        'ebpf_mode': Env.config['meta'].get('ebpf_mode', 'packet'),
+        'bin_size': Env.config['meta'].get('bin_size', 0.5),
+        'power_model': Env.config['meta'].get('power_model'),
         'results_dir': f'results/{Env.timestamp}/{trace}',
+        'idle_signal': idle_config() is not None
     }
 
     return configuration
 
 
-def build_trace_name(params: dict) -> str:
-    """ Build trace name from configuration """
+def build_trace_name(params: dict, counter: int = None, iteration: int = None) -> str:
+    """ Build trace name from configuration (counters of the environment by default) """
+    counter = Env.trace_counter if counter is None else counter
+    iteration = Env.iteration if iteration is None else iteration
 
-    trace_name = f'{Env.trace_counter}_{params["delay"]}S_{params["bandwidth"].split("%")[0]}_' \
+    trace_name = f'{counter}_{params["delay"]}S_{params["bandwidth"].split("%")[0]}_' \
                  f'{params["radio_generation"]}_{params["payload_size"]}'
 
-    trace_name += f'_{Env.iteration:03d}'
+    trace_name += f'_{iteration:03d}'
 
     return trace_name
@@ -1 +1 @@
-from .device import device
+from .device import device, estimate
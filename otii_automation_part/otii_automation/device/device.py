@@ -1,3 +1,4 @@
+import ctypes
 import threading
 import traceback
 import logging
@@ -14,18 +15,139 @@ from .util import logger, parse_payload_size, iface_up_cmd, \
     format_payload_size, generate_ebpf_filename, emit_gpio_marker
 from .at_command import reset_nic
 from .protocols.mqtt import aoi_rawmqtt
-from ..rdt import Rdt
+from ..estimation import PowerEstimator
+from ..features import FEATURE_NAMES, merge_bin_stats, bin_features
+from ..rdt import BinaryRdt, WindowRdt
+from ..trace import BinaryEventWriter, CsvEventWriter
 from ..rdt.exception import RdtException
 from ..rdt.message import Message
 from ..rdt.udt.uart_serial import UdtUartSerial
 
-rdt = Rdt(UdtUartSerial('/dev/ttyS0'))
+# Windowed RDT when the controller negotiates it, BinaryRdt otherwise (JSON FastRdt if the controller uses JSON)
+rdt = WindowRdt(UdtUartSerial('/dev/ttyS0'), fallback=BinaryRdt)
 
 server_config = None
 
+# Packets may still update a bin shortly after its end, wait before draining it
+BIN_GRACE_NS = 10_000_000
 
-def start_ebpf(device, output_file, stop_event, result_dir, ready_event):
-    """Start the eBPF program and log metrics to a CSV file."""
+# Interval between two ring buffer drains (seconds), longer intervals mean larger batches
+RINGBUF_DRAIN_INTERVAL = 0.05
+
+# Wait for the network card to be idle after the requests (seconds)
+IDLE_TIMEOUT = 25
+# Extra wait for the idle signal of the controller, whose detection is bounded by IDLE_TIMEOUT too
+IDLE_SIGNAL_GRACE = 5
+
+
+def log_perf_events(bpf, output_file, stop_event, stats):
+    """ Stream per-packet events from the perf buffer to a CSV file """
+    with CsvEventWriter(output_file) as writer:
+        def process_event(cpu, data, size):
+            writer.write(data)
+
+        def lost_events(count):
+            stats['lost_events'] += count
+
+        bpf["events"].open_perf_buffer(process_event, lost_cb=lost_events)
+
+        # Main polling loop with stop condition
+        while not stop_event.is_set():
+            bpf.perf_buffer_poll(timeout=100)  # 100ms timeout to check stop_event
+
+    stats['events'] = writer.total
+
+
+def log_ring_events(bpf, output_file, stop_event, stats):
+    """ Drain per-packet events from the ring buffer in batches to a binary file """
+    with BinaryEventWriter(output_file) as writer:
+        def process_event(ctx, data, size):
+            writer.write(data)
+
+        bpf["ring_events"].open_ring_buffer(process_event)
+
+        # Consume everything available at each wake up
+        while not stop_event.wait(RINGBUF_DRAIN_INTERVAL):
+            bpf.ring_buffer_consume()
+        bpf.ring_buffer_consume()
+
+    stats['events'] = writer.total
+    stats['lost_events'] = bpf["dropped"].sum(0).value
+
+
+def log_bins(bpf, output_file, stop_event, stats, bin_size, estimator=None):
+    """ Drain finished bins from the eBPF map and log their features to a CSV file
+
+    With an estimator, the power estimated from the features of each bin is logged as an extra column
+    (empty until the estimator window is full) and the estimated energy is added to stats.
+    """
+    bin_size_ns = int(bin_size * 1e9)
+    bins = bpf["bins"]
+    first_timestamp = bpf["first_timestamp"]
+    next_bin = 0
+    stats['events'] = 0
+    if estimator is not None:
+        stats['estimated_energy'] = 0.0
+
+    with open(output_file, "w") as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(["Bin", "Timestamp (ns)"] + FEATURE_NAMES +
+                            (["EstimatedPower"] if estimator is not None else []))
+
+        def write_bin(key, timestamp, features):
+            row = [key, timestamp] + list(features.values())
+            if estimator is not None:
+                estimate = estimator.update(features)
+                if estimate is not None:
+                    stats['estimated_energy'] += estimate * bin_size
+                    logger.debug(f"Bin {key}: estimated power {estimate:.4f} W")
+                row.append("" if estimate is None else estimate)
+            csv_writer.writerow(row)
+
+        def drain(final=False):
+            nonlocal next_bin
+
+            origin = first_timestamp[ctypes.c_int(0)].value
+            if origin == 0:
+                return  # No packet seen yet
+
+            # Only bins whose interval is over (all of them when stopping)
+            current = (time.monotonic_ns() - origin - BIN_GRACE_NS) // bin_size_ns
+            finished = sorted(key.value for key in bins.keys() if final or key.value < current)
+
+            for key in finished:
+                bin_stats = merge_bin_stats(bins[bins.Key(key)])
+                del bins[bins.Key(key)]
+
+                # Bins without packets are not in the map
+                for empty in range(next_bin, key):
+                    write_bin(empty, origin + empty * bin_size_ns, bin_features({'tx_count': 0, 'rx_count': 0}, bin_size))
+
+                write_bin(key, origin + key * bin_size_ns, bin_features(bin_stats, bin_size))
+                stats['events'] += bin_stats['tx_count'] + bin_stats['rx_count']
+                next_bin = max(next_bin, key + 1)
+
+            # Keep estimating while idle: bins over without packets will not show up in the map
+            if estimator is not None and not final:
+                for empty in range(next_bin, current):
+                    write_bin(empty, origin + empty * bin_size_ns, bin_features({'tx_count': 0, 'rx_count': 0}, bin_size))
+                next_bin = max(next_bin, current)
+
+        # Wake up twice per bin to check stop_event
+        while not stop_event.wait(bin_size / 2):
+            drain()
+        drain(final=True)
+
+
+def start_ebpf(device, output_file, stop_event, result_dir, ready_event, mode='packet', bin_size=0.5,
+               power_model=None):
+    """Start the eBPF program and log metrics to a CSV file.
+
+    In 'packet' mode every packet is streamed to userspace through a perf buffer and logged to CSV,
+    in 'ringbuf' mode through a ring buffer and logged to a binary trace, in 'aggregate' mode the
+    eBPF program keeps per-bin counters and only the features of finished bins are logged.
+    In 'aggregate' mode, power_model is the path of an exported model used to estimate power at every bin.
+    """
     # Get the directory where this script is located
     logger.info(f"THREAD HAS STARTED")
 
@@ -39,8 +161,20 @@ def start_ebpf(device, output_file, stop_event, result_dir, ready_event):
         raise FileNotFoundError(f"eBPF source file not found at: {ebpf_path}")
     markers = []  # List to store timestamp events
 
+    # Load the model before attaching, a bad model must not leave the program attached
+    estimator = None
+    if power_model is not None:
+        if mode != 'aggregate':
+            raise ValueError(f"Power estimation requires 'aggregate' eBPF mode, not '{mode}'")
+        estimator = PowerEstimator(power_model)
+
     # Load the BPF program
-    bpf = BPF(src_file=ebpf_path)
+    cflags = []
+    if mode == 'aggregate':
+        cflags = ['-DAGGREGATE=1', f'-DBIN_SIZE_NS={int(bin_size * 1e9)}ULL']
+    elif mode == 'ringbuf':
+        cflags = ['-DRINGBUF=1']
+    bpf = BPF(src_file=ebpf_path, cflags=cflags)
     fn_ingress = bpf.load_func("handle_ingress", BPF.XDP)
     bpf.attach_xdp(device, fn_ingress)
 
@@ -59,21 +193,14 @@ def start_ebpf(device, output_file, stop_event, result_dir, ready_event):
     # Signal the main thread that eBPF is ready
     ready_event.set()
 
+    stats = {'mode': mode, 'events': None, 'lost_events': 0}
     try:
-        with open(output_file, "w") as csvfile:
-            csv_writer = csv.writer(csvfile)
-            csv_writer.writerow(["Timestamp (ns)", "IAT (ns)", "Packet Length", "Direction"])
-
-            def process_event(cpu, data, size):
-                event = bpf["events"].event(data)
-                direction = "Incoming" if event.direction == 0 else "Outgoing"
-                csv_writer.writerow([event.timestamp_ns, event.iat_ns, event.packet_length, direction])
-
-            bpf["events"].open_perf_buffer(process_event)
-
-            # Main polling loop with stop condition
-            while not stop_event.is_set():
-                bpf.perf_buffer_poll(timeout=100)  # 100ms timeout to check stop_event
+        if mode == 'aggregate':
+            log_bins(bpf, output_file, stop_event, stats, bin_size, estimator)
+        elif mode == 'ringbuf':
+            log_ring_events(bpf, output_file, stop_event, stats)
+        else:
+            log_perf_events(bpf, output_file, stop_event, stats)
 
     finally:
         marker_end = emit_gpio_marker()
@@ -83,6 +210,14 @@ def start_ebpf(device, output_file, stop_event, result_dir, ready_event):
         with open(os.path.join(result_dir, 'markers.json'), 'w') as f:
             json.dump(markers, f, indent=2)
 
+        # Save capture statistics
+        if stats['lost_events'] > 0:
+            logger.warning(f"eBPF events lost: {stats['lost_events']}")
+        if 'estimated_energy' in stats:
+            logger.info(f"Estimated energy: {stats['estimated_energy']:.3f} J")
+        with open(os.path.join(result_dir, 'ebpf_stats.json'), 'w') as f:
+            json.dump(stats, f, indent=2)
+
         logger.info("Cleaning up eBPF resources...")
         # Cleanup operations
         bpf.remove_xdp(device)
@@ -91,6 +226,28 @@ def start_ebpf(device, output_file, stop_event, result_dir, ready_event):
         logger.info("eBPF program stopped cleanly")
 
 
+def wait_idle(signal: bool) -> None:
+    """ Wait for the idle network card: until the controller detects it on the current (IDLE), or a fixed time """
+    if not signal:
+        time.sleep(IDLE_TIMEOUT)
+        return
+
+    start = time.time()
+    deadline = start + IDLE_TIMEOUT + IDLE_SIGNAL_GRACE
+    while (remaining := deadline - time.time()) > 0:
+        try:
+            message, _ = rdt.receive(timeout=remaining)
+        except RdtException:
+            break
+
+        if message['code'] == Message.IDLE.value:
+            logger.info(f'Network card idle after {time.time() - start:.1f} s')
+            return
+        logger.warning(f'Unexpected message while waiting for idle: {message}')
+
+    logger.warning(f'No idle signal after {time.time() - start:.1f} s')
+
+
 def start_configuration(config):
     global server_config
 
@@ -115,8 +272,14 @@ def start_configuration(config):
         experiment_duration = 60
         request_count = 0
 
+        # Per-packet trace, or per-bin features when aggregating in kernel
+        ebpf_mode = config.get('ebpf_mode', 'packet')
+        bin_size = config.get('bin_size', 0.5)
+        power_model = config.get('power_model')
+
         # Generate descriptive filename
-        ebpf_csv = os.path.join(config['results_dir'], "ebpf_trace.csv")
+        ebpf_name = {'aggregate': "ebpf_bins.csv", 'ringbuf': "ebpf_trace.bin"}.get(ebpf_mode, "ebpf_trace.csv")
+        ebpf_csv = os.path.join(config['results_dir'], ebpf_name)
 
         # Create an Event to signal that eBPF is fully attached
         ebpf_ready_event = threading.Event()
@@ -124,12 +287,16 @@ def start_configuration(config):
         # Create stop event for eBPF thread
         stop_event = threading.Event()
         device = "wlan0"
-        ebpf_thread = Thread(target=start_ebpf, args=(device, ebpf_csv, stop_event, config['results_dir'], ebpf_ready_event))
+        ebpf_thread = Thread(target=start_ebpf, args=(device, ebpf_csv, stop_event, config['results_dir'], ebpf_ready_event,
+                                                      ebpf_mode, bin_size, power_model))
         ebpf_thread.start()
 
-        # Wait for eBPF to finish setup before starting experiment
+        # Wait for eBPF to finish setup before starting experiment, a setup failure (e.g. power model not loaded) is
+        # reported to the controller as an ERROR
         logger.info("Waiting for eBPF thread to finish setup...")
-        ebpf_ready_event.wait()
+        while not ebpf_ready_event.wait(timeout=1):
+            if not ebpf_thread.is_alive():
+                raise RuntimeError("eBPF thread stopped during setup")
 
         logger.info("eBPF program is active, beginning HTTP traffic...")
         logger.info(f"Starting HTTP experiment with eBPF for {experiment_duration} seconds.")
@@ -166,7 +333,7 @@ def start_configuration(config):
 
     # Wait for idle network card
     if config['experiment'] != 'aoi':
-        time.sleep(25)
+        wait_idle(config.get('idle_signal', False))
 
     rdt.send(Message.STOP_CONFIG)
     logger.info("Configuration completed")
@@ -185,6 +352,8 @@ def device():
             elif message['code'] == Message.END_EXPERIMENT.value:
                 logger.info('Experiment concluded')
                 break
+            elif message['code'] == Message.IDLE.value:
+                logger.warning('Idle signal received after the configuration')
             else:
                 raise RdtException(f'Unknown command: {message}')
         except Exception as ex:
@@ -203,3 +372,29 @@ def device():
                 rdt.send(Message.ERROR)
             except Exception as ex:
                 logger.warning(f'Error message not sent: {ex}')
+
+
+def estimate(power_model, iface='wlan0', bin_size=0.5):
+    """ Estimate power from live traffic until interrupted, without Otii nor controller """
+    run_timestamp = time.strftime("%Y%m%d_%H%M%S")
+    result_dir = os.path.join("results", f"estimate_{run_timestamp}")
+    os.makedirs(result_dir, exist_ok=True)
+
+    ready_event = threading.Event()
+    stop_event = threading.Event()
+    ebpf_thread = Thread(target=start_ebpf, args=(iface, os.path.join(result_dir, "ebpf_bins.csv"), stop_event,
+                                                  result_dir, ready_event, 'aggregate', bin_size, power_model))
+    ebpf_thread.start()
+    while not ready_event.wait(timeout=1):
+        if not ebpf_thread.is_alive():
+            raise RuntimeError("eBPF thread stopped during setup")
+    logger.info(f"Estimating power on {iface} every {bin_size} s, results in {result_dir}")
+
+    try:
+        while ebpf_thread.is_alive():
+            ebpf_thread.join(timeout=1)
+    except KeyboardInterrupt:
+        logger.info("Stopping power estimation...")
+    finally:
+        stop_event.set()
+        ebpf_thread.join()
@@ -4,6 +4,32 @@
 #include <uapi/linux/if_ether.h>
 #include <uapi/linux/pkt_cls.h>
 
+// Aggregation mode (set by userspace with -DAGGREGATE=1): keep per-bin counters in a map
+// instead of streaming one event per packet
+#ifndef AGGREGATE
+#define AGGREGATE 0
+#endif
+
+// Ring buffer mode (set by userspace with -DRINGBUF=1): stream per-packet events through a BPF ring buffer
+#ifndef RINGBUF
+#define RINGBUF 0
+#endif
+
+// Ring buffer size in pages (1 MiB with 4 KiB pages)
+#ifndef RINGBUF_PAGES
+#define RINGBUF_PAGES 256
+#endif
+
+// Bin size in nanoseconds (0.5 s bins, as in data_processing.m)
+#ifndef BIN_SIZE_NS
+#define BIN_SIZE_NS 500000000ULL
+#endif
+
+// Maximum number of bins not yet drained by userspace
+#ifndef MAX_BINS
+#define MAX_BINS 1024
+#endif
+
 // Define a perf event map for streaming data to userspace
 struct packet_event {
     u64 timestamp_ns;  // Current timestamp
@@ -13,9 +39,89 @@ struct packet_event {
 };
 BPF_PERF_OUTPUT(events);
 
+#if RINGBUF
+BPF_RINGBUF_OUTPUT(ring_events, RINGBUF_PAGES);
+
+// Events dropped because the ring buffer was full
+BPF_PERCPU_ARRAY(dropped, u64, 1);
+#endif
+
+// Per-bin traffic counters (one copy per CPU, merged by userspace)
+struct bin_stats {
+    u64 tx_bytes;      // Outgoing bytes
+    u64 rx_bytes;      // Incoming bytes
+    u64 tx_count;      // Outgoing packets
+    u64 rx_count;      // Incoming packets
+    u64 iat_sum;       // Sum of IAT (ns)
+    u64 iat_us_sum;    // Sum of IAT (us, floored as in iat_sq_sum)
+    u64 iat_sq_sum;    // Sum of squared IAT (us^2, ns^2 would overflow)
+    u64 iat_min;       // Min IAT (ns)
+    u64 iat_max;       // Max IAT (ns)
+    u64 len_max;       // Max packet length
+    u64 len_sq_sum;    // Sum of packet length^2
+    u64 len_cube_sum;  // Sum of packet length^3
+    u64 len_p4_lo;     // Sum of packet length^4 (low 64 bits)
+    u64 len_p4_hi;     // Sum of packet length^4 (high 64 bits)
+};
+BPF_PERCPU_HASH(bins, u64, struct bin_stats, MAX_BINS);
+
 // Define a map to store the last timestamp (shared for both directions)
 BPF_ARRAY(last_timestamp, u64, 1);
 
+// Define a map to store the timestamp of the first packet (origin of bin 0)
+BPF_ARRAY(first_timestamp, u64, 1);
+
+// Helper function to accumulate the packet into its bin
+static __always_inline void record_packet_bin(u64 now, u64 iat, u32 direction, u64 packet_length) {
+    u32 index = 0;
+    u64 *first_time = first_timestamp.lookup(&index);
+    if (!first_time)
+        return;
+    if (*first_time == 0)
+        first_timestamp.update(&index, &now);
+
+    u64 origin = *first_time != 0 ? *first_time : now;
+    u64 bin = (now - origin) / BIN_SIZE_NS;
+
+    struct bin_stats zero = {};
+    struct bin_stats *stats = bins.lookup_or_try_init(&bin, &zero);
+    if (!stats)
+        return;
+
+    // First packet of this bin on this CPU
+    if (stats->tx_count + stats->rx_count == 0) {
+        stats->iat_min = iat;
+        stats->iat_max = iat;
+    }
+
+    if (direction == 0) {
+        stats->rx_bytes += packet_length;
+        stats->rx_count += 1;
+    } else {
+        stats->tx_bytes += packet_length;
+        stats->tx_count += 1;
+    }
+
+    u64 iat_us = iat / 1000;
+    stats->iat_sum += iat;
+    stats->iat_us_sum += iat_us;
+    stats->iat_sq_sum += iat_us * iat_us;
+    if (iat < stats->iat_min)
+        stats->iat_min = iat;
+    if (iat > stats->iat_max)
+        stats->iat_max = iat;
+
+    u64 len_sq = packet_length * packet_length;
+    u64 len_p4 = len_sq * len_sq;
+    if (packet_length > stats->len_max)
+        stats->len_max = packet_length;
+    stats->len_sq_sum += len_sq;
+    stats->len_cube_sum += len_sq * packet_length;
+    stats->len_p4_lo += len_p4;
+    if (stats->len_p4_lo < len_p4)
+        stats->len_p4_hi += 1; // Carry
+}
+
 // Helper function to calculate inter-arrival time and stream data
 static __always_inline void record_packet_event(void *ctx,u32 direction, u64 packet_length) {
     u64 now = bpf_ktime_get_ns(); // Current time in nanoseconds
@@ -31,6 +137,23 @@ static __always_inline void record_packet_event(void *ctx,u32 direction, u64 pac
     }
     last_timestamp.update(&index, &now); // Update the last timestamp
 
+#if AGGREGATE
+    // Update the current bin, userspace only reads finished bins
+    record_packet_bin(now, iat, direction, packet_length);
+#elif RINGBUF
+    struct packet_event event = {};
+    event.timestamp_ns = now;
+    event.iat_ns = iat;
+    event.packet_length = packet_length;
+    event.direction = direction;
+
+    // Send the event to userspace via the ring buffer, count it if the buffer is full
+    if (ring_events.ringbuf_output(&event, sizeof(event), 0) != 0) {
+        u64 *lost = dropped.lookup(&index);
+        if (lost)
+            *lost += 1;
+    }
+#else
     // Prepare event data
     struct packet_event event = {};
     event.timestamp_ns = now;
@@ -40,6 +163,7 @@ static __always_inline void record_packet_event(void *ctx,u32 direction, u64 pac
 
     // Send the event to userspace via the perf buffer
     events.perf_submit(ctx, &event, sizeof(event));
+#endif
 }
 
 // XDP Program for Incoming Packets
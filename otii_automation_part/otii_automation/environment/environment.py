@@ -21,6 +21,7 @@ class Environment(object):
     otii_dir: str
     log_dir: str
     log_file: str
+    args: Namespace
 
     @classmethod
     def init(cls, experiment=True) -> any:
@@ -39,8 +40,18 @@ class Environment(object):
             # Device arguments parser
             subparsers.add_parser('device', help='Launch experiment on device side')
 
+            # Estimator arguments parser
+            parser_estimate = subparsers.add_parser('estimate', help='Estimate power on device from live traffic')
+            parser_estimate.add_argument('-m', '--model', type=str, required=True, metavar='',
+                                         help='model exported by export_cnn_model.m')
+            parser_estimate.add_argument('-i', '--iface', type=str, default='wlan0', metavar='',
+                                         help='network interface to monitor')
+            parser_estimate.add_argument('-b', '--bin-size', type=float, default=0.5, metavar='',
+                                         help='bin size in seconds (as used for training)')
+
             # Retrieve configuration
             args = parser.parse_args()
+            cls.args = args
             if Mode.valueOf(args.mode) == Mode.CONTROLLER:
                 with open(args.config[0], 'rb') as fin:
                     cls.config: dict = tomli.load(fin)
@@ -60,7 +71,7 @@ class Environment(object):
                 cls.log_file = os.path.join(cls.log_dir, 'controller.log')
             else:
                 os.makedirs('logs', exist_ok=True)
-                cls.log_file = f'logs/device_{cls.timestamp}.log'
+                cls.log_file = f'logs/{args.mode}_{cls.timestamp}.log'
 
             # Logging configuration
             logging.basicConfig(
@@ -4,6 +4,7 @@ from enum import Enum
 class Mode(Enum):
     CONTROLLER = 'controller'
     DEVICE = 'device'
+    ESTIMATE = 'estimate'
 
     @classmethod
     def valueOf(cls, mode: str):
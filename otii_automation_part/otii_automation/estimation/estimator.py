@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+
+
+def _array(exported: dict) -> np.ndarray:
+    """ Rebuild an array exported by export_cnn_model.m (size + column-major data) """
+    return np.array(exported['data'], dtype=np.float64).reshape(exported['size'], order='F')
+
+
+class PowerEstimator:
+    """ Estimate power from a rolling window of binned traffic features
+
+    The model is the CNN trained by train_cnn_energy_model.m and exported to JSON by export_cnn_model.m:
+    the last sequence_length bins of the model features, normalized with the training mu/sigma, go through
+    1-D convolutions, batch normalizations, sigmoids, global average pooling and fully connected layers.
+    The forward pass only uses NumPy, layers are prepared once when loading the model.
+    """
+
+    def __init__(self, model_path: str):
+        with open(model_path) as fin:
+            model = json.load(fin)
+
+        if model['type'] != 'cnn':
+            raise ValueError(f'Unsupported model type: {model["type"]}')
+
+        self.features = model['features']
+        if isinstance(self.features, str):
+            self.features = [self.features]
+        self.sequence_length = int(model['sequence_length'])
+        self.use_log_target = bool(model['use_log_target'])
+        self.mu = _array(model['mu']).ravel()
+        self.sigma = _array(model['sigma']).ravel()
+        self.layers = [self._prepare(layer) for layer in model['layers']]
+
+        # Window of normalized features, oldest bin first
+        self.window = np.zeros((self.sequence_length, len(self.features)))
+        self.count = 0
+
+    @staticmethod
+    def _prepare(layer: dict) -> tuple:
+        if layer['type'] == 'conv1d':
+            weights = _array(layer['weights'])  # [filter size, channels, filters]
+            if weights.ndim == 2:
+                weights = weights[:, :, np.newaxis]
+            padding = np.ravel(layer.get('padding', [weights.shape[0] // 2] * 2)).astype(int)
+            return 'conv1d', weights, _array(layer['bias']).ravel(), padding
+        if layer['type'] == 'batchnorm':
+            # Fold normalization, scale and offset into a single affine transformation
+            scale = _array(layer['scale']).ravel() / np.sqrt(_array(layer['variance']).ravel() + layer['epsilon'])
+            shift = _array(layer['offset']).ravel() - _array(layer['mean']).ravel() * scale
+            return 'affine', scale, shift
+        if layer['type'] == 'fc':
+            return 'fc', _array(layer['weights']), _array(layer['bias']).ravel()
+        if layer['type'] in ('sigmoid', 'gap'):
+            return layer['type'],
+
+        raise ValueError(f'Unsupported layer type: {layer["type"]}')
+
+    def predict(self, window: np.ndarray) -> float:
+        """ Estimate power from a [timesteps x features] window of normalized features """
+        x = window
+        for layer in self.layers:
+            if layer[0] == 'conv1d':
+                _, weights, bias, padding = layer
+                padded = np.pad(x, ((padding[0], padding[1]), (0, 0)))
+                steps = padded.shape[0] - weights.shape[0] + 1
+                taps = np.stack([padded[k:k + steps] for k in range(weights.shape[0])])
+                x = np.einsum('ktc,kcf->tf', taps, weights) + bias
+            elif layer[0] == 'affine':
+                x = x * layer[1] + layer[2]
+            elif layer[0] == 'sigmoid':
+                x = 1 / (1 + np.exp(-x))
+            elif layer[0] == 'gap':
+                x = x.mean(axis=0)
+            elif layer[0] == 'fc':
+                x = layer[1] @ x + layer[2]
+
+        estimate = float(np.ravel(x)[0])
+
+        return float(np.exp(estimate)) if self.use_log_target else estimate
+
+    def update(self, features: dict) -> float | None:
+        """ Add the features of a new bin, return the power estimate once the window is full """
+        values = np.array([features[name] for name in self.features], dtype=np.float64)
+
+        self.window[:-1] = self.window[1:]
+        self.window[-1] = (values - self.mu) / self.sigma
+        self.count += 1
+
+        if self.count < self.sequence_length:
+            return None
+
+        return self.predict(self.window)
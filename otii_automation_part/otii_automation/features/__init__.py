@@ -0,0 +1,4 @@
+from .bins import FEATURE_NAMES, BIN_FIELDS, merge_bin_stats, bin_features
+from .extraction import COLUMN_NAMES, extract_features, aggregate_features, concat_features, list_experiments
+from .batch import process_experiments, assemble_blocks
+from .cache import FeatureCache
@@ -0,0 +1,58 @@
+import logging
+import os
+from argparse import ArgumentParser
+
+from .batch import process_experiments, assemble_blocks
+from .extraction import write_features_csv, read_features_csv, compare_features
+
+logger = logging.getLogger('features')
+
+
+def main():
+    parser = ArgumentParser(description='Extract binned traffic and power features of grouped experiments')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_extract = subparsers.add_parser('extract', help='compute aggregated features (as data_processing.m)')
+    parser_extract.add_argument('-o', '--output', type=str, default='aggregated_features.csv', help='output CSV')
+
+    parser_compare = subparsers.add_parser('compare', help='compare features with a reference table exported '
+                                                           'by data_processing.m')
+
+    for subparser in (parser_extract, parser_compare):
+        subparser.add_argument('data_dir', type=str, help='grouped experiments directory')
+        subparser.add_argument('-b', '--bin-size', type=float, default=0.5, help='bin size in seconds')
+        subparser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: CPUs)')
+        subparser.add_argument('--max-in-flight', type=int, default=None,
+                               help='max experiments loaded at once (default: one per worker)')
+        subparser.add_argument('--blocks-dir', type=str, default='feature_cache',
+                               help='cache directory of the per-experiment feature blocks')
+        subparser.add_argument('--cache-size', type=int, default=256, help='max cache size in MiB')
+
+    # After data_dir: compare <data_dir> <reference>
+    parser_compare.add_argument('reference', type=str, help='reference CSV (results/aggregated_features.csv)')
+    parser_compare.add_argument('--rtol', type=float, default=1e-9, help='relative tolerance')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(name)-15s][%(levelname)-7s] - %(message)s')
+
+    blocks, timings = process_experiments(args.data_dir, args.blocks_dir, args.bin_size, args.jobs,
+                                          args.max_in_flight, args.cache_size * 2 ** 20)
+    if timings:
+        slowest = max(timings, key=lambda timing: timing['seconds'])
+        logger.info(f'{len(timings)} experiments processed, total {sum(t["seconds"] for t in timings):.2f} s, '
+                    f'slowest {slowest["experiment"]} ({slowest["seconds"]:.2f} s)')
+    features = assemble_blocks(blocks)
+
+    if args.command == 'extract':
+        write_features_csv(args.output, features)
+        logger.info(f'Saved {len(features)} rows to {os.path.abspath(args.output)}')
+    else:
+        errors = compare_features(read_features_csv(args.reference), features, rtol=args.rtol)
+        for name, error in errors.items():
+            logger.info(f'{name:<22} max abs diff {error:.3g}')
+        logger.info('Features match the reference')
+
+
+if __name__ == '__main__':
+    main()
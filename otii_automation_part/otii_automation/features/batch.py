@@ -0,0 +1,91 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .cache import FeatureCache
+from .extraction import extract_features, list_experiments, concat_features
+from ..trace import ColumnarTrace, write_columnar, open_columnar
+
+logger = logging.getLogger('features')
+
+
+def _process_experiment(experiment_dir: str, block_path: str, bin_size: float, experiment_id: int) -> [int, float]:
+    """ Worker: compute the features of an experiment and write them to its block file """
+    start = time.perf_counter()
+    table = extract_features(experiment_dir, bin_size, experiment_id)
+
+    # Write then rename, an interrupted run must not leave a truncated block in the cache. The temporary file is
+    # per writer: experiments with the same content, or runs sharing the cache, write the same block
+    tmp_path = f'{block_path}.{os.getpid()}.tmp'
+    write_columnar(tmp_path, table)
+    os.replace(tmp_path, block_path)
+
+    return len(table), time.perf_counter() - start
+
+
+def process_experiments(data_dir: str, blocks_dir: str, bin_size: float = 0.5, workers: int = None,
+                        max_in_flight: int = None, max_cache_bytes: int = 256 * 2 ** 20) -> [list, list]:
+    """ Compute the features of all experiments of data_dir in a pool of worker processes
+
+    The features of each experiment are written to a columnar block in blocks_dir, so that only timing
+    information goes back to this process. At most max_in_flight experiments (default: one per worker)
+    are submitted at once, which bounds the number of traces loaded in memory.
+    blocks_dir is a FeatureCache: experiments whose traces did not change since a previous run are not
+    recomputed.
+    Returns the block paths (in experiment order) and the timing of each processed experiment.
+    """
+    experiments = list_experiments(data_dir)
+    cache = FeatureCache(blocks_dir, max_cache_bytes)
+
+    workers = workers or os.cpu_count()
+    max_in_flight = max(max_in_flight or workers, 1)
+
+    keys = [cache.key(os.path.join(data_dir, name), bin_size) for name in experiments]
+    blocks = [cache.path(key) for key in keys]
+    cache.save_index()
+
+    todo = [(i, name) for i, name in enumerate(experiments) if not cache.hit(keys[i])]
+    logger.info(f'{len(experiments) - len(todo)} experiments cached, {len(todo)} to process')
+
+    queue = iter(todo)
+    pending = {}
+    timings = []
+    failures = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit():
+            while len(pending) < max_in_flight:
+                task = next(queue, None)
+                if task is None:
+                    return
+                i, name = task
+                future = executor.submit(_process_experiment, os.path.join(data_dir, name), blocks[i], bin_size, i + 1)
+                pending[future] = name
+
+        submit()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    rows, elapsed = future.result()
+                    timings.append({'experiment': name, 'bins': rows, 'seconds': elapsed})
+                    logger.info(f'Processed {name}: {rows} bins in {elapsed:.2f} s '
+                                f'({len(timings) + len(failures)}/{len(todo)})')
+                except Exception as ex:
+                    failures[name] = ex
+                    logger.error(f'Processing {name} failed: {ex}')
+            submit()
+
+    cache.evict(keep=blocks)
+
+    if failures:
+        raise RuntimeError(f'Processing failed for {len(failures)} experiments: {", ".join(failures)}')
+
+    return blocks, timings
+
+
+def assemble_blocks(blocks: list) -> ColumnarTrace:
+    """ Build aggregated features from the blocks of the experiments """
+    return concat_features([open_columnar(block) for block in blocks])
@@ -0,0 +1,94 @@
+import math
+
+# Traffic features computed for each bin (same names and order as data_processing.m)
+FEATURE_NAMES = [
+    'TXBytes', 'RXBytes',
+    'MeanIAT', 'StdIAT', 'MaxIAT', 'MinIAT', 'BurstinessIAT', 'PacketRate',
+    'TXRatio', 'CountTX', 'CountRX', 'TX_RX_Ratio', 'TotalPacketCount',
+    'StdPacketLength', 'MaxPacketLength', 'MeanPacketLength',
+    'SkewPacketLength', 'KurtosisPacketLength'
+]
+
+# Counters kept by the eBPF program for each bin (struct bin_stats in data_logger.c)
+BIN_FIELDS = [
+    'tx_bytes', 'rx_bytes', 'tx_count', 'rx_count',
+    'iat_sum', 'iat_us_sum', 'iat_sq_sum', 'iat_min', 'iat_max',
+    'len_max', 'len_sq_sum', 'len_cube_sum', 'len_p4_lo', 'len_p4_hi'
+]
+
+
+def merge_bin_stats(per_cpu) -> dict:
+    """ Merge the per-CPU copies of a bin into a single set of counters """
+    merged = {field: 0 for field in BIN_FIELDS}
+    merged['len_p4_sum'] = 0
+    iat_min = None
+
+    for stats in per_cpu:
+        count = stats.tx_count + stats.rx_count
+        if count == 0:
+            continue
+
+        for field in BIN_FIELDS:
+            if field not in ('iat_min', 'iat_max', 'len_max'):
+                merged[field] += getattr(stats, field)
+
+        merged['len_p4_sum'] += (stats.len_p4_hi << 64) | stats.len_p4_lo
+        iat_min = stats.iat_min if iat_min is None else min(iat_min, stats.iat_min)
+        merged['iat_max'] = max(merged['iat_max'], stats.iat_max)
+        merged['len_max'] = max(merged['len_max'], stats.len_max)
+
+    merged['iat_min'] = iat_min or 0
+
+    return merged
+
+
+def bin_features(stats: dict, bin_size: float) -> dict:
+    """ Compute the traffic features of a bin from its merged counters """
+    tx_count, rx_count = stats['tx_count'], stats['rx_count']
+    n = tx_count + rx_count
+
+    # Empty bins are filled with zeros, as accumarray does
+    if n == 0:
+        return {name: 0 for name in FEATURE_NAMES}
+
+    # IAT statistics (seconds), the variance uses the sums of floored us IATs (squares kept in us^2 by the kernel)
+    mean_iat = stats['iat_sum'] / n / 1e9
+    std_iat = 0.0
+    if n > 1:
+        var_iat = (n * stats['iat_sq_sum'] - stats['iat_us_sum'] ** 2) / (n * (n - 1))
+        std_iat = math.sqrt(max(var_iat, 0.0)) / 1e6
+
+    # Packet length moments, computed exactly on integers:
+    # m2 = c2 / n^2, m3 = c3 / n^3, m4 = c4 / n^4
+    s1 = stats['tx_bytes'] + stats['rx_bytes']
+    s2, s3, s4 = stats['len_sq_sum'], stats['len_cube_sum'], stats['len_p4_sum']
+    c2 = n * s2 - s1 ** 2
+    c3 = n ** 2 * s3 - 3 * n * s1 * s2 + 2 * s1 ** 3
+    c4 = n ** 3 * s4 - 4 * n ** 2 * s1 * s3 + 6 * n * s1 ** 2 * s2 - 3 * s1 ** 4
+
+    std_length = math.sqrt(c2 / (n * (n - 1))) if n > 1 else 0.0
+
+    # skewness/kurtosis of a constant sample are NaN in MATLAB
+    skew_length = c3 / c2 ** 1.5 if c2 > 0 else math.nan
+    kurt_length = c4 / c2 ** 2 if c2 > 0 else math.nan
+
+    return {
+        'TXBytes': stats['tx_bytes'],
+        'RXBytes': stats['rx_bytes'],
+        'MeanIAT': mean_iat,
+        'StdIAT': std_iat,
+        'MaxIAT': stats['iat_max'] / 1e9,
+        'MinIAT': stats['iat_min'] / 1e9,
+        'BurstinessIAT': std_iat / mean_iat if mean_iat != 0 else 0,
+        'PacketRate': n / bin_size,
+        'TXRatio': tx_count / n,
+        'CountTX': tx_count,
+        'CountRX': rx_count,
+        'TX_RX_Ratio': tx_count / max(rx_count, 1),
+        'TotalPacketCount': n,
+        'StdPacketLength': std_length,
+        'MaxPacketLength': stats['len_max'],
+        'MeanPacketLength': s1 / n,
+        'SkewPacketLength': skew_length,
+        'KurtosisPacketLength': kurt_length
+    }
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from .extraction import FEATURES_VERSION, POWER_TRACE, GPI_TRACE, EBPF_TRACE
+from ..trace.columnar import EXTENSION
+
+logger = logging.getLogger('features')
+
+# Files of an experiment folder that determine its features
+MARKERS = 'markers.json'
+CACHED_FILES = [POWER_TRACE, GPI_TRACE, EBPF_TRACE, MARKERS]
+
+INDEX = 'index.json'
+CHUNK_SIZE = 1 << 20
+
+# Temporary block files not modified for this long (seconds) are left by interrupted runs
+STALE_TMP_AGE = 3600
+
+
+def file_digest(path: str) -> str:
+    """ SHA-256 of the content of a file """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fin:
+        while chunk := fin.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """ Content-addressed cache of experiment feature blocks
+
+    A block is identified by the content hash of the experiment traces, the bin size and the features version,
+    so that experiments are recomputed only when one of them changes. Hashes of traces are memoized by
+    (size, mtime) in the index of the cache. Least recently used blocks are evicted above max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.index_path = os.path.join(cache_dir, INDEX)
+        self.digests = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as fin:
+                self.digests = json.load(fin)
+
+    def _digest(self, path: str) -> str:
+        if not os.path.exists(path):
+            return 'missing'
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        memo = self.digests.get(path)
+        if memo is not None and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+
+        digest = file_digest(path)
+        self.digests[path] = [stat.st_size, stat.st_mtime_ns, digest]
+
+        return digest
+
+    def key(self, experiment_dir: str, bin_size: float) -> str:
+        """ Cache key of the features of an experiment """
+        key = hashlib.sha256(f'{FEATURES_VERSION}:{bin_size!r}'.encode())
+        for name in CACHED_FILES:
+            key.update(f'{name}:{self._digest(os.path.join(experiment_dir, name))}'.encode())
+
+        return key.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}{EXTENSION}')
+
+    def hit(self, key: str) -> bool:
+        """ Check if a block is cached, marking it as recently used """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return False
+
+        os.utime(path)
+        return True
+
+    def save_index(self) -> None:
+        self.digests = {path: memo for path, memo in self.digests.items() if os.path.exists(path)}
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as fout:
+            json.dump(self.digests, fout)
+        os.replace(tmp_path, self.index_path)
+
+    def evict(self, keep: list = ()) -> None:
+        """ Remove least recently used blocks until the cache fits max_bytes (blocks in keep are never removed)
+
+        Temporary block files left by interrupted runs are removed once stale (STALE_TMP_AGE), the ones still being
+        written by another run sharing the cache are kept.
+        """
+        keep = {os.path.abspath(path) for path in keep}
+        blocks = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp') and EXTENSION in name:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    if now - os.stat(path).st_mtime > STALE_TMP_AGE:
+                        os.remove(path)
+                        logger.debug(f'Removed stale {name}')
+                except FileNotFoundError:
+                    # Renamed or removed by its writer meanwhile
+                    pass
+            elif name.endswith(EXTENSION):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                blocks.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.cache_dir, name)))
+
+        total = sum(size for _, size, _ in blocks)
+        for _, size, path in sorted(blocks):
+            if total <= self.max_bytes:
+                break
+            if os.path.abspath(path) in keep:
+                continue
+            os.remove(path)
+            total -= size
+            logger.debug(f'Evicted {path}')
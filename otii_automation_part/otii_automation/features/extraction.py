@@ -0,0 +1,240 @@
+import os
+
+import numpy as np
+
+from .bins import FEATURE_NAMES
+from ..trace import ColumnarTrace, load_trace
+
+# Columns of a features table: traffic features, target and experiment index (as in data_processing.m)
+TARGET_NAME = 'MeanPower'
+COLUMN_NAMES = FEATURE_NAMES + [TARGET_NAME, 'ExperimentID']
+
+# Version of the feature definitions, to be increased when they change (invalidates cached features)
+FEATURES_VERSION = 1
+
+# Trace files of an experiment folder created by organize_experiments.py
+POWER_TRACE = 'power_trace.csv'
+GPI_TRACE = 'gpi_trace.csv'
+EBPF_TRACE = 'ebpf_trace.csv'
+
+
+def _bin_index(times: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """ 0-based bin of each value as histcounts does (last bin includes its right edge), -1 if outside """
+    idx = np.searchsorted(edges, times, side='right') - 1
+    idx[times == edges[-1]] = len(edges) - 2
+    idx[(times < edges[0]) | (times > edges[-1])] = -1
+
+    return idx
+
+
+def _grouped_extrema(idx: np.ndarray, values: np.ndarray, num_bins: int) -> [np.ndarray, np.ndarray]:
+    """ Per-bin min and max of values, idx must be sorted, empty bins are 0 """
+    minimum = np.zeros(num_bins)
+    maximum = np.zeros(num_bins)
+    if len(idx) == 0:
+        return minimum, maximum
+
+    starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+    minimum[idx[starts]] = np.minimum.reduceat(values, starts)
+    maximum[idx[starts]] = np.maximum.reduceat(values, starts)
+
+    return minimum, maximum
+
+
+def _grouped_moments(idx: np.ndarray, values: np.ndarray, count: np.ndarray, num_bins: int) -> list:
+    """ Per-bin mean and sums of the 2nd, 3rd and 4th powers of the deviations from the mean """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(idx, weights=values, minlength=num_bins) / count
+
+    deviation = values - mean[idx]
+    square = deviation * deviation
+    s2 = np.bincount(idx, weights=square, minlength=num_bins)
+    s3 = np.bincount(idx, weights=square * deviation, minlength=num_bins)
+    s4 = np.bincount(idx, weights=square * square, minlength=num_bins)
+
+    return [np.where(count > 0, mean, 0), s2, s3, s4]
+
+
+def _std(s2: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """ Sample standard deviation (0 for single values and empty bins) """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 1, np.sqrt(s2 / (count - 1)), 0)
+
+
+def traffic_features(timestamps_ns: np.ndarray, iat_ns: np.ndarray, packet_length: np.ndarray,
+                     direction: np.ndarray, bin_size: float = 0.5) -> [dict, np.ndarray]:
+    """ Compute the traffic features of each bin of an eBPF trace
+
+    Bins start at the earliest packet (the first one in data_processing.m, where events are in order). Returns the
+    features (one array per feature) and the bin edges in seconds.
+    """
+    if len(timestamps_ns) == 0:
+        return {name: np.zeros(0) for name in FEATURE_NAMES}, np.zeros(1)
+
+    # Align timestamps to the earliest packet (seconds), events from different CPUs may precede the first row
+    times = timestamps_ns.astype(np.float64) / 1e9 - float(timestamps_ns.min()) / 1e9
+    last_edge = np.ceil(times.max() / bin_size) * bin_size
+    num_bins = int(round(last_edge / bin_size))
+    edges = np.arange(num_bins + 1) * bin_size
+    if num_bins == 0:
+        return {name: np.zeros(0) for name in FEATURE_NAMES}, edges
+
+    # Sort packets by bin (events from different CPUs may be slightly out of order)
+    idx = _bin_index(times, edges)
+    order = np.argsort(idx, kind='stable')
+    idx = idx[order]
+    iat = iat_ns[order].astype(np.float64) / 1e9
+    length = packet_length[order].astype(np.float64)
+    outgoing = direction[order] == 1
+
+    count = np.bincount(idx, minlength=num_bins)
+    count_tx = np.bincount(idx, weights=outgoing, minlength=num_bins)
+    count_rx = count - count_tx
+
+    mean_iat, iat_s2, _, _ = _grouped_moments(idx, iat, count, num_bins)
+    min_iat, max_iat = _grouped_extrema(idx, iat, num_bins)
+    std_iat = _std(iat_s2, count)
+
+    mean_length, length_s2, length_s3, length_s4 = _grouped_moments(idx, length, count, num_bins)
+    _, max_length = _grouped_extrema(idx, length, num_bins)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Biased skewness and kurtosis, NaN for constant lengths (as MATLAB skewness/kurtosis)
+        m2 = length_s2 / count
+        skew_length = np.where(count > 0, (length_s3 / count) / m2 ** 1.5, 0)
+        kurt_length = np.where(count > 0, (length_s4 / count) / m2 ** 2, 0)
+
+        burstiness_iat = np.where(mean_iat != 0, std_iat / mean_iat, 0)
+        tx_ratio = np.where(count > 0, count_tx / count, 0)
+
+    features = {
+        'TXBytes': np.bincount(idx, weights=length * outgoing, minlength=num_bins),
+        'RXBytes': np.bincount(idx, weights=length * ~outgoing, minlength=num_bins),
+        'MeanIAT': mean_iat,
+        'StdIAT': std_iat,
+        'MaxIAT': max_iat,
+        'MinIAT': min_iat,
+        'BurstinessIAT': burstiness_iat,
+        'PacketRate': count / bin_size,
+        'TXRatio': tx_ratio,
+        'CountTX': count_tx,
+        'CountRX': count_rx,
+        'TX_RX_Ratio': count_tx / np.maximum(count_rx, 1),
+        'TotalPacketCount': count.astype(np.float64),
+        'StdPacketLength': _std(length_s2, count),
+        'MaxPacketLength': max_length,
+        'MeanPacketLength': mean_length,
+        'SkewPacketLength': skew_length,
+        'KurtosisPacketLength': kurt_length
+    }
+
+    return features, edges
+
+
+def power_window(gpi: ColumnarTrace) -> [float, float]:
+    """ Start and end (seconds) of the experiment: first two GPI samples set to 1 """
+    rising_edges = gpi['timestamp_ns'][gpi['value'] == 1]
+    if len(rising_edges) < 2:
+        raise ValueError('Expected at least two rising edges in GPI trace')
+
+    return rising_edges[0] / 1e9, rising_edges[1] / 1e9
+
+
+def mean_power(power: ColumnarTrace, start: float, end: float, edges: np.ndarray) -> np.ndarray:
+    """ Mean power of each bin, the trace is trimmed to [start, end] and shifted to start from 0 """
+    times = power['timestamp_ns'] / 1e9
+    in_range = (times >= start) & (times <= end)
+    times = times[in_range] - start
+    values = np.asarray(power['value'], dtype=np.float64)[in_range]
+
+    num_bins = len(edges) - 1
+    idx = _bin_index(times, edges)
+    valid = idx >= 0
+    count = np.bincount(idx[valid], minlength=num_bins)
+    total = np.bincount(idx[valid], weights=values[valid], minlength=num_bins)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def extract_features(experiment_dir: str, bin_size: float = 0.5, experiment_id: int = 1) -> ColumnarTrace:
+    """ Compute the features table of an experiment folder (one row per bin) """
+    gpi = load_trace(os.path.join(experiment_dir, GPI_TRACE))
+    power = load_trace(os.path.join(experiment_dir, POWER_TRACE))
+    ebpf = load_trace(os.path.join(experiment_dir, EBPF_TRACE))
+
+    start, end = power_window(gpi)
+    features, edges = traffic_features(ebpf['timestamp_ns'], ebpf['iat_ns'], ebpf['packet_length'],
+                                       ebpf['direction'], bin_size)
+    features[TARGET_NAME] = mean_power(power, start, end, edges)
+    features['ExperimentID'] = np.full(len(edges) - 1, experiment_id, dtype=np.float64)
+
+    return ColumnarTrace(features, {'experiment': os.path.basename(os.path.normpath(experiment_dir)),
+                                    'bin_size': bin_size})
+
+
+def list_experiments(data_dir: str) -> list:
+    """ Experiment folders of data_dir, in the order used by data_processing.m """
+    return sorted(name for name in os.listdir(data_dir)
+                  if os.path.isdir(os.path.join(data_dir, name)) and not name.startswith('.'))
+
+
+def concat_features(tables: list) -> ColumnarTrace:
+    """ Stack features tables and remove rows with any NaN (vertcat + rmmissing)
+
+    Experiments are numbered by their position in tables.
+    """
+    columns = {name: np.concatenate([table[name] for table in tables]) if tables else np.zeros(0)
+               for name in COLUMN_NAMES}
+    columns['ExperimentID'] = np.concatenate([np.full(len(table), i + 1, dtype=np.float64)
+                                              for i, table in enumerate(tables)]) if tables else np.zeros(0)
+    valid = ~np.any([np.isnan(column) for column in columns.values()], axis=0)
+
+    return ColumnarTrace({name: column[valid] for name, column in columns.items()},
+                         {'experiment_settings': [table.meta.get('experiment') for table in tables]})
+
+
+def aggregate_features(data_dir: str, bin_size: float = 0.5) -> ColumnarTrace:
+    """ Compute the aggregated features of all experiments in data_dir """
+    experiments = list_experiments(data_dir)
+    tables = [extract_features(os.path.join(data_dir, name), bin_size, i + 1) for i, name in enumerate(experiments)]
+
+    return concat_features(tables)
+
+
+def write_features_csv(path: str, table: ColumnarTrace) -> None:
+    """ Write a features table to CSV (same layout as writetable(aggregated_features)) """
+    np.savetxt(path, np.column_stack([table[name] for name in table.names]), delimiter=',',
+               header=','.join(table.names), comments='', fmt='%.17g')
+
+
+def read_features_csv(path: str) -> ColumnarTrace:
+    """ Read a features table from CSV, e.g. aggregated_features.csv exported by data_processing.m """
+    with open(path) as fin:
+        names = fin.readline().strip().split(',')
+    values = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+
+    return ColumnarTrace({name: values[:, i] for i, name in enumerate(names)})
+
+
+def compare_features(reference: ColumnarTrace, table: ColumnarTrace, rtol: float = 1e-9, atol: float = 1e-12) -> dict:
+    """ Compare a features table with a reference one, column by column
+
+    Returns the max absolute difference of each column (NaN in both tables are equal).
+    Raises ValueError if the tables do not have the same rows or a column differs more than the tolerances.
+    """
+    if len(reference) != len(table):
+        raise ValueError(f'Different number of rows: {len(reference)} (reference) != {len(table)}')
+
+    errors = {}
+    mismatches = []
+    for name in COLUMN_NAMES:
+        expected, actual = np.asarray(reference[name]), np.asarray(table[name])
+        errors[name] = float(np.nanmax(np.abs(expected - actual), initial=0))
+        if not np.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True):
+            mismatches.append(name)
+
+    if mismatches:
+        raise ValueError(f'Columns differ from reference: {", ".join(mismatches)} ({errors})')
+
+    return errors
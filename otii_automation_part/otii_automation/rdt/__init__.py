@@ -1,3 +1,6 @@
 # from .rdt import Rdt
 from .fast_rdt import FastRdt as Rdt
+from .binary_rdt import BinaryRdt
 from .message import Message
+from .metrics import LinkMetrics
+from .window_rdt import WindowRdt
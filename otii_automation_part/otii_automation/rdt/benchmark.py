@@ -0,0 +1,262 @@
+import json
+import logging
+import threading
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from .binary_rdt import BinaryRdt
+from .codec import decode_frame
+from .fast_rdt import FastRdt
+from .message import Message
+from .metrics import LinkMetrics
+from .rdt import Rdt
+from .udt.loopback import loopback_pair, PtyLink
+from .window_rdt import WindowRdt
+
+logger = logging.getLogger('rdt')
+
+# Bits on the wire per byte (start, 8 data bits, stop)
+BITS_PER_BYTE = 10
+
+# Messages exchanged during a configuration
+SAMPLE_MESSAGES = {
+    'START_CONFIG': (Message.START_CONFIG, {
+        'experiment': 'http', 'host': '192.168.1.10', 'port': 8080, 'payload_size': '100KB',
+        'radio_generation': 'WIFI', 'bandwidth': '100%', 'delay': 0.5, 'ebpf_mode': 'aggregate', 'bin_size': 0.5,
+        'power_model': None, 'results_dir': 'results/2025-05-05_16-19-57/1_0.5S_100_WIFI_100KB_000'
+    }),
+    'START_REQ': (Message.START_REQ, None),
+    'STOP_CONFIG': (Message.STOP_CONFIG, None),
+    'ERROR': (Message.ERROR, None)
+}
+
+# Protocols driven through a simulated link, built from a UDT
+PROTOCOLS = {
+    'rdt': Rdt,
+    'fast': FastRdt,
+    'binary': lambda udt: BinaryRdt(udt, 'binary'),
+    'window': WindowRdt
+}
+
+LATENCY_PERCENTILES = [50, 90, 99]
+
+# Receive timeout of the benchmark receiver (seconds)
+RECEIVE_TIMEOUT = 1.0
+
+
+class _CaptureUdt:
+    """ UDT keeping the last sent frame """
+    binary = True
+
+    def __init__(self):
+        self.frame = None
+
+    def send(self, msg: str) -> None:
+        self.frame = f'{msg}\n'.encode('utf-8')
+
+    def send_bytes(self, data: bytes) -> None:
+        self.frame = data
+
+
+def _time_per_call(function, repeat: int) -> float:
+    """ Mean duration of a call (us) """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def benchmark_codecs(repeat: int = 2000, baudrate: int = 115200) -> list:
+    """ Frame size, encoding and decoding time of the sample messages with JSON and binary framing """
+    udt = _CaptureUdt()
+    framings = {
+        'json': (FastRdt(udt), lambda frame: FastRdt.decode(frame.decode('utf-8').strip())),
+        'binary': (BinaryRdt(udt, 'binary'), decode_frame)
+    }
+
+    results = []
+    for name, (code, payload) in SAMPLE_MESSAGES.items():
+        for framing, (rdt, decode) in framings.items():
+            rdt.send(code, payload)
+            frame = udt.frame
+            results.append({
+                'message': name,
+                'framing': framing,
+                'bytes': len(frame),
+                'wire_ms': len(frame) * BITS_PER_BYTE / baudrate * 1e3,
+                'encode_us': _time_per_call(lambda: rdt.send(code, payload), repeat),
+                'decode_us': _time_per_call(lambda: decode(frame), repeat)
+            })
+
+    return results
+
+
+def _receive_messages(rdt, received: list, stats: dict, stop: threading.Event) -> None:
+    """ Receive messages until stop, recording their index and arrival time """
+    while not stop.is_set():
+        try:
+            msg, _ = rdt.receive(timeout=RECEIVE_TIMEOUT)
+        except Exception as ex:
+            if stop.is_set() or isinstance(ex, OSError):
+                # Link closed
+                break
+            # Timeout or message rejected (e.g. corrupted)
+            stats['errors'] += 1
+            continue
+
+        payload = msg.get('payload')
+        if isinstance(payload, dict) and 'index' in payload:
+            received.append((payload['index'], time.time()))
+
+
+def benchmark_protocol(protocol: str, messages: int = 100, transport: str = 'queue', drain: float = 10.0,
+                       **faults) -> dict:
+    """ Send START_CONFIG messages through a simulated link, faults are FaultyLink arguments
+
+    transport is 'queue' (in-process link) or 'pty' (UdtUartSerial on a pair of pseudo-terminals).
+    Retransmissions are the frames sent by the sender beyond one per message. The receiver waits up to drain
+    seconds after the last message is sent.
+    """
+    if transport == 'queue':
+        udt_sender, udt_receiver = loopback_pair(**faults)
+        links = (udt_sender.tx, udt_sender.rx)
+
+        def close():
+            udt_sender.close()
+    elif transport == 'pty':
+        from .udt.uart_serial import UdtUartSerial
+
+        pty = PtyLink(**faults)
+        udt_sender, udt_receiver = UdtUartSerial(pty.ports[0]), UdtUartSerial(pty.ports[1])
+        links = pty.links
+
+        def close():
+            pty.close()
+            udt_sender.ser.close()
+            udt_receiver.ser.close()
+    else:
+        raise ValueError(f'Unknown transport: {transport}')
+
+    sender, receiver = PROTOCOLS[protocol](udt_sender), PROTOCOLS[protocol](udt_receiver)
+    sender.metrics, receiver.metrics = LinkMetrics(), LinkMetrics()
+
+    received = []
+    stats = {'errors': 0}
+    stop = threading.Event()
+    thread = threading.Thread(target=_receive_messages, args=(receiver, received, stats, stop), daemon=True)
+    thread.start()
+
+    failed = None
+    try:
+        if isinstance(sender, WindowRdt):
+            sender.negotiate()
+        frames = links[0].stats['frames']
+
+        code, config = SAMPLE_MESSAGES['START_CONFIG']
+        payload_bytes = len(json.dumps(dict(config, index=0)))
+        sent_at = []
+        start = time.time()
+        try:
+            for i in range(messages):
+                sent_at.append(time.time())
+                sender.send(code, dict(config, index=i))
+            if isinstance(sender, WindowRdt):
+                sender.flush()
+        except Exception as ex:
+            failed = str(ex)
+
+        deadline = time.time() + drain
+        while len({index for index, _ in received}) < len(sent_at) and time.time() < deadline:
+            time.sleep(0.01)
+        delivered = {}
+        for index, arrival in received:
+            delivered.setdefault(index, arrival)
+        elapsed = (max(delivered.values()) if delivered else time.time()) - start
+        retransmissions = links[0].stats['frames'] - frames - len(sent_at)
+    finally:
+        stop.set()
+        close()
+        thread.join(timeout=RECEIVE_TIMEOUT * 2)
+
+    latencies = np.array([(arrival - sent_at[index]) * 1e3 for index, arrival in delivered.items()])
+    percentiles = np.percentile(latencies, LATENCY_PERCENTILES) if len(latencies) else [0.0] * len(LATENCY_PERCENTILES)
+
+    return {
+        'protocol': protocol,
+        'transport': transport,
+        'faults': faults,
+        'messages': messages,
+        'sent': len(sent_at),
+        'delivered': len(delivered),
+        'lost': len(sent_at) - len(delivered),
+        'duplicates': len(received) - len(delivered),
+        'rejected': stats['errors'],
+        'retransmissions': max(retransmissions, 0),
+        'seconds': elapsed,
+        'goodput_bps': len(delivered) * payload_bytes / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': {f'p{p:g}': float(v) for p, v in zip(LATENCY_PERCENTILES, percentiles)},
+        'max_latency_ms': float(latencies.max()) if len(latencies) else 0.0,
+        'link': [dict(link.stats) for link in links],
+        'metrics': {'sender': sender.metrics.snapshot(), 'receiver': receiver.metrics.snapshot()},
+        'failed': failed
+    }
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark RDT frame encodings, or protocols over a simulated link (link)')
+    parser.add_argument('-n', '--repeat', type=int, default=2000, help='calls per measure')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200, help='UART baudrate')
+    parser.add_argument('--json', type=str, default=None, help='save the results to a JSON file')
+    subparsers = parser.add_subparsers(dest='command')
+
+    parser_link = subparsers.add_parser('link', help='drive RDT protocols through a loopback link with faults')
+    parser_link.add_argument('-p', '--protocols', type=str, nargs='+', default=list(PROTOCOLS),
+                             choices=list(PROTOCOLS), help='protocols to benchmark')
+    parser_link.add_argument('-m', '--messages', type=int, default=100, help='messages per protocol')
+    parser_link.add_argument('-t', '--transport', type=str, default='queue', choices=['queue', 'pty'],
+                             help='in-process queues or pseudo-terminals')
+    parser_link.add_argument('--latency', type=float, default=0.0, help='one-way latency (s)')
+    parser_link.add_argument('--jitter', type=float, default=0.0, help='maximum additional latency (s)')
+    parser_link.add_argument('--drop', type=float, default=0.0, help='frame drop probability')
+    parser_link.add_argument('--duplicate', type=float, default=0.0, help='frame duplication probability')
+    parser_link.add_argument('--corruption', type=float, default=0.0, help='byte corruption probability')
+    parser_link.add_argument('--seed', type=int, default=None, help='seed of the simulated faults')
+    parser_link.add_argument('--drain', type=float, default=10.0,
+                             help='wait for late messages after the last one is sent (s)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(name)-15s][%(levelname)-7s] - %(message)s')
+
+    if args.command == 'link':
+        results = []
+        for protocol in args.protocols:
+            result = benchmark_protocol(
+                protocol, args.messages, args.transport, args.drain, baudrate=args.baudrate, latency=args.latency,
+                jitter=args.jitter, drop=args.drop, duplicate=args.duplicate, corruption=args.corruption,
+                seed=args.seed
+            )
+            results.append(result)
+
+            latency = ', '.join(f'{name} {value:.1f}' for name, value in result['latency_ms'].items())
+            failed = '' if result['failed'] is None else f' - failed: {result["failed"]}'
+            logger.info(f'{protocol:<6}: {result["delivered"]}/{result["sent"]} delivered '
+                        f'({result["duplicates"]} duplicates, {result["rejected"]} rejected), '
+                        f'{result["retransmissions"]} retransmissions, goodput {result["goodput_bps"]:.0f} B/s, '
+                        f'latency ms {latency}, max {result["max_latency_ms"]:.1f}{failed}')
+    else:
+        results = benchmark_codecs(args.repeat, args.baudrate)
+        for result in results:
+            logger.info(f'{result["message"]:<12} {result["framing"]:<6}: {result["bytes"]:4d} bytes '
+                        f'({result["wire_ms"]:.2f} ms on wire), encode {result["encode_us"]:.1f} us, '
+                        f'decode {result["decode_us"]:.1f} us')
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump(results, fout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+from .codec import encode_frame, decode_frame, is_binary_frame
+from .exception import RdtException
+from .fast_rdt import FastRdt
+from .message import Message
+from .util import logger
+
+MAX_SEQ = 2 ** 8
+
+
+class BinaryRdt:
+    """ FastRdt with compact binary frames (code byte, sequence number, binary payload, CRC-16)
+
+    Binary frames need a UDT able to carry bytes (send_bytes, receive_bytes), otherwise the JSON framing of
+    FastRdt is used. Received frames are decoded in both framings, and messages are sent in the framing last
+    received from the peer: framing='auto' starts with JSON (answers binary peers in binary), framing='binary'
+    starts with binary (falls back to JSON if the peer answers in JSON), framing='json' never sends binary frames.
+    """
+
+    def __init__(self, udt, framing: str = 'auto'):
+        if framing not in ('auto', 'binary', 'json'):
+            raise ValueError(f'Unknown framing: {framing}')
+
+        self.json = FastRdt(udt)
+        self.framing = framing
+        self.binary = framing == 'binary'
+        self.tx_seq = 0
+        self.rx_seq = None
+
+    @property
+    def metrics(self):
+        """ Link counters (LinkMetrics) shared with the JSON framing, disabled if None """
+        return self.json.metrics
+
+    @metrics.setter
+    def metrics(self, metrics) -> None:
+        self.json.metrics = metrics
+
+    @property
+    def udt(self):
+        return self.json.udt
+
+    @udt.setter
+    def udt(self, udt) -> None:
+        self.json.udt = udt
+
+    def _binary_udt(self) -> bool:
+        return getattr(self.udt, 'binary', False)
+
+    def udt_send(self, code: Message, payload: dict = None) -> None:
+        self.json.udt_send(code, payload)
+
+    def udt_receive(self) -> [str, float]:
+        return self.json.udt_receive()
+
+    def send(self, code: Message, payload: dict = None, **kwargs) -> None:
+        if not (self.binary and self._binary_udt()):
+            self.json.send(code, payload)
+            return
+
+        frame = encode_frame(code.value, self.tx_seq, payload)
+        self.udt.send_bytes(frame)
+        self.tx_seq = (self.tx_seq + 1) % MAX_SEQ
+
+        logger.debug(f'Sent binary: {code.value} {payload}')
+        if self.metrics is not None:
+            self.metrics.sent(len(frame))
+            self.metrics.messages_sent += 1
+
+    def receive(self, timeout=None) -> [dict, float]:
+        if not self._binary_udt():
+            return self.json.receive(timeout)
+
+        frame, timestamp = self.udt.receive_bytes(timeout=timeout)
+        binary = is_binary_frame(frame)
+        if binary:
+            msg = self._decode_binary(frame)
+        else:
+            rdt_pkt = frame.decode('utf-8', errors='replace').strip()
+            if self.metrics is not None:
+                msg = self.json.decode_counted(rdt_pkt, self.metrics)
+            else:
+                msg = self.json.decode(rdt_pkt)
+
+        # Only a valid frame tells the framing of the peer, not a timeout nor a corrupted frame (raised above)
+        if self.framing != 'json' and binary != self.binary:
+            logger.info(f'Peer uses {"binary" if binary else "JSON"} framing, switching to it')
+            self.binary = binary
+
+        return msg, timestamp
+
+    def _decode_binary(self, frame: bytes) -> dict:
+        metrics = self.metrics
+        if metrics is None:
+            code, seq, payload = decode_frame(frame)
+        else:
+            metrics.received(len(frame) + 1)
+            try:
+                code, seq, payload = decode_frame(frame)
+            except RdtException:
+                metrics.crc_failures += 1
+                raise
+            metrics.messages_received += 1
+
+        if self.rx_seq is not None and seq != (self.rx_seq + 1) % MAX_SEQ:
+            if metrics is not None:
+                if seq == self.rx_seq:
+                    metrics.duplicates += 1
+                else:
+                    metrics.lost += (seq - self.rx_seq - 1) % MAX_SEQ
+            logger.warning(f'{(seq - self.rx_seq - 1) % MAX_SEQ} messages lost before {seq}')
+        self.rx_seq = seq
+
+        logger.debug(f'Received binary: {code} {payload}')
+
+        msg = {'code': code}
+        if payload is not None:
+            msg['payload'] = payload
+
+        return msg
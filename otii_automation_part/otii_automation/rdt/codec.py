@@ -0,0 +1,206 @@
+import struct
+
+from .exception import RdtException
+
+# First byte of binary frames, text frames (JSON, windowed RDT) are ASCII
+MARKER = 0xB5
+
+# Frames end with a newline, as text frames: COBS output (no zero byte) is xored with it
+DELIMITER = 0x0A
+
+# Value tags of the payload encoding
+NONE, FALSE, TRUE, INT, FLOAT, STR, LIST, DICT, KNOWN_STR = range(9)
+
+# Strings encoded by their index (keys of the configuration message), new strings must be appended
+KNOWN_STRINGS = (
+    'experiment', 'host', 'port', 'payload_size', 'radio_generation', 'bandwidth', 'delay', 'ebpf_mode', 'bin_size',
+    'power_model', 'results_dir', 'transport_protocol', 'qos', 'topic', 'rate', 'duration', 'queue', 'http', 'aoi',
+    'packet', 'ringbuf', 'aggregate', 'WIFI', 'LTE', 'ETH', 'idle_signal'
+)
+KNOWN_INDEX = {string: i for i, string in enumerate(KNOWN_STRINGS)}
+
+FLOAT_FORMAT = struct.Struct('>d')
+
+
+def _crc_16_table() -> list:
+    """ Table of CRC-16/CCITT-FALSE (polynomial 0x1021) """
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+
+    return table
+
+
+CRC_16_TABLE = _crc_16_table()
+
+
+def crc_16(data: bytes) -> int:
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ CRC_16_TABLE[(crc >> 8) ^ byte]
+
+    return crc
+
+
+def cobs_encode(data: bytes) -> bytes:
+    """ Consistent overhead byte stuffing: data without zero bytes (1 byte overhead every 254) """
+    output = bytearray()
+    for block in data.split(b'\x00'):
+        while len(block) >= 254:
+            output.append(255)
+            output += block[:254]
+            block = block[254:]
+        output.append(len(block) + 1)
+        output += block
+
+    return bytes(output)
+
+
+def cobs_decode(data: bytes) -> bytes:
+    output = bytearray()
+    i = 0
+    while i < len(data):
+        code = data[i]
+        if code == 0 or i + code > len(data):
+            raise RdtException('Invalid COBS frame')
+        output += data[i + 1:i + code]
+        i += code
+        if code < 255 and i < len(data):
+            output.append(0)
+
+    return bytes(output)
+
+
+def _write_varint(output: bytearray, value: int) -> None:
+    while value >= 0x80:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def _read_varint(data: bytes, i: int) -> [int, int]:
+    value = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+
+def encode_value(value, output: bytearray = None) -> bytearray:
+    """ Compact binary encoding of JSON values (one tag byte, varint integers and lengths, known strings as index) """
+    if output is None:
+        output = bytearray()
+
+    if value is None:
+        output.append(NONE)
+    elif value is True or value is False:
+        output.append(TRUE if value else FALSE)
+    elif isinstance(value, int):
+        output.append(INT)
+        _write_varint(output, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif isinstance(value, float):
+        output.append(FLOAT)
+        output += FLOAT_FORMAT.pack(value)
+    elif isinstance(value, str) and value in KNOWN_INDEX:
+        output.append(KNOWN_STR)
+        output.append(KNOWN_INDEX[value])
+    elif isinstance(value, str):
+        encoded = value.encode('utf-8')
+        output.append(STR)
+        _write_varint(output, len(encoded))
+        output += encoded
+    elif isinstance(value, (list, tuple)):
+        output.append(LIST)
+        _write_varint(output, len(value))
+        for item in value:
+            encode_value(item, output)
+    elif isinstance(value, dict):
+        output.append(DICT)
+        _write_varint(output, len(value))
+        for key, item in value.items():
+            encode_value(str(key), output)
+            encode_value(item, output)
+    else:
+        raise TypeError(f'Cannot encode {type(value).__name__}')
+
+    return output
+
+
+def decode_value(data: bytes, i: int = 0) -> [any, int]:
+    """ Decode a value encoded by encode_value starting at i, return it and the index after it """
+    tag = data[i]
+    i += 1
+
+    if tag == NONE:
+        return None, i
+    if tag == FALSE or tag == TRUE:
+        return tag == TRUE, i
+    if tag == INT:
+        value, i = _read_varint(data, i)
+        return (value >> 1) if value & 1 == 0 else -((value + 1) >> 1), i
+    if tag == FLOAT:
+        return FLOAT_FORMAT.unpack_from(data, i)[0], i + FLOAT_FORMAT.size
+    if tag == STR:
+        length, i = _read_varint(data, i)
+        return bytes(data[i:i + length]).decode('utf-8'), i + length
+    if tag == KNOWN_STR:
+        return KNOWN_STRINGS[data[i]], i + 1
+    if tag == LIST:
+        length, i = _read_varint(data, i)
+        items = []
+        for _ in range(length):
+            item, i = decode_value(data, i)
+            items.append(item)
+        return items, i
+    if tag == DICT:
+        length, i = _read_varint(data, i)
+        items = {}
+        for _ in range(length):
+            key, i = decode_value(data, i)
+            items[key], i = decode_value(data, i)
+        return items, i
+
+    raise RdtException(f'Invalid value tag: {tag}')
+
+
+def encode_frame(code: int, seq: int, payload=None) -> bytes:
+    """ Binary frame: marker, then COBS of code, sequence number, payload and CRC-16, ended by a newline """
+    body = bytearray((code & 0xFF, seq & 0xFF))
+    if payload is not None:
+        encode_value(payload, body)
+    body += crc_16(body).to_bytes(2, byteorder='big')
+
+    return bytes([MARKER]) + bytes(byte ^ DELIMITER for byte in cobs_encode(body)) + bytes([DELIMITER])
+
+
+def is_binary_frame(frame: bytes) -> bool:
+    return len(frame) > 0 and frame[0] == MARKER
+
+
+def decode_frame(frame: bytes) -> [int, int, any]:
+    """ Code, sequence number and payload (None if empty) of a binary frame (with or without newline) """
+    if not is_binary_frame(frame):
+        raise RdtException('Not a binary frame')
+    if frame[-1] == DELIMITER:
+        frame = frame[:-1]
+
+    body = cobs_decode(bytes(byte ^ DELIMITER for byte in frame[1:]))
+    if len(body) < 4 or crc_16(body[:-2]) != int.from_bytes(body[-2:], byteorder='big'):
+        raise RdtException(f'Invalid crc {frame}')
+
+    payload = None
+    if len(body) > 4:
+        try:
+            payload, end = decode_value(body[:-2], 2)
+        except (IndexError, UnicodeDecodeError, struct.error) as ex:
+            raise RdtException(f'Invalid payload {frame}: {ex}')
+        if end != len(body) - 2:
+            raise RdtException(f'Invalid payload {frame}')
+
+    return body[0], body[1], payload
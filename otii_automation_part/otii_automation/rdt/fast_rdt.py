@@ -11,6 +11,9 @@ class FastRdt:
     def __init__(self, udt):
         self.udt = udt
 
+        # Link counters (LinkMetrics), disabled if None
+        self.metrics = None
+
     def udt_send(self, code: Message, payload: dict = None) -> None:
         if payload is None:
             msg = json.dumps({'code': code.value})
@@ -38,10 +41,39 @@ class FastRdt:
         self.udt.send(rdt_pkt)
 
         logger.debug(f'Sent: {msg}')
+        if self.metrics is not None:
+            self.metrics.sent(len(rdt_pkt) + 1)
+            self.metrics.messages_sent += 1
 
     def receive(self, timeout=None) -> [dict, float]:
 
         rdt_pkt, timestamp = self.udt.receive(timeout=timeout)
+        if self.metrics is None:
+            return self.decode(rdt_pkt), timestamp
+
+        return self.decode_counted(rdt_pkt, self.metrics), timestamp
+
+    @classmethod
+    def decode_counted(cls, rdt_pkt: str, metrics) -> dict:
+        """ decode, updating the counters of a received packet """
+        if rdt_pkt == '':
+            metrics.timeouts += 1
+        else:
+            metrics.received(len(rdt_pkt) + 1)
+
+        try:
+            msg = cls.decode(rdt_pkt)
+        except RdtException:
+            if rdt_pkt != '':
+                metrics.crc_failures += 1
+            raise
+
+        metrics.messages_received += 1
+        return msg
+
+    @staticmethod
+    def decode(rdt_pkt: str) -> dict:
+        """ Check and parse a received packet """
 
         # Check integrity (message format)
         if len(rdt_pkt) < 3:
@@ -58,6 +90,4 @@ class FastRdt:
         logger.debug(f"Received: {msg}")
 
         # Parse message
-        json_msg = json.loads(msg)
-
-        return json_msg, timestamp
+        return json.loads(msg)
@@ -10,6 +10,7 @@ class Message(Enum):
     END_EXPERIMENT = 5
     CONFIG_OK = 6
     NETWORK_INFO_OK = 7
+    IDLE = 8
     ERROR = 10
     RST = 127
     TEST = 128
@@ -0,0 +1,91 @@
+import time
+from bisect import bisect_left
+
+# Upper bounds of the RTT histogram buckets (ms), the last bucket counts the larger RTTs
+RTT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LinkMetrics:
+    """ Counters of an RDT endpoint
+
+    Protocols keep metrics = None by default and only update their counters when metrics are set
+    (e.g. rdt.metrics = LinkMetrics()), the disabled cost is one attribute check per frame.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.start = time.time()
+
+        # Messages delivered to and by the protocol
+        self.messages_sent = 0
+        self.messages_received = 0
+
+        # Frames on the wire (data, acks, hello), with their bytes including the newline
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+        self.retransmissions = 0
+        self.nacks_sent = 0
+        self.nacks_received = 0
+        self.crc_failures = 0
+        self.duplicates = 0
+        self.timeouts = 0
+        self.lost = 0
+
+        self.rtt_count = 0
+        self.rtt_sum = 0.0
+        self.rtt_min = None
+        self.rtt_max = None
+        self.rtt_histogram = [0] * (len(RTT_BUCKETS_MS) + 1)
+
+    def sent(self, size: int) -> None:
+        self.frames_sent += 1
+        self.bytes_sent += size
+
+    def received(self, size: int) -> None:
+        self.frames_received += 1
+        self.bytes_received += size
+
+    def rtt(self, seconds: float) -> None:
+        ms = seconds * 1e3
+        self.rtt_count += 1
+        self.rtt_sum += ms
+        self.rtt_min = ms if self.rtt_min is None else min(self.rtt_min, ms)
+        self.rtt_max = ms if self.rtt_max is None else max(self.rtt_max, ms)
+        self.rtt_histogram[bisect_left(RTT_BUCKETS_MS, ms)] += 1
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """ Counters as a dict (JSON serializable), reset them if requested """
+        snapshot = {
+            'seconds': time.time() - self.start,
+            'messages_sent': self.messages_sent,
+            'messages_received': self.messages_received,
+            'frames_sent': self.frames_sent,
+            'frames_received': self.frames_received,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'retransmissions': self.retransmissions,
+            'nacks_sent': self.nacks_sent,
+            'nacks_received': self.nacks_received,
+            'crc_failures': self.crc_failures,
+            'duplicates': self.duplicates,
+            'timeouts': self.timeouts,
+            'lost': self.lost,
+            'rtt_ms': {
+                'count': self.rtt_count,
+                'mean': self.rtt_sum / self.rtt_count if self.rtt_count else None,
+                'min': self.rtt_min,
+                'max': self.rtt_max,
+                'buckets': list(RTT_BUCKETS_MS),
+                'histogram': list(self.rtt_histogram)
+            }
+        }
+
+        if reset:
+            self.reset()
+
+        return snapshot
@@ -1,4 +1,5 @@
 import json
+import time
 
 from .exception import RdtException
 from .message import Message
@@ -13,6 +14,9 @@ class Rdt:
         self.tx_ctr = 0
         self.rx_ctr = 0
 
+        # Link counters (LinkMetrics), disabled if None
+        self.metrics = None
+
     def udt_send(self, code: Message, payload: dict = None) -> None:
         if payload is None:
             msg = json.dumps({'code': code.value})
@@ -39,15 +43,28 @@ class Rdt:
         ack = False
 
         reset_counter = 10
+        attempts = 0
         while not ack:
             # reset_counter -= 1
             if reset_counter < 0:
                 self._reset()
                 raise RdtException('RDT send failed too many times')
+            sent = time.time()
             self.udt.send(rdt_pkt)
             ack = self._recv_ack() or kwargs.get('no_ack', False)
 
+            if self.metrics is not None:
+                self.metrics.sent(len(rdt_pkt) + 1)
+                if attempts > 0:
+                    self.metrics.retransmissions += 1
+                # Karn's algorithm: no RTT sample from retransmitted messages
+                if ack and attempts == 0 and not kwargs.get('no_ack', False):
+                    self.metrics.rtt(time.time() - sent)
+            attempts += 1
+
         logger.debug(f'Sent: {msg}')
+        if self.metrics is not None:
+            self.metrics.messages_sent += 1
 
         # Update tx_ctr
         self.tx_ctr = (self.tx_ctr + 1) % MAX_CTR
@@ -63,6 +80,8 @@ class Rdt:
                 raise RdtException('RDT receive failed too many times')
 
             rdt_pkt, timestamp = self.udt.receive(timeout=timeout)
+            if self.metrics is not None:
+                self._count_received(rdt_pkt)
             if len(rdt_pkt) < 3:
                 self._send_ack(nack=True)
                 continue
@@ -74,6 +93,13 @@ class Rdt:
                 break
             else:
                 logger.debug(f'Invalid crc: {crc}')
+                if self.metrics is not None:
+                    # Retransmission of the previous message (its ack was lost) or corrupted message
+                    previous = ((self.rx_ctr - 1) % MAX_CTR).to_bytes(length=2, byteorder='big')
+                    if crc == crc_8(previous + msg.encode()):
+                        self.metrics.duplicates += 1
+                    else:
+                        self.metrics.crc_failures += 1
                 self._send_ack(nack=True)
 
         logger.debug(f"Received: {msg}")
@@ -84,8 +110,17 @@ class Rdt:
         # Update rx_ctr
         self.rx_ctr = (self.rx_ctr + 1) % MAX_CTR
 
+        if self.metrics is not None:
+            self.metrics.messages_received += 1
+
         return json_msg, timestamp
 
+    def _count_received(self, rdt_pkt: str) -> None:
+        if rdt_pkt == '':
+            self.metrics.timeouts += 1
+        else:
+            self.metrics.received(len(rdt_pkt) + 1)
+
     def _send_ack(self, nack=False) -> None:
         if nack:
             ctr = ((self.rx_ctr - 1) % MAX_CTR).to_bytes(2, byteorder='big')
@@ -95,14 +130,23 @@ class Rdt:
         ack = crc_8(ctr)
         self.udt.send(ack)
 
+        if self.metrics is not None:
+            self.metrics.sent(len(ack) + 1)
+            if nack:
+                self.metrics.nacks_sent += 1
+
         logger.debug(f'{"Nack" if nack else "Ack"} sent: {ctr}')
 
     def _recv_ack(self) -> bool:
         ack, _ = self.udt.receive(timeout=8)
+        if self.metrics is not None:
+            self._count_received(ack)
         if ack == '':
             return False
         if len(ack) != 2:
             logger.debug(f'Duplicated message: {ack}')
+            if self.metrics is not None:
+                self.metrics.duplicates += 1
             # Send nack (ack for the previous message)
             self._send_ack(nack=True)
             return False
@@ -111,6 +155,8 @@ class Rdt:
             return True
         else:
             logger.debug(f'Invalid ack: {ack}')
+            if self.metrics is not None:
+                self.metrics.nacks_received += 1
             return False
 
     def _reset(self):
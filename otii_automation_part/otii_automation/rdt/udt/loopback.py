@@ -0,0 +1,248 @@
+import heapq
+import os
+import random
+import threading
+import time
+import tty
+
+from .util import logger
+
+# Bits on the wire per byte (start, 8 data bits, stop)
+BITS_PER_BYTE = 10
+
+# Longest wait of blocking loops, to notice a closed link
+POLL_INTERVAL = 0.1
+
+
+class FaultyLink:
+    """ One direction of a simulated serial link
+
+    Frames (newline terminated) are delivered in order after their transmission time at baudrate (None: unlimited)
+    plus latency and a uniform jitter (reordering is not simulated, a jittered frame delays the following ones).
+    Each frame is dropped, or duplicated, with the given probability, and each of its bytes is corrupted (xored with
+    a random mask) with probability corruption: a corrupted newline splits the frame, as on a real UART.
+    """
+
+    def __init__(self, baudrate: int = None, latency: float = 0.0, jitter: float = 0.0, drop: float = 0.0,
+                 duplicate: float = 0.0, corruption: float = 0.0, seed: int = None):
+        self.baudrate = baudrate
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+        self.duplicate = duplicate
+        self.corruption = corruption
+        self.random = random.Random(seed)
+
+        self.condition = threading.Condition()
+        self.queue = []
+        self.counter = 0
+        self.idle_at = 0.0
+        self.last_arrival = 0.0
+        self.closed = False
+
+        self.stats = {'frames': 0, 'bytes': 0, 'dropped': 0, 'duplicated': 0, 'corrupted': 0}
+
+    def _corrupt(self, frame: bytes) -> bytes:
+        corrupted = bytearray(frame)
+        for i in range(len(corrupted)):
+            if self.random.random() < self.corruption:
+                corrupted[i] ^= self.random.randint(1, 255)
+
+        if corrupted != frame:
+            self.stats['corrupted'] += 1
+
+        return bytes(corrupted)
+
+    def put(self, frame: bytes) -> None:
+        """ Transmit a frame """
+        with self.condition:
+            self.stats['frames'] += 1
+            self.stats['bytes'] += len(frame)
+
+            # The UART is busy while the frame is transmitted, even if it is lost
+            now = time.time()
+            start = max(now, self.idle_at)
+            if self.baudrate:
+                self.idle_at = start + len(frame) * BITS_PER_BYTE / self.baudrate
+            else:
+                self.idle_at = start
+
+            if self.random.random() < self.drop:
+                self.stats['dropped'] += 1
+                return
+
+            copies = 1
+            if self.random.random() < self.duplicate:
+                self.stats['duplicated'] += 1
+                copies = 2
+
+            for _ in range(copies):
+                arrival = self.idle_at + self.latency + self.random.uniform(0, self.jitter)
+                self.last_arrival = max(arrival, self.last_arrival)
+                heapq.heappush(self.queue, (self.last_arrival, self.counter, self._corrupt(frame)))
+                self.counter += 1
+
+            self.condition.notify_all()
+
+    def get(self, timeout: float = None) -> bytes:
+        """ Next delivered frame, None if the timeout expires or the link is closed """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while not self.closed:
+                now = time.time()
+                if self.queue and self.queue[0][0] <= now:
+                    return heapq.heappop(self.queue)[2]
+
+                wake = self.queue[0][0] if self.queue else now + POLL_INTERVAL
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wake = min(wake, deadline)
+                self.condition.wait(min(wake - now, POLL_INTERVAL))
+
+        return None
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class UdtLoopback:
+    """ UDT endpoint of an in-process link (see loopback_pair) """
+    # Able to carry binary frames (send_bytes, receive_bytes)
+    binary = True
+
+    def __init__(self, tx: FaultyLink, rx: FaultyLink):
+        self.tx = tx
+        self.rx = rx
+        self.buffer = bytearray()
+
+        # Build time (used as base time, as for uart serial)
+        self.reference = time.time()
+
+    def send(self, message: str) -> None:
+        self.tx.put(f'{message}\n'.encode('UTF-8'))
+        logger.debug(f'Sent on loopback: {message}')
+
+    def send_bytes(self, data: bytes) -> None:
+        """ Send a binary frame, data must end with a newline and not contain others """
+        self.tx.put(data)
+        logger.debug(f'Sent on loopback: {data}')
+
+    def receive_bytes(self, timeout: float = None) -> [bytes, float]:
+        """ Receive a frame up to a newline (excluded), empty if the timeout expires """
+        deadline = None if timeout is None else time.time() + timeout
+        while b'\n' not in self.buffer:
+            if self.rx.closed:
+                raise ConnectionError('Loopback link closed')
+
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                logger.debug(f'Timeout expired')
+                return b'', time.time() - self.reference
+
+            data = self.rx.get(remaining)
+            if data is not None:
+                self.buffer += data
+
+        end = self.buffer.index(b'\n')
+        message = bytes(self.buffer[:end])
+        del self.buffer[:end + 1]
+        logger.debug(f'Received from loopback: {message}')
+
+        return message, time.time() - self.reference
+
+    def receive(self, timeout: float = None) -> [str, float]:
+        message, timestamp = self.receive_bytes(timeout)
+
+        return message.decode('UTF-8', errors='replace').strip(), timestamp
+
+    def close(self) -> None:
+        self.tx.close()
+        self.rx.close()
+
+
+def loopback_pair(**faults) -> [UdtLoopback, UdtLoopback]:
+    """ Two connected in-process UDTs, faults (FaultyLink arguments) are applied in both directions
+
+    With a seed, each direction gets its own seed derived from it.
+    """
+    seed = faults.pop('seed', None)
+    forward = FaultyLink(seed=seed, **faults)
+    backward = FaultyLink(seed=None if seed is None else seed + 1, **faults)
+
+    return UdtLoopback(forward, backward), UdtLoopback(backward, forward)
+
+
+class PtyLink:
+    """ Two Linux pseudo-terminals connected through FaultyLinks
+
+    Programs open the ports (e.g. UdtUartSerial(port)) as serial devices: bytes written on one port are read from
+    the other after the simulated faults. Frames are forwarded by background threads until close.
+    """
+
+    def __init__(self, **faults):
+        seed = faults.pop('seed', None)
+        self.links = (
+            FaultyLink(seed=seed, **faults),
+            FaultyLink(seed=None if seed is None else seed + 1, **faults)
+        )
+
+        self.masters = []
+        self.slaves = []
+        self.ports = []
+        for _ in range(2):
+            master, slave = os.openpty()
+            # No echo nor newline translation
+            tty.setraw(slave)
+            self.masters.append(master)
+            self.slaves.append(slave)
+            self.ports.append(os.ttyname(slave))
+
+        self.closed = False
+        self.threads = []
+        for i in range(2):
+            self.threads.append(threading.Thread(target=self._read, args=(self.masters[i], self.links[i]), daemon=True))
+            self.threads.append(threading.Thread(target=self._write, args=(self.links[i], self.masters[1 - i]),
+                                                 daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def _read(self, master: int, link: FaultyLink) -> None:
+        """ Split the bytes written on a port into frames and transmit them """
+        buffer = bytearray()
+        while not self.closed:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                # Slave closed or link closed
+                if self.closed:
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            buffer += data
+            while b'\n' in buffer:
+                end = buffer.index(b'\n') + 1
+                link.put(bytes(buffer[:end]))
+                del buffer[:end]
+
+    def _write(self, link: FaultyLink, master: int) -> None:
+        while not self.closed:
+            frame = link.get(POLL_INTERVAL)
+            if frame is not None:
+                try:
+                    os.write(master, frame)
+                except OSError:
+                    break
+
+    def close(self) -> None:
+        self.closed = True
+        for link in self.links:
+            link.close()
+        for fd in self.masters + self.slaves:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
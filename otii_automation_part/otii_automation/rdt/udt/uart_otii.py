@@ -1,9 +1,17 @@
 import time
+from collections import deque
 
 from .util import logger
 from otii_tcp_client.arc import Arc
 from otii_tcp_client.recording import Recording
 
+# Polling interval of the rx channel (seconds): reset to the minimum when data arrives, doubled while idle
+MIN_POLL_INTERVAL = 0.005
+MAX_POLL_INTERVAL = 0.1
+
+# Maximum rx entries fetched per request
+MAX_FETCH = 1000
+
 
 class UdtUartOtii:
 
@@ -14,36 +22,69 @@ class UdtUartOtii:
         # Otii current recording
         self.recording = recording
 
-        # Init recv message counter
+        # Init recv message counter (rx entries fetched from the recording)
         self.c_msg = 0
 
+        # Fetched messages not received yet (value, Otii timestamp)
+        self.buffer = deque()
+
+        self.poll_interval = MIN_POLL_INTERVAL
+
     def send(self, msg: str) -> None:
         logger.debug(f'Sending on uart channel...')
         self.arc.write_tx(f'{msg}\n')
         logger.debug(f'Sent on uart channel: {msg}')
 
-    def receive(self, timeout=None) -> [str, float]:
-        logger.debug(f'Receiving from uart channel...')
-
-        start_recv = time.time()
-        while (self.recording.get_channel_data_count(self.arc.id, 'rx') - self.c_msg) == 0:
-            if timeout is not None and time.time() - start_recv > timeout:
-                logger.debug(f'Timeout expired')
-                return '', 0
+    def _fetch(self) -> int:
+        """ Fetch all pending rx entries in one request, return the number of fetched entries """
+        count = self.recording.get_channel_data_count(self.arc.id, 'rx') - self.c_msg
+        if count <= 0:
+            return 0
 
         rx_data = self.recording.get_channel_data(
             self.arc.id,
             channel='rx',
             index=self.c_msg,
-            count=1
+            count=min(count, MAX_FETCH)
         )
 
-        logger.debug(f'Received from uart channel: {rx_data["values"][0]}')
+        values = rx_data['values']
+        self.buffer.extend((message['value'], message['timestamp']) for message in values)
+        self.c_msg += len(values)
+
+        return len(values)
 
-        # Extract data
-        message = rx_data['values'][0]
+    def poll(self) -> [str, float]:
+        """ Next received message and its timestamp, None if there is none (does not block) """
+        if not self.buffer:
+            self._fetch()
+
+        if not self.buffer:
+            return None
+
+        message = self.buffer.popleft()
+        logger.debug(f'Received from uart channel: {message[0]}')
+
+        return message
+
+    def receive(self, timeout=None) -> [str, float]:
+        logger.debug(f'Receiving from uart channel...')
+
+        start_recv = time.time()
+        while True:
+            message = self.poll()
+            if message is not None:
+                self.poll_interval = MIN_POLL_INTERVAL
+                return message
 
-        # Update received messages counter
-        self.c_msg += 1
+            wait = self.poll_interval
+            if timeout is not None:
+                remaining = timeout - (time.time() - start_recv)
+                if remaining <= 0:
+                    logger.debug(f'Timeout expired')
+                    return '', 0
+                wait = min(wait, remaining)
 
-        return message['value'], message['timestamp']
+            # Back off while the channel is idle
+            time.sleep(wait)
+            self.poll_interval = min(self.poll_interval * 2, MAX_POLL_INTERVAL)
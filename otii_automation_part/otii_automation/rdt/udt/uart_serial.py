@@ -4,6 +4,9 @@ from .util import logger
 
 
 class UdtUartSerial:
+    # Able to carry binary frames (send_bytes, receive_bytes)
+    binary = True
+
     def __init__(self, port):
         self.ser = serial.Serial(
             port=port,
@@ -40,10 +43,30 @@ class UdtUartSerial:
         self.ser.timeout = timeout
 
         logger.debug(f'Receiving from uart channel...')
-        message = self.ser.readline().decode('UTF-8').strip()
+        # Binary frames (or line noise) are not valid UTF-8: replaced characters then fail the CRC check
+        message = self.ser.readline().decode('UTF-8', errors='replace').strip()
         if message == '':
             logger.debug(f'Timeout expired')
         else:
             logger.debug(f'Received from uart channel: {message}')
 
-        return message, time.time() - self.reference
\ No newline at end of file
+        return message, time.time() - self.reference
+
+    def send_bytes(self, data: bytes) -> None:
+        """ Send a binary frame, data must end with a newline and not contain others """
+        self.ser.write(data)
+        logger.debug(f'Sent on uart channel: {data}')
+
+    def receive_bytes(self, timeout: float = None) -> [bytes, float]:
+        """ Receive a frame up to a newline (excluded), without decoding it """
+        self.ser.timeout = timeout
+
+        message = self.ser.readline()
+        if message.endswith(b'\n'):
+            message = message[:-1]
+        if message == b'':
+            logger.debug(f'Timeout expired')
+        else:
+            logger.debug(f'Received from uart channel: {message}')
+
+        return message, time.time() - self.reference
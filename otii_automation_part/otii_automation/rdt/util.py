@@ -4,11 +4,13 @@ from crc import Calculator, Configuration, Crc8
 
 CONFIG: Configuration = Crc8.CCITT.value
 
+# Table-driven calculator, built once
+CALCULATOR = Calculator(CONFIG, optimized=True)
+
 logger = logging.getLogger('rdt')
 
 
 def crc_8(data: bytes) -> str:
-    calculator = Calculator(CONFIG)
-    crc = calculator.checksum(data)
+    crc = CALCULATOR.checksum(data)
 
     return f'{crc:02x}'
@@ -0,0 +1,384 @@
+import json
+import time
+from collections import deque
+
+from .exception import RdtException
+from .fast_rdt import FastRdt
+from .message import Message
+from .util import crc_8, logger
+
+# Frame types
+HELLO = 'H'
+DATA = 'D'
+ACK = 'A'
+
+# Hello roles
+HELLO_REQUEST = '0'
+HELLO_REPLY = '1'
+
+VERSION = 1
+
+# Frames are protected with a salted CRC, Rdt and FastRdt peers reject them as corrupted
+CRC_SALT = b'W'
+
+# Sequence numbers on the wire (32 bits, hex encoded)
+SEQ_MOD = 2 ** 32
+
+# Frames following the cumulative ack in the selective ack bitmap
+SACK_BITS = 32
+
+DEFAULT_WINDOW = 8
+MAX_RETRIES = 10
+
+# Retransmission timeout bounds (seconds), the upper bound is the ack timeout of Rdt
+INITIAL_RTO = 1.0
+MIN_RTO = 0.2
+MAX_RTO = 8.0
+
+# Shortest wait on the channel (seconds)
+MIN_WAIT = 0.01
+
+
+class _PushbackUdt:
+    """ UDT wrapper that returns a pushed back frame before reading the channel """
+
+    def __init__(self, udt):
+        self.udt = udt
+        self.pending = None
+
+    @property
+    def binary(self) -> bool:
+        return getattr(self.udt, 'binary', False)
+
+    def send(self, msg: str) -> None:
+        self.udt.send(msg)
+
+    def send_bytes(self, data: bytes) -> None:
+        self.udt.send_bytes(data)
+
+    def receive_bytes(self, timeout=None) -> [bytes, float]:
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            return pending
+
+        if self.binary:
+            return self.udt.receive_bytes(timeout=timeout)
+        msg, timestamp = self.udt.receive(timeout=timeout)
+        return msg.encode(encoding='utf-8'), timestamp
+
+    def receive(self, timeout=None) -> [str, float]:
+        data, timestamp = self.receive_bytes(timeout=timeout)
+        return data.decode(encoding='utf-8', errors='replace').strip(), timestamp
+
+
+class WindowRdt:
+    """ Pipelined RDT with selective repeat
+
+    Up to window messages are in flight, each with a 32-bit sequence number. The receiver buffers out of order
+    messages and acknowledges with the next expected sequence number plus a bitmap of the following received ones.
+    Each message has its own retransmission timeout, computed from the RTT measured on acks (RFC 6298).
+    Frames are processed while send, receive or flush run, there is no background thread.
+
+    The windowed mode is negotiated with a hello frame (negotiate). Peers that do not answer it (Rdt, FastRdt)
+    are spoken to with the fallback protocol, which a passive peer also uses until it receives a hello.
+    fallback builds the fallback protocol from a UDT (e.g. FastRdt, BinaryRdt).
+    """
+
+    def __init__(self, udt, window: int = DEFAULT_WINDOW, fallback=FastRdt):
+        self._channel = _PushbackUdt(udt)
+        self.fallback = fallback(self._channel)
+        self.window = window
+        self.windowed = False
+        self._reset_session()
+
+    @property
+    def metrics(self):
+        """ Link counters (LinkMetrics) shared with the fallback protocol, disabled if None """
+        return self.fallback.metrics
+
+    @metrics.setter
+    def metrics(self, metrics) -> None:
+        self.fallback.metrics = metrics
+
+    @property
+    def udt(self):
+        return self._channel.udt
+
+    @udt.setter
+    def udt(self, udt) -> None:
+        self._channel.udt = udt
+
+    def _reset_session(self) -> None:
+        # Sender: next sequence number and unacknowledged frames (seq -> [frame, sent time, retries])
+        self.next_seq = 0
+        self.unacked = {}
+
+        # Receiver: next in-order sequence number, out of order and delivered messages
+        self.expected = 0
+        self.out_of_order = {}
+        self.inbox = deque()
+
+        self.srtt = None
+        self.rttvar = None
+        self.rto = INITIAL_RTO
+
+    def udt_send(self, code: Message, payload: dict = None) -> None:
+        self.fallback.udt_send(code, payload)
+
+    def udt_receive(self) -> [str, float]:
+        return self.fallback.udt_receive()
+
+    @staticmethod
+    def _frame(kind: str, body: str) -> str:
+        text = f'{kind}{body}'
+        return f'{text}{crc_8(CRC_SALT + text.encode(encoding="utf-8"))}'
+
+    @staticmethod
+    def _parse(rdt_pkt: str) -> [str, str]:
+        """ Type and body of a frame, None if corrupted """
+        if len(rdt_pkt) < 3 or rdt_pkt[-2:] != crc_8(CRC_SALT + rdt_pkt[:-2].encode(encoding='utf-8')):
+            return None
+
+        return rdt_pkt[0], rdt_pkt[1:-2]
+
+    @staticmethod
+    def _unwrap(seq: int, reference: int) -> int:
+        """ Sequence number closest to reference with the given value on the wire """
+        diff = (seq - reference) % SEQ_MOD
+        if diff >= SEQ_MOD // 2:
+            diff -= SEQ_MOD
+
+        return reference + diff
+
+    def _hello(self, role: str) -> str:
+        return self._frame(HELLO, f'{VERSION:02x}{self.window:04x}{role}')
+
+    def negotiate(self, timeout: float = 2.0, attempts: int = 3) -> bool:
+        """ Propose the windowed mode to the peer, use the fallback protocol if it does not answer """
+        for _ in range(attempts):
+            self._send_frame(self._hello(HELLO_REQUEST))
+            rdt_pkt, _ = self._channel.receive(timeout=timeout)
+            if rdt_pkt == '':
+                if self.metrics is not None:
+                    self.metrics.timeouts += 1
+                continue
+            if self.metrics is not None:
+                self.metrics.received(len(rdt_pkt) + 1)
+
+            frame = self._parse(rdt_pkt)
+            if frame is not None and frame[0] == HELLO and frame[1][6:] == HELLO_REPLY:
+                self._start_session(frame[1])
+                logger.info(f'Windowed RDT negotiated (window {self.window})')
+                return True
+
+            # Answered with another protocol (e.g. an error message or a nack)
+            logger.debug(f'Unexpected answer to hello: {rdt_pkt}')
+            break
+
+        self.windowed = False
+        logger.info('Peer does not support windowed RDT, using fallback protocol')
+        return False
+
+    def _start_session(self, hello: str) -> None:
+        version, window = int(hello[:2], 16), int(hello[2:6], 16)
+        if version != VERSION:
+            raise RdtException(f'Unsupported windowed RDT version: {version}')
+
+        self._reset_session()
+        self.window = min(self.window, window)
+        self.windowed = True
+
+    def send(self, code: Message, payload: dict = None, **kwargs) -> None:
+        if not self.windowed:
+            self.fallback.send(code, payload, **kwargs)
+            return
+
+        if payload is None:
+            msg = json.dumps({'code': code.value})
+        else:
+            msg = json.dumps({'code': code.value, 'payload': payload})
+
+        # Acks received while not reading (e.g. during a long run) must not trigger retransmissions
+        if self.unacked:
+            self._drain()
+
+        # Wait for a free slot in the window
+        self._retransmit()
+        while len(self.unacked) >= self.window:
+            self._pump()
+
+        seq = self.next_seq
+        frame = self._frame(DATA, f'{seq % SEQ_MOD:08x}{msg}')
+        self.unacked[seq] = [frame, time.time(), 0]
+        self.next_seq += 1
+        self._send_frame(frame)
+
+        logger.debug(f'Sent {seq}: {msg}')
+        if self.metrics is not None:
+            self.metrics.messages_sent += 1
+
+    def receive(self, timeout=None) -> [dict, float]:
+        deadline = None if timeout is None else time.time() + timeout
+
+        while not self.inbox:
+            if not self.windowed:
+                # A hello starts a windowed session, other packets are for the fallback protocol
+                remaining = None if deadline is None else max(deadline - time.time(), MIN_WAIT)
+                data, timestamp = self._channel.receive_bytes(timeout=remaining)
+                frame = self._parse(data.decode(encoding='utf-8', errors='replace').strip())
+                if frame is not None and frame[0] == HELLO:
+                    if self.metrics is not None:
+                        self.metrics.received(len(data) + 1)
+                    self._dispatch(frame, timestamp)
+                    continue
+
+                self._channel.pending = (data, timestamp)
+                return self.fallback.receive(timeout)
+
+            if deadline is not None and time.time() >= deadline:
+                raise RdtException('Timeout expired')
+            self._pump(deadline)
+
+        msg, timestamp = self.inbox.popleft()
+        logger.debug(f'Received: {msg}')
+        if self.metrics is not None:
+            self.metrics.messages_received += 1
+
+        return msg, timestamp
+
+    def flush(self, timeout=None) -> None:
+        """ Wait until all sent messages are acknowledged """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.windowed and self.unacked:
+            if deadline is not None and time.time() >= deadline:
+                raise RdtException(f'{len(self.unacked)} messages not acknowledged')
+            self._pump(deadline)
+
+    def _pump(self, deadline: float = None) -> None:
+        """ Process at most one packet, waiting until the next retransmission or the deadline """
+        wake = deadline
+        for _, sent, retries in self.unacked.values():
+            retransmission = sent + self._timeout(retries)
+            wake = retransmission if wake is None else min(wake, retransmission)
+
+        wait = None if wake is None else max(wake - time.time(), MIN_WAIT)
+        rdt_pkt, timestamp = self._channel.receive(timeout=wait)
+        if rdt_pkt != '':
+            self._handle(rdt_pkt, timestamp)
+
+        self._retransmit()
+
+    def _drain(self) -> None:
+        """ Process the packets already received (e.g. acks), waiting at most MIN_WAIT for each """
+        while True:
+            rdt_pkt, timestamp = self._channel.receive(timeout=MIN_WAIT)
+            if rdt_pkt == '':
+                return
+            self._handle(rdt_pkt, timestamp)
+
+    def _handle(self, rdt_pkt: str, timestamp: float) -> None:
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.received(len(rdt_pkt) + 1)
+
+        frame = self._parse(rdt_pkt)
+        if frame is None:
+            logger.debug(f'Invalid crc: {rdt_pkt}')
+            if metrics is not None:
+                metrics.crc_failures += 1
+        else:
+            self._dispatch(frame, timestamp)
+
+    def _dispatch(self, frame: [str, str], timestamp: float) -> None:
+        kind, body = frame
+
+        if kind == HELLO:
+            # A request (re)starts the session, replies to previous requests are ignored
+            if body[6:] == HELLO_REQUEST:
+                self._start_session(body)
+                self._send_frame(self._hello(HELLO_REPLY))
+                logger.info(f'Windowed RDT session started by peer (window {self.window})')
+        elif kind == DATA:
+            seq = self._unwrap(int(body[:8], 16), self.expected)
+            if self.expected <= seq < self.expected + self.window:
+                if seq not in self.out_of_order:
+                    self.out_of_order[seq] = (json.loads(body[8:]), timestamp)
+                while self.expected in self.out_of_order:
+                    self.inbox.append(self.out_of_order.pop(self.expected))
+                    self.expected += 1
+            else:
+                logger.debug(f'Duplicated message: {seq}')
+                if self.metrics is not None:
+                    self.metrics.duplicates += 1
+            self._send_ack()
+        elif kind == ACK:
+            base = min(self.unacked, default=self.next_seq)
+            self._process_ack(self._unwrap(int(body[:8], 16), base), int(body[8:16], 16))
+
+    def _send_ack(self) -> None:
+        bitmap = 0
+        for i in range(SACK_BITS):
+            if self.expected + 1 + i in self.out_of_order:
+                bitmap |= 1 << i
+
+        self._send_frame(self._frame(ACK, f'{self.expected % SEQ_MOD:08x}{bitmap:08x}'))
+        # A selective ack reports holes to the sender
+        if bitmap and self.metrics is not None:
+            self.metrics.nacks_sent += 1
+
+    def _send_frame(self, frame: str) -> None:
+        self.udt.send(frame)
+        if self.metrics is not None:
+            self.metrics.sent(len(frame) + 1)
+
+    def _process_ack(self, cumulative: int, bitmap: int) -> None:
+        now = time.time()
+        if bitmap and self.metrics is not None:
+            self.metrics.nacks_received += 1
+        for seq in list(self.unacked):
+            offset = seq - cumulative - 1
+            if seq < cumulative or (0 <= offset < SACK_BITS and bitmap >> offset & 1):
+                _, sent, retries = self.unacked.pop(seq)
+                # Karn's algorithm: no RTT sample from retransmitted messages
+                if retries == 0:
+                    self._update_rto(now - sent)
+
+        # Holes before a selectively acknowledged message are retransmitted without waiting for their timeout
+        if bitmap and self.srtt is not None:
+            highest = cumulative + bitmap.bit_length()
+            for seq, entry in self.unacked.items():
+                if seq < highest and now - entry[1] > self.srtt:
+                    self._resend(seq, entry, now)
+
+    def _update_rto(self, rtt: float) -> None:
+        if self.metrics is not None:
+            self.metrics.rtt(rtt)
+
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+        self.rto = min(max(self.srtt + 4 * self.rttvar, MIN_RTO), MAX_RTO)
+
+    def _timeout(self, retries: int) -> float:
+        return min(self.rto * 2 ** retries, MAX_RTO)
+
+    def _retransmit(self) -> None:
+        now = time.time()
+        for seq, entry in self.unacked.items():
+            if now - entry[1] >= self._timeout(entry[2]):
+                self._resend(seq, entry, now)
+
+    def _resend(self, seq: int, entry: list, now: float) -> None:
+        if entry[2] >= MAX_RETRIES:
+            raise RdtException('RDT send failed too many times')
+
+        entry[1] = now
+        entry[2] += 1
+        self._send_frame(entry[0])
+        if self.metrics is not None:
+            self.metrics.retransmissions += 1
+        logger.debug(f'Retransmitted {seq} (retry {entry[2]})')
@@ -0,0 +1,4 @@
+from .events import PACKET_EVENT_DTYPE, PacketEvent, BinaryEventWriter, CsvEventWriter, read_events
+from .columnar import ColumnarTrace, write_columnar, open_columnar
+from .chunked import ChunkedColumnWriter, iter_chunked, read_chunked
+from .convert import load_trace, convert_trace
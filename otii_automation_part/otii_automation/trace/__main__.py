@@ -0,0 +1,22 @@
+import logging
+from argparse import ArgumentParser
+
+from .convert import convert_trace
+
+logger = logging.getLogger('trace')
+
+
+def main():
+    parser = ArgumentParser(description='Convert traces (ebpf_trace.csv/.bin, Otii CSV and channel exports) to '
+                                        'columnar files')
+    parser.add_argument('traces', type=str, nargs='+', help='trace files to convert')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(name)-15s][%(levelname)-7s] - %(message)s')
+
+    for trace in args.traces:
+        logger.info(f'Converted {trace} -> {convert_trace(trace)}')
+
+
+if __name__ == '__main__':
+    main()
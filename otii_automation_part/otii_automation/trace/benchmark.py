@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from .convert import load_trace
+from .events import PACKET_EVENT_DTYPE, PacketEvent, BinaryEventWriter, CsvEventWriter
+
+logger = logging.getLogger('trace')
+
+# Events held by a perf buffer of BCC default size (8 pages per CPU), each record has an 8 bytes header + 4 bytes size
+PERF_BUFFER_EVENTS = 8 * 4096 // (8 + (4 + PACKET_EVENT_DTYPE.itemsize + 7) // 8 * 8)
+
+LATENCY_PERCENTILES = [50, 90, 99, 99.9]
+
+
+class PrintingCsvEventWriter(CsvEventWriter):
+    """ CsvEventWriter that also prints each event, as the callback of ebpf_part/monitoring_tool.py does """
+
+    def __init__(self, path: str, console=None):
+        super().__init__(path)
+        self.console = console or open(os.devnull, 'w')
+
+    def write(self, data) -> None:
+        super().write(data)
+        event = PacketEvent.from_address(data)
+        direction = "Incoming" if event.direction == 0 else "Outgoing"
+        print(f"{direction} Packet - Length: {event.packet_length} bytes, IAT: {event.iat_ns} ns", file=self.console)
+
+    def close(self) -> None:
+        super().close()
+        self.console.close()
+
+
+# Writer backends: constructor and extension of the output file
+WRITERS = {
+    'csv': (CsvEventWriter, '.csv'),
+    'csv-print': (PrintingCsvEventWriter, '.csv'),
+    'binary': (BinaryEventWriter, '.bin')
+}
+
+
+def replay_events(trace_path: str, count: int = None) -> np.ndarray:
+    """ Packet events of an eBPF trace as packet_event records
+
+    With count, the trace is repeated (timestamps shifted after each repetition) up to count events.
+    """
+    trace = load_trace(trace_path)
+    events = np.zeros(len(trace), dtype=PACKET_EVENT_DTYPE)
+    for name in PACKET_EVENT_DTYPE.names:
+        events[name] = trace[name]
+
+    if count is None or len(events) == 0:
+        return events
+
+    repeats = -(-count // len(events))
+    period = int(events['timestamp_ns'][-1] - events['timestamp_ns'][0]) + int(events['iat_ns'].mean())
+    replay = np.tile(events, repeats)[:count]
+    replay['timestamp_ns'] += (np.arange(len(replay)) // len(events) * period).astype(np.uint64)
+
+    return replay
+
+
+def replay_schedule(events: np.ndarray, rate: float = None, speed: float = None) -> np.ndarray:
+    """ Time of each event from the start of the replay (ns)
+
+    At a fixed rate (events/s), or following the recorded timestamps accelerated by speed.
+    None replays as fast as possible.
+    """
+    if rate:
+        return (np.arange(len(events)) * (1e9 / rate)).astype(np.int64)
+    if speed:
+        timestamps = events['timestamp_ns'].astype(np.int64)
+        return ((timestamps - timestamps[0]) / speed).astype(np.int64)
+
+    return None
+
+
+def benchmark_writer(backend: str, events: np.ndarray, output_dir: str, schedule: np.ndarray = None,
+                     buffer_events: int = PERF_BUFFER_EVENTS) -> dict:
+    """ Replay events through the process_event callback of a writer backend
+
+    As perf_buffer_poll, each wake up handles all events due at that time, the number of pending events is
+    compared to the capacity of the perf buffer (buffer_events) to detect when events would be lost.
+    """
+    writer_cls, extension = WRITERS[backend]
+    path = os.path.join(output_dir, f'replay_{backend}{extension}')
+    count = len(events)
+    record_size = PACKET_EVENT_DTYPE.itemsize
+    address = events.ctypes.data
+    latencies = np.zeros(count, dtype=np.int64)
+    max_backlog = 0
+    overflows = 0
+
+    writer = writer_cls(path)
+
+    def process_event(cpu, data, size):
+        writer.write(data)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter_ns()
+    i = 0
+    while i < count:
+        if schedule is None:
+            due = count
+        else:
+            now = time.perf_counter_ns() - start
+            due = int(np.searchsorted(schedule, now, side='right'))
+            if due == i:
+                time.sleep((schedule[i] - now) / 1e9)
+                continue
+
+        # Events pending in the perf buffer at this wake up
+        backlog = due - i
+        max_backlog = max(max_backlog, backlog)
+        if schedule is not None and backlog > buffer_events:
+            overflows += 1
+
+        last = time.perf_counter_ns()
+        for j in range(i, due):
+            process_event(0, address + j * record_size, record_size)
+            now = time.perf_counter_ns()
+            latencies[j] = now - last
+            last = now
+        i = due
+
+    writer.close()
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+    cpu = time.process_time() - cpu_start
+
+    percentiles = np.percentile(latencies, LATENCY_PERCENTILES) / 1e3 if count else [0.0] * len(LATENCY_PERCENTILES)
+    return {
+        'backend': backend,
+        'events': count,
+        'seconds': elapsed,
+        'events_per_second': count / elapsed if elapsed > 0 else 0.0,
+        'latency_us': {f'p{p:g}': float(v) for p, v in zip(LATENCY_PERCENTILES, percentiles)},
+        'max_latency_us': float(latencies.max() / 1e3) if count else 0.0,
+        'cpu_seconds': cpu,
+        'cpu_us_per_event': cpu / count * 1e6 if count else 0.0,
+        'max_backlog': max_backlog,
+        'buffer_overflows': overflows,
+        'output_bytes': os.path.getsize(path)
+    }
+
+
+def main():
+    parser = ArgumentParser(description='Replay an eBPF trace through the userspace event writers (no BPF needed)')
+    parser.add_argument('trace', type=str, help='eBPF trace to replay (ebpf_trace.csv/.bin/.col, packet_data.csv)')
+    parser.add_argument('-n', '--events', type=int, default=None, help='events to replay (trace repeated)')
+    parser.add_argument('-r', '--rate', type=float, default=None, help='replay rate in events/s')
+    parser.add_argument('-s', '--speed', type=float, default=None,
+                        help='replay the recorded timestamps accelerated by this factor')
+    parser.add_argument('-w', '--writers', type=str, nargs='+', default=list(WRITERS), choices=list(WRITERS),
+                        help='writer backends to benchmark')
+    parser.add_argument('--buffer-events', type=int, default=PERF_BUFFER_EVENTS,
+                        help='events held by the perf buffer')
+    parser.add_argument('-o', '--output-dir', type=str, default=None, help='keep written traces in this folder')
+    parser.add_argument('--json', type=str, default=None, help='save the results to a JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(name)-15s][%(levelname)-7s] - %(message)s')
+
+    events = replay_events(args.trace, args.events)
+    schedule = replay_schedule(events, args.rate, args.speed)
+    logger.info(f'Replaying {len(events)} events from {args.trace} '
+                f'({"as fast as possible" if schedule is None else f"over {schedule[-1] / 1e9:.2f} s"})')
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dir = args.output_dir or tmp_dir
+        os.makedirs(output_dir, exist_ok=True)
+        for backend in args.writers:
+            result = benchmark_writer(backend, events, output_dir, schedule, args.buffer_events)
+            results.append(result)
+
+            latency = ', '.join(f'{name} {value:.2f}' for name, value in result['latency_us'].items())
+            logger.info(f'{backend}: {result["events_per_second"]:,.0f} events/s, latency (us) {latency}, '
+                        f'CPU {result["cpu_us_per_event"]:.2f} us/event, max backlog {result["max_backlog"]}')
+            if result['buffer_overflows']:
+                logger.warning(f'{backend}: perf buffer would overflow ({result["buffer_overflows"]} wake ups '
+                               f'with more than {args.buffer_events} pending events)')
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump({'trace': args.trace, 'rate': args.rate, 'speed': args.speed, 'results': results}, fout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from .columnar import ColumnarTrace
+
+# Chunked columnar trace file layout (little endian):
+#   magic (8 bytes) | version (u32) | blocks | JSON footer | footer length (u64) | magic (8 bytes)
+# Rows are written in chunks, each column of a chunk is a zlib-compressed block. The footer holds the name of each
+# column, the chunks (rows, then offset, length and dtype of each block) and free-form metadata. The file is written
+# as the chunks come, so memory use does not depend on the length of the trace.
+MAGIC = b'TRACECHK'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sI')
+TRAILER = struct.Struct('<Q8s')
+
+EXTENSION = '.colz'
+
+
+class ChunkedColumnWriter:
+    """ Streaming writer of a chunked columnar file, the file appears (atomically) on close """
+
+    def __init__(self, path: str, meta: dict = None, level: int = 6):
+        self.path = path
+        self.meta = meta if meta is not None else {}
+        self.level = level
+        self.names = None
+        self.chunks = []
+        self.rows = 0
+
+        self.tmp_path = f'{path}.tmp'
+        self.fout = open(self.tmp_path, 'wb')
+        self.fout.write(PREAMBLE.pack(MAGIC, VERSION))
+
+    def write_chunk(self, columns: dict) -> None:
+        """ Append rows, the same columns (1-d arrays of the same length) in every chunk """
+        if self.names is None:
+            self.names = list(columns)
+        elif list(columns) != self.names:
+            raise ValueError(f'Chunk columns {list(columns)} differ from {self.names}')
+
+        rows = len(next(iter(columns.values())))
+        blocks = []
+        for name, column in columns.items():
+            column = np.ascontiguousarray(column, dtype=column.dtype.newbyteorder('<'))
+            if column.ndim != 1 or len(column) != rows:
+                raise ValueError(f'Column {name} has not {rows} rows')
+
+            data = zlib.compress(column.tobytes(), self.level)
+            blocks.append({'offset': self.fout.tell(), 'length': len(data), 'dtype': column.dtype.str})
+            self.fout.write(data)
+
+        self.chunks.append({'rows': rows, 'blocks': blocks})
+        self.rows += rows
+
+    def close(self) -> None:
+        footer = json.dumps({'rows': self.rows, 'columns': self.names or [], 'chunks': self.chunks,
+                             'meta': self.meta}).encode('utf-8')
+        self.fout.write(footer)
+        self.fout.write(TRAILER.pack(len(footer), MAGIC))
+        self.fout.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        """ Discard the file being written """
+        self.fout.close()
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _read_footer(fin, path: str) -> dict:
+    magic, version = PREAMBLE.unpack(fin.read(PREAMBLE.size))
+    fin.seek(-TRAILER.size, os.SEEK_END)
+    footer_len, end_magic = TRAILER.unpack(fin.read(TRAILER.size))
+    if magic != MAGIC or end_magic != MAGIC or version != VERSION:
+        raise ValueError(f'Invalid chunked columnar trace: {path}')
+
+    fin.seek(-TRAILER.size - footer_len, os.SEEK_END)
+    return json.loads(fin.read(footer_len))
+
+
+def iter_chunked(path: str):
+    """ Chunks of a chunked columnar file (dict of columns), one at a time """
+    with open(path, 'rb') as fin:
+        footer = _read_footer(fin, path)
+        for chunk in footer['chunks']:
+            columns = {}
+            for name, block in zip(footer['columns'], chunk['blocks']):
+                fin.seek(block['offset'])
+                columns[name] = np.frombuffer(zlib.decompress(fin.read(block['length'])), dtype=block['dtype'])
+            yield columns
+
+
+def read_chunked(path: str) -> ColumnarTrace:
+    """ Load a whole chunked columnar file """
+    with open(path, 'rb') as fin:
+        footer = _read_footer(fin, path)
+
+    chunks = list(iter_chunked(path))
+    if chunks:
+        columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in footer['columns']}
+    else:
+        columns = {}
+
+    return ColumnarTrace(columns, footer['meta'])
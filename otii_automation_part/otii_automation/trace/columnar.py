@@ -0,0 +1,94 @@
+import json
+import struct
+
+import numpy as np
+
+# Columnar trace file layout (little endian):
+#   magic (8 bytes) | version (u32) | header length (u32) | JSON header | columns
+# The JSON header holds the number of rows, the name, dtype and absolute offset of each column and
+# free-form metadata. Columns are stored one after the other, each aligned to ALIGNMENT bytes, so
+# that they can be memory-mapped as contiguous arrays (also by MATLAB memmapfile).
+MAGIC = b'TRACECOL'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 64
+
+EXTENSION = '.col'
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class ColumnarTrace:
+    """ Named typed columns of a trace, either in memory or memory-mapped from a columnar file """
+
+    def __init__(self, columns: dict, meta: dict = None):
+        self.columns = columns
+        self.meta = meta if meta is not None else {}
+
+    @property
+    def names(self) -> list:
+        return list(self.columns.keys())
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __repr__(self):
+        columns = ', '.join(f'{name}:{column.dtype}' for name, column in self.columns.items())
+        return f'ColumnarTrace({len(self)} rows, {columns})'
+
+
+def write_columnar(path: str, trace: ColumnarTrace) -> None:
+    """ Write a trace to a columnar file """
+    rows = len(trace)
+    columns = {name: np.ascontiguousarray(column, dtype=column.dtype.newbyteorder('<'))
+               for name, column in trace.columns.items()}
+    for name, column in columns.items():
+        if column.ndim != 1 or len(column) != rows:
+            raise ValueError(f'Column {name} has not {rows} rows')
+
+    # Header size depends on the offsets, use fixed width offsets to compute it once
+    descriptors = [{'name': name, 'dtype': column.dtype.name, 'offset': 0} for name, column in columns.items()]
+    header = {'rows': rows, 'columns': descriptors, 'meta': trace.meta}
+    header_len = len(json.dumps(header).encode('utf-8')) + 20 * len(descriptors)
+
+    offset = _align(PREAMBLE.size + header_len)
+    for descriptor, column in zip(descriptors, columns.values()):
+        descriptor['offset'] = offset
+        offset = _align(offset + column.nbytes)
+
+    encoded = json.dumps(header).encode('utf-8').ljust(header_len)
+
+    with open(path, 'wb') as fout:
+        fout.write(PREAMBLE.pack(MAGIC, VERSION, header_len))
+        fout.write(encoded)
+        for descriptor, column in zip(descriptors, columns.values()):
+            fout.seek(descriptor['offset'])
+            fout.write(column)
+        fout.truncate(offset)
+
+
+def open_columnar(path: str) -> ColumnarTrace:
+    """ Memory-map a columnar file, columns are read-only views on the file """
+    with open(path, 'rb') as fin:
+        magic, version, header_len = PREAMBLE.unpack(fin.read(PREAMBLE.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Invalid columnar trace: {path}')
+        header = json.loads(fin.read(header_len))
+
+    rows = header['rows']
+    columns = {}
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    for descriptor in header['columns']:
+        dtype = np.dtype(descriptor['dtype']).newbyteorder('<')
+        start = descriptor['offset']
+        columns[descriptor['name']] = buffer[start:start + rows * dtype.itemsize].view(dtype)
+
+    return ColumnarTrace(columns, header['meta'])
@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+
+from .chunked import EXTENSION as CHUNKED_EXTENSION, read_chunked
+from .columnar import ColumnarTrace, EXTENSION, write_columnar, open_columnar
+from .events import read_events
+
+# Column types of the eBPF packet trace
+EBPF_DTYPES = {
+    'timestamp_ns': np.int64,
+    'iat_ns': np.int64,
+    'packet_length': np.uint16,
+    'direction': np.uint8   # 0 = Incoming, 1 = Outgoing
+}
+
+# Value type of Otii channel exports
+OTII_DTYPES = {
+    'power': np.float64,
+    'gpi': np.uint8
+}
+
+
+def _ebpf_trace(timestamp_ns, iat_ns, packet_length, direction, source: str) -> ColumnarTrace:
+    # Offloaded (GSO) packets may not fit 16 bits
+    length_dtype = EBPF_DTYPES['packet_length']
+    if len(packet_length) > 0 and packet_length.max() > np.iinfo(length_dtype).max:
+        length_dtype = np.uint32
+
+    return ColumnarTrace({
+        'timestamp_ns': timestamp_ns.astype(EBPF_DTYPES['timestamp_ns']),
+        'iat_ns': iat_ns.astype(EBPF_DTYPES['iat_ns']),
+        'packet_length': packet_length.astype(length_dtype),
+        'direction': direction.astype(EBPF_DTYPES['direction'])
+    }, {'kind': 'ebpf', 'source': os.path.basename(source)})
+
+
+def read_ebpf_csv(path: str) -> ColumnarTrace:
+    """ Parse ebpf_trace.csv (Timestamp (ns), IAT (ns), Packet Length, Direction) """
+    values = np.loadtxt(path, delimiter=',', skiprows=1, usecols=(0, 1, 2), dtype=np.int64, ndmin=2)
+    direction = np.loadtxt(path, delimiter=',', skiprows=1, usecols=3, dtype='U8', ndmin=1)
+
+    return _ebpf_trace(values[:, 0], values[:, 1], values[:, 2], direction == 'Outgoing', path)
+
+
+def read_ebpf_binary(path: str) -> ColumnarTrace:
+    """ Read ebpf_trace.bin written by the ring buffer logger """
+    events = read_events(path)
+
+    return _ebpf_trace(events['timestamp_ns'], events['iat_ns'], events['packet_length'], events['direction'], path)
+
+
+def read_otii_csv(path: str, kind: str = None) -> ColumnarTrace:
+    """ Parse an Otii channel export (timestamp in seconds, value), e.g. 'Main power - Ace.csv' """
+    if kind is None:
+        kind = 'gpi' if 'gpi' in os.path.basename(path).lower() else 'power'
+
+    values = np.loadtxt(path, delimiter=',', skiprows=1, usecols=(0, 1), dtype=np.float64, ndmin=2)
+
+    return ColumnarTrace({
+        'timestamp_ns': np.rint(values[:, 0] * 1e9).astype(np.int64),
+        'value': values[:, 1].astype(OTII_DTYPES[kind])
+    }, {'kind': kind, 'source': os.path.basename(path)})
+
+
+def read_csv(path: str) -> ColumnarTrace:
+    """ Parse a CSV trace, either an eBPF trace or an Otii export """
+    with open(path) as fin:
+        header = fin.readline()
+
+    if header.startswith('Timestamp (ns)'):
+        return read_ebpf_csv(path)
+    return read_otii_csv(path)
+
+
+def columnar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + EXTENSION
+
+
+def load_trace(path: str) -> ColumnarTrace:
+    """ Load any trace (columnar, chunked columnar, CSV or eBPF binary)
+
+    When a columnar copy of a CSV trace exists and is up to date, it is memory-mapped instead of parsing the CSV.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == EXTENSION:
+        return open_columnar(path)
+    if extension == CHUNKED_EXTENSION:
+        return read_chunked(path)
+    if extension == '.bin':
+        return read_ebpf_binary(path)
+
+    converted = columnar_path(path)
+    if os.path.exists(converted) and os.path.getmtime(converted) >= os.path.getmtime(path):
+        return open_columnar(converted)
+
+    return read_csv(path)
+
+
+def convert_trace(src: str, dst: str = None) -> str:
+    """ Convert a CSV, eBPF binary or chunked columnar trace to a columnar file (next to the source by default) """
+    if dst is None:
+        dst = columnar_path(src)
+
+    extension = os.path.splitext(src)[1].lower()
+    if extension == '.bin':
+        trace = read_ebpf_binary(src)
+    elif extension == CHUNKED_EXTENSION:
+        trace = read_chunked(src)
+    else:
+        trace = read_csv(src)
+    write_columnar(dst, trace)
+
+    return dst
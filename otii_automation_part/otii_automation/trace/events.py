@@ -0,0 +1,104 @@
+import csv
+import ctypes
+import struct
+
+import numpy as np
+
+# Layout of struct packet_event (data_logger.c), padded by the compiler to 32 bytes
+PACKET_EVENT_DTYPE = np.dtype([
+    ('timestamp_ns', '<u8'),
+    ('iat_ns', '<u8'),
+    ('packet_length', '<u8'),
+    ('direction', 'u1')
+], align=True)
+
+# Binary trace header: magic, version, record size
+MAGIC = b'PKEV'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+
+
+class PacketEvent(ctypes.Structure):
+    _fields_ = [
+        ('timestamp_ns', ctypes.c_uint64),
+        ('iat_ns', ctypes.c_uint64),
+        ('packet_length', ctypes.c_uint64),
+        ('direction', ctypes.c_uint8)
+    ]
+
+
+class BinaryEventWriter:
+    """ Copy raw packet_event records into a preallocated buffer and write it to file in large blocks """
+
+    def __init__(self, path: str, batch_size: int = 65536):
+        self.record_size = PACKET_EVENT_DTYPE.itemsize
+        self.buffer = np.zeros(batch_size, dtype=PACKET_EVENT_DTYPE)
+        self.address = self.buffer.ctypes.data
+        self.count = 0
+        self.total = 0
+
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.record_size))
+
+    def write(self, data) -> None:
+        """ Append the record pointed by data (as passed to BCC callbacks) """
+        ctypes.memmove(self.address + self.count * self.record_size, data, self.record_size)
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.count > 0:
+            self.file.write(self.buffer[:self.count])
+            self.total += self.count
+            self.count = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CsvEventWriter:
+    """ Write each packet_event record as a row of ebpf_trace.csv """
+
+    def __init__(self, path: str):
+        self.total = 0
+        self.file = open(path, 'w')
+        self.csv_writer = csv.writer(self.file)
+        self.csv_writer.writerow(["Timestamp (ns)", "IAT (ns)", "Packet Length", "Direction"])
+
+    def write(self, data) -> None:
+        """ Append the record pointed by data (as passed to BCC callbacks) """
+        event = PacketEvent.from_address(data)
+        direction = "Incoming" if event.direction == 0 else "Outgoing"
+        self.csv_writer.writerow([event.timestamp_ns, event.iat_ns, event.packet_length, direction])
+        self.total += 1
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_events(path: str) -> np.ndarray:
+    """ Read a binary trace written by BinaryEventWriter """
+    with open(path, 'rb') as fin:
+        magic, version, record_size = HEADER.unpack(fin.read(HEADER.size))
+
+    if magic != MAGIC or version != VERSION or record_size != PACKET_EVENT_DTYPE.itemsize:
+        raise ValueError(f'Invalid binary trace: {path}')
+
+    return np.fromfile(path, dtype=PACKET_EVENT_DTYPE, offset=HEADER.size)
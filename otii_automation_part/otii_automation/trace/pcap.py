@@ -0,0 +1,93 @@
+import mmap
+import os
+import struct
+from array import array
+
+import numpy as np
+
+from .columnar import ColumnarTrace
+
+# Magic number of classic pcap files and size of the timestamp fraction (ns): microsecond or nanosecond resolution
+PCAP_MAGIC = {0xa1b2c3d4: 1000, 0xa1b23c4d: 1}
+GLOBAL_HEADER_SIZE = 24
+RECORD_HEADER_SIZE = 16
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+# Offset of the packet type in Linux cooked headers (0 = to us, ..., 4 = outgoing)
+SLL_PACKET_TYPE = {LINKTYPE_LINUX_SLL: 0, LINKTYPE_LINUX_SLL2: 10}
+SLL_OUTGOING = 4
+
+
+def _gather(data: np.ndarray, offsets: np.ndarray, size: int) -> np.ndarray:
+    """ size bytes at each offset ([packets x size]), bytes past the end of the file are 0 """
+    index = offsets[:, np.newaxis] + np.arange(size)
+    valid = index < len(data)
+    values = data[np.where(valid, index, 0)]
+    values[~valid] = 0
+
+    return values
+
+
+def read_pcap(path: str) -> ColumnarTrace:
+    """ Read a classic pcap capture (as written by tcpdump -w)
+
+    The file is memory-mapped and only the offsets of the records are collected while walking it,
+    header fields are then gathered for all packets at once.
+    Returns timestamp_ns (wall clock), packet_length (length on the wire), captured_length, direction
+    (0 = Incoming, 1 = Outgoing, -1 = unknown) and src_mac (Ethernet source address, 0 if not Ethernet).
+    """
+    with open(path, 'rb') as fin, mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if len(mm) < GLOBAL_HEADER_SIZE:
+            raise ValueError(f'Invalid pcap file: {path}')
+
+        for order in '<>':
+            magic, = struct.unpack_from(f'{order}I', mm, 0)
+            if magic in PCAP_MAGIC:
+                break
+        else:
+            raise ValueError(f'Not a classic pcap file (pcapng is not supported): {path}')
+        fraction_ns = PCAP_MAGIC[magic]
+        linktype = struct.unpack_from(f'{order}I', mm, 20)[0] & 0x0FFFFFFF
+
+        # Walk the records, skipping a truncated last one
+        unpack_length = struct.Struct(f'{order}I').unpack_from
+        offsets = array('q')
+        offset = GLOBAL_HEADER_SIZE
+        end = len(mm)
+        while offset + RECORD_HEADER_SIZE <= end:
+            next_offset = offset + RECORD_HEADER_SIZE + unpack_length(mm, offset + 8)[0]
+            if next_offset > end:
+                break
+            offsets.append(offset)
+            offset = next_offset
+
+        offsets = np.frombuffer(offsets, dtype=np.int64)
+        data = np.frombuffer(mm, dtype=np.uint8)
+        try:
+            headers = _gather(data, offsets, RECORD_HEADER_SIZE).view(f'{order}u4')
+            frames = offsets + RECORD_HEADER_SIZE
+            direction = np.full(len(offsets), -1, dtype=np.int8)
+            src_mac = np.zeros(len(offsets), dtype=np.uint64)
+
+            if linktype == LINKTYPE_ETHERNET:
+                mac = _gather(data, frames + 6, 6).astype(np.uint64)
+                src_mac = (mac << (np.arange(40, -1, -8, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+                src_mac[headers[:, 2] < 12] = 0
+            elif linktype in SLL_PACKET_TYPE:
+                packet_type = _gather(data, frames + SLL_PACKET_TYPE[linktype], 2)
+                packet_type = packet_type[:, 0].astype(np.uint16) << 8 | packet_type[:, 1]
+                direction = (packet_type == SLL_OUTGOING).astype(np.int8)
+        finally:
+            # Views of the map must be released before it is closed
+            del data
+
+    return ColumnarTrace({
+        'timestamp_ns': headers[:, 0].astype(np.int64) * 1_000_000_000 + headers[:, 1].astype(np.int64) * fraction_ns,
+        'packet_length': headers[:, 3].astype(np.uint32),
+        'captured_length': headers[:, 2].astype(np.uint32),
+        'direction': direction,
+        'src_mac': src_mac
+    }, {'kind': 'pcap', 'linktype': linktype, 'source': os.path.basename(path)})
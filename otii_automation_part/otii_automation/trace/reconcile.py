@@ -0,0 +1,238 @@
+import json
+import logging
+from argparse import ArgumentParser
+
+import numpy as np
+
+from .columnar import ColumnarTrace
+from .convert import load_trace
+from .pcap import read_pcap
+
+logger = logging.getLogger('trace')
+
+# Maximum distance between the timestamps of the same packet in both traces, once aligned (ns)
+DEFAULT_TOLERANCE_NS = 1_000_000
+
+# Tolerance of the first matching pass, used to estimate the clock drift between the traces (ns)
+COARSE_TOLERANCE_NS = 20_000_000
+
+# Packets of each trace used to estimate the offset between the clocks, and resolution of the estimate (ns)
+OFFSET_SAMPLE = 1024
+OFFSET_RESOLUTION_NS = 1_000_000
+
+DIRECTIONS = {0: 'Incoming', 1: 'Outgoing'}
+
+
+def estimate_offset(ebpf_ts: np.ndarray, ebpf_length: np.ndarray, pcap_ts: np.ndarray, pcap_length: np.ndarray) -> int:
+    """ Offset between the eBPF clock (since boot) and the pcap clock (wall clock), in ns
+
+    The most frequent difference between timestamps of packets with the same length at the beginning of both
+    traces is the offset.
+    """
+    a_ts, a_length = ebpf_ts[:OFFSET_SAMPLE], ebpf_length[:OFFSET_SAMPLE]
+    b_ts, b_length = pcap_ts[:OFFSET_SAMPLE], pcap_length[:OFFSET_SAMPLE]
+
+    same_length = a_length[:, np.newaxis] == b_length[np.newaxis, :]
+    differences = (b_ts[np.newaxis, :] - a_ts[:, np.newaxis])[same_length]
+    if len(differences) == 0:
+        raise ValueError('No packet with the same length at the beginning of both traces, cannot align them')
+
+    buckets, counts = np.unique(differences // OFFSET_RESOLUTION_NS, return_counts=True)
+    best = buckets[np.argmax(counts)]
+    close = differences[np.abs(differences // OFFSET_RESOLUTION_NS - best) <= 1]
+
+    return int(np.median(close))
+
+
+def _nearest(src: np.ndarray, dst: np.ndarray) -> [np.ndarray, np.ndarray]:
+    """ Index of the nearest value of dst (sorted) for each value of src, and the distance """
+    j = np.searchsorted(dst, src)
+    before = np.clip(j - 1, 0, len(dst) - 1)
+    after = np.clip(j, 0, len(dst) - 1)
+    distance_before = np.abs(src - dst[before])
+    distance_after = np.abs(dst[after] - src)
+
+    return np.where(distance_after < distance_before, after, before), np.minimum(distance_before, distance_after)
+
+
+def _match(a: np.ndarray, b: np.ndarray, tolerance: int) -> [np.ndarray, np.ndarray]:
+    """ Match sorted keys of a and b that are mutual nearest neighbours within tolerance, until no new match """
+    free_a = np.arange(len(a))
+    free_b = np.arange(len(b))
+    matched_a, matched_b = [], []
+
+    while len(free_a) > 0 and len(free_b) > 0:
+        keys_a, keys_b = a[free_a], b[free_b]
+        nearest_b, distance = _nearest(keys_a, keys_b)
+        nearest_a, _ = _nearest(keys_b, keys_a)
+
+        mutual = (nearest_a[nearest_b] == np.arange(len(keys_a))) & (distance <= tolerance)
+        if not mutual.any():
+            break
+
+        matched_a.append(free_a[mutual])
+        matched_b.append(free_b[nearest_b[mutual]])
+        free_a = free_a[~mutual]
+        free_b = np.delete(free_b, nearest_b[mutual])
+
+    if not matched_a:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(matched_a), np.concatenate(matched_b)
+
+
+def match_packets(a_ts: np.ndarray, a_group: np.ndarray, b_ts: np.ndarray, b_group: np.ndarray,
+                  tolerance: int) -> [np.ndarray, np.ndarray]:
+    """ Merge join of two packet traces: pairs of packets of the same group (e.g. length) within tolerance
+
+    Each group is mapped to a time range of its own, so that all groups are joined in a single pass.
+    Returns the indexes of the matched packets in a and b.
+    """
+    if len(a_ts) == 0 or len(b_ts) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    start = min(a_ts.min(), b_ts.min())
+    stride = max(a_ts.max(), b_ts.max()) - start + 4 * tolerance + 1
+    groups, rank = np.unique(np.concatenate([a_group, b_group]), return_inverse=True)
+    if len(groups) * float(stride) >= 2 ** 62:
+        raise ValueError('Traces too long to be joined')
+
+    a_keys = rank[:len(a_ts)] * stride + (a_ts - start)
+    b_keys = rank[len(a_ts):] * stride + (b_ts - start)
+    a_order = np.argsort(a_keys, kind='stable')
+    b_order = np.argsort(b_keys, kind='stable')
+
+    ia, ib = _match(a_keys[a_order], b_keys[b_order], tolerance)
+    ia, ib = a_order[ia], b_order[ib]
+    order = np.argsort(ia)
+
+    return ia[order], ib[order]
+
+
+def _byte_error(ebpf_length, ebpf_direction, pcap_length, pcap_direction) -> dict:
+    errors = {}
+    for direction, name in DIRECTIONS.items():
+        ebpf_bytes = int(ebpf_length[ebpf_direction == direction].sum())
+        pcap_bytes = int(pcap_length[pcap_direction == direction].sum())
+        errors[name] = {
+            'ebpf_bytes': ebpf_bytes,
+            'pcap_bytes': pcap_bytes,
+            'error_bytes': ebpf_bytes - pcap_bytes,
+            'relative_error': (ebpf_bytes - pcap_bytes) / pcap_bytes if pcap_bytes else None
+        }
+
+    return errors
+
+
+def reconcile(ebpf: ColumnarTrace, pcap: ColumnarTrace, tolerance_ns: int = DEFAULT_TOLERANCE_NS,
+              offset_ns: int = None) -> dict:
+    """ Compare an eBPF packet trace with a pcap capture of the same traffic
+
+    eBPF timestamps are aligned to the capture (offset and linear drift), then packets are joined by length
+    and timestamp. Only packets of the time window covered by both traces are compared:
+    - missed: in the capture, not seen by eBPF
+    - extra: seen by eBPF, not in the capture
+    - mismatched: same packet (timestamp) with a different length or direction
+    Directions of an Ethernet capture are inferred from the source address of the outgoing packets.
+    """
+    ebpf_order = np.argsort(ebpf['timestamp_ns'], kind='stable')
+    e_ts = np.asarray(ebpf['timestamp_ns'], dtype=np.int64)[ebpf_order]
+    e_length = np.asarray(ebpf['packet_length'], dtype=np.int64)[ebpf_order]
+    e_direction = np.asarray(ebpf['direction'], dtype=np.int8)[ebpf_order]
+    p_ts = np.asarray(pcap['timestamp_ns'], dtype=np.int64)
+    p_length = np.asarray(pcap['packet_length'], dtype=np.int64)
+    p_direction = np.array(pcap['direction'], dtype=np.int8)
+    if len(e_ts) == 0 or len(p_ts) == 0:
+        raise ValueError('Cannot reconcile empty traces')
+
+    # Align clocks: offset, then linear drift fitted on a coarse matching
+    if offset_ns is None:
+        offset_ns = estimate_offset(e_ts, e_length, p_ts, p_length)
+    aligned = e_ts + offset_ns
+    ia, ib = match_packets(aligned, e_length, p_ts, p_length, COARSE_TOLERANCE_NS)
+    drift = 0.0
+    if len(ia) >= 2:
+        elapsed = (e_ts - e_ts[0]).astype(np.float64)
+        drift, intercept = np.polyfit(elapsed[ia], (p_ts[ib] - aligned[ia]).astype(np.float64), 1)
+        aligned = aligned + np.rint(intercept + drift * elapsed).astype(np.int64)
+
+    ia, ib = match_packets(aligned, e_length, p_ts, p_length, tolerance_ns)
+
+    # Directions of the capture from the address of the device (most frequent source of outgoing packets)
+    if np.all(p_direction < 0) and 'src_mac' in pcap:
+        src_mac = np.asarray(pcap['src_mac'])
+        outgoing = src_mac[ib[e_direction[ia] == 1]]
+        if len(outgoing) > 0:
+            values, counts = np.unique(outgoing, return_counts=True)
+            p_direction = (src_mac == values[np.argmax(counts)]).astype(np.int8)
+
+    # Compare the window covered by both traces
+    window_start, window_end = max(aligned[0], p_ts[0]), min(aligned[-1], p_ts[-1])
+    e_in = (aligned >= window_start - tolerance_ns) & (aligned <= window_end + tolerance_ns)
+    p_in = (p_ts >= window_start - tolerance_ns) & (p_ts <= window_end + tolerance_ns)
+
+    # Same packet with a different direction, or with a different length (timestamp only)
+    wrong_direction = (p_direction[ib] >= 0) & (p_direction[ib] != e_direction[ia])
+    e_free = np.ones(len(e_ts), dtype=bool)
+    p_free = np.ones(len(p_ts), dtype=bool)
+    e_free[ia] = False
+    p_free[ib] = False
+    e_rest, p_rest = np.flatnonzero(e_free & e_in), np.flatnonzero(p_free & p_in)
+    ja, jb = match_packets(aligned[e_rest], np.zeros(len(e_rest)), p_ts[p_rest], np.zeros(len(p_rest)), tolerance_ns)
+    e_free[e_rest[ja]] = False
+    p_free[p_rest[jb]] = False
+
+    residual = np.abs(p_ts[ib] - aligned[ia])
+    matched_in = e_in[ia]
+
+    return {
+        'ebpf_packets': int(e_in.sum()),
+        'pcap_packets': int(p_in.sum()),
+        'outside_window': {'ebpf': int((~e_in).sum()), 'pcap': int((~p_in).sum())},
+        'matched': int(matched_in.sum() - wrong_direction[matched_in].sum()),
+        'missed': int((p_free & p_in).sum()),
+        'extra': int((e_free & e_in).sum()),
+        'mismatched': {'length': len(ja), 'direction': int(wrong_direction[matched_in].sum())},
+        'byte_error': _byte_error(e_length[e_in], e_direction[e_in], p_length[p_in], p_direction[p_in]),
+        'alignment': {
+            'offset_ns': int(offset_ns),
+            'drift_ppm': float(drift * 1e6),
+            'median_residual_us': float(np.median(residual) / 1e3) if len(residual) else None,
+            'max_residual_us': float(residual.max() / 1e3) if len(residual) else None
+        }
+    }
+
+
+def main():
+    parser = ArgumentParser(description='Compare an eBPF packet trace with a pcap capture of the same traffic')
+    parser.add_argument('pcap', type=str, help='capture file (capture.pcap)')
+    parser.add_argument('trace', type=str, help='eBPF trace (packet_data.csv, ebpf_trace.csv/.bin/.col)')
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE_NS / 1e3,
+                        help='maximum timestamp difference of the same packet, once aligned (us)')
+    parser.add_argument('--offset', type=int, default=None,
+                        help='offset of the capture clock from the eBPF clock (ns), estimated by default')
+    parser.add_argument('--json', type=str, default=None, help='save the report to a JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(name)-15s][%(levelname)-7s] - %(message)s')
+
+    report = reconcile(load_trace(args.trace), read_pcap(args.pcap), int(args.tolerance * 1e3), args.offset)
+
+    alignment = report['alignment']
+    logger.info(f'Aligned with offset {alignment["offset_ns"]} ns, drift {alignment["drift_ppm"]:.2f} ppm, '
+                f'median residual {alignment["median_residual_us"]} us')
+    logger.info(f'Packets: {report["ebpf_packets"]} eBPF, {report["pcap_packets"]} pcap '
+                f'(outside common window: {report["outside_window"]})')
+    logger.info(f'Matched {report["matched"]}, missed {report["missed"]}, extra {report["extra"]}, '
+                f'mismatched {report["mismatched"]}')
+    for name, error in report['byte_error'].items():
+        relative = error['relative_error']
+        logger.info(f'{name}: {error["ebpf_bytes"]} bytes eBPF, {error["pcap_bytes"]} bytes pcap, error '
+                    f'{error["error_bytes"]} bytes' + (f' ({relative:.3%})' if relative is not None else ''))
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump(report, fout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import pytest
+
+from otii_automation.rdt import BinaryRdt, Rdt, Message
+from otii_automation.rdt.exception import RdtException
+from otii_automation.rdt.udt.loopback import loopback_pair
+
+
+@pytest.fixture
+def link():
+    controller_udt, device_udt = loopback_pair()
+    yield controller_udt, device_udt
+    controller_udt.close()
+    device_udt.close()
+
+
+def test_binary_framing_negotiated(link):
+    controller, device = BinaryRdt(link[0], framing='binary'), BinaryRdt(link[1])
+
+    controller.send(Message.START_CONFIG, {'bin_size': 0.5})
+    msg, _ = device.receive(timeout=1)
+    assert msg == {'code': Message.START_CONFIG.value, 'payload': {'bin_size': 0.5}}
+    assert device.binary
+
+
+def test_timeout_keeps_framing(link):
+    controller, device = BinaryRdt(link[0], framing='binary'), BinaryRdt(link[1])
+    controller.send(Message.START_CONFIG)
+    device.receive(timeout=1)
+
+    for rdt in (controller, device):
+        with pytest.raises(RdtException):
+            rdt.receive(timeout=0.05)
+        assert rdt.binary
+
+    # The device still answers in binary
+    device.send(Message.CONFIG_OK)
+    msg, _ = controller.receive(timeout=1)
+    assert msg == {'code': Message.CONFIG_OK.value}
+    assert controller.binary
+
+
+def test_corrupted_frame_keeps_framing(link):
+    controller, device = BinaryRdt(link[0], framing='binary'), BinaryRdt(link[1])
+    controller.send(Message.START_CONFIG)
+    device.receive(timeout=1)
+
+    # Corrupted first byte: neither a binary frame nor a valid JSON frame
+    link[0].send_bytes(b'X{"code": 6}ab\n')
+    with pytest.raises(RdtException):
+        device.receive(timeout=1)
+    assert device.binary
+
+
+def test_json_peer_switches_framing(link):
+    controller, device = BinaryRdt(link[0], framing='binary'), Rdt(link[1])
+
+    device.send(Message.CONFIG_OK)
+    msg, _ = controller.receive(timeout=1)
+    assert msg == {'code': Message.CONFIG_OK.value}
+    assert not controller.binary
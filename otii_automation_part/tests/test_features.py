@@ -0,0 +1,202 @@
+import math
+import os
+import statistics
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from otii_automation.features import FEATURE_NAMES, COLUMN_NAMES, merge_bin_stats, bin_features, concat_features
+from otii_automation.features.extraction import traffic_features, aggregate_features, read_features_csv, \
+    compare_features
+from otii_automation.trace import ColumnarTrace
+
+BIN_SIZE = 0.5
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def make_trace(seed: int = 1, packets: int = 400) -> dict:
+    """ eBPF trace fixture: bursts of packets separated by idle periods (empty bins) and a single-packet bin, with
+    packets on bin edges """
+    rng = np.random.default_rng(seed)
+    iat_ns = rng.exponential(2e6, packets).astype(np.uint64)
+    iat_ns[[100, 101, 250]] = [1_200_000_000, 600_000_000, 700_000_000]
+    timestamps_ns = 5_000_000_000 + np.cumsum(iat_ns)
+    iat_ns[0] = 0
+
+    # First packet of the fifth bin on its left edge, last packet on the right edge of the last bin
+    timestamps_ns[101] = timestamps_ns[0] + 2_000_000_000
+    timestamps_ns[-1] = timestamps_ns[0] + 3_500_000_000
+
+    return {
+        'timestamps_ns': timestamps_ns,
+        'iat_ns': iat_ns,
+        'packet_length': rng.choice([66, 120, 1514], packets).astype(np.uint64),
+        'direction': rng.integers(0, 2, packets).astype(np.uint32)
+    }
+
+
+def naive_features(packets: list, bin_size: float) -> dict:
+    """ Features of a bin computed from its packets (timestamp, iat, length, direction), as data_processing.m """
+    if not packets:
+        return {name: 0 for name in FEATURE_NAMES}
+
+    n = len(packets)
+    iat = [packet[1] / 1e9 for packet in packets]
+    length = [float(packet[2]) for packet in packets]
+    tx = sum(1 for packet in packets if packet[3] == 1)
+    rx = n - tx
+
+    mean_iat = statistics.fmean(iat)
+    std_iat = statistics.stdev(iat) if n > 1 else 0.0
+    mean_length = statistics.fmean(length)
+    m2 = sum((value - mean_length) ** 2 for value in length) / n
+    m3 = sum((value - mean_length) ** 3 for value in length) / n
+    m4 = sum((value - mean_length) ** 4 for value in length) / n
+
+    return {
+        'TXBytes': sum(packet[2] for packet in packets if packet[3] == 1),
+        'RXBytes': sum(packet[2] for packet in packets if packet[3] != 1),
+        'MeanIAT': mean_iat,
+        'StdIAT': std_iat,
+        'MaxIAT': max(iat),
+        'MinIAT': min(iat),
+        'BurstinessIAT': std_iat / mean_iat if mean_iat != 0 else 0,
+        'PacketRate': n / bin_size,
+        'TXRatio': tx / n,
+        'CountTX': tx,
+        'CountRX': rx,
+        'TX_RX_Ratio': tx / max(rx, 1),
+        'TotalPacketCount': n,
+        'StdPacketLength': statistics.stdev(length) if n > 1 else 0.0,
+        'MaxPacketLength': max(length),
+        'MeanPacketLength': mean_length,
+        'SkewPacketLength': m3 / m2 ** 1.5 if m2 > 0 else math.nan,
+        'KurtosisPacketLength': m4 / m2 ** 2 if m2 > 0 else math.nan
+    }
+
+
+def naive_bins(trace: dict, bin_size: float) -> list:
+    """ Packets of each bin, bins start at the earliest packet and the last one includes its right edge """
+    origin = int(trace['timestamps_ns'].min())
+    packets = [((int(t) - origin) / 1e9, int(iat), int(length), int(direction)) for t, iat, length, direction
+               in zip(trace['timestamps_ns'], trace['iat_ns'], trace['packet_length'], trace['direction'])]
+    num_bins = math.ceil(max(packet[0] for packet in packets) / bin_size)
+
+    bins = [[] for _ in range(num_bins)]
+    for packet in packets:
+        bins[min(int(packet[0] // bin_size), num_bins - 1)].append(packet)
+
+    return bins
+
+
+def test_traffic_features_match_naive_reference():
+    trace = make_trace()
+    features, edges = traffic_features(trace['timestamps_ns'], trace['iat_ns'], trace['packet_length'],
+                                       trace['direction'], BIN_SIZE)
+    bins = naive_bins(trace, BIN_SIZE)
+
+    assert len(edges) == len(bins) + 1
+    # The fixture covers empty bins and a single-packet bin (NaN skewness and kurtosis)
+    assert any(len(packets) == 0 for packets in bins)
+    assert np.isnan(features['SkewPacketLength']).any()
+
+    for name in FEATURE_NAMES:
+        expected = [naive_features(packets, BIN_SIZE)[name] for packets in bins]
+        np.testing.assert_allclose(features[name], expected, rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=name)
+
+
+def test_traffic_features_out_of_order():
+    """ Events of another CPU may be logged after a later one, even before the first row """
+    trace = make_trace(seed=3)
+    for i, j in [(0, 1), (200, 201)]:
+        trace['timestamps_ns'][[i, j]] = trace['timestamps_ns'][[j, i]]
+
+    features, edges = traffic_features(trace['timestamps_ns'], trace['iat_ns'], trace['packet_length'],
+                                       trace['direction'], BIN_SIZE)
+    bins = naive_bins(trace, BIN_SIZE)
+
+    assert len(edges) == len(bins) + 1
+    assert features['TotalPacketCount'].sum() == len(trace['timestamps_ns'])
+    for name in FEATURE_NAMES:
+        expected = [naive_features(packets, BIN_SIZE)[name] for packets in bins]
+        np.testing.assert_allclose(features[name], expected, rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=name)
+
+
+def test_aggregate_features_match_data_processing():
+    """ Features table of a small experiment folder against the table data_processing.m gives for it
+
+    The expected table (data/aggregated_features.csv) applies the definitions of data_processing.m to the traces
+    of data/grouped_experiments: histcounts bins (packet on an inner edge, last bin including its right edge),
+    accumarray zero fill of the empty bin, std with N - 1, biased skewness and kurtosis (NaN for the single-packet
+    bin, whose row rmmissing removes) and MeanPower over the GPI window (samples after the last edge excluded).
+    """
+    table = aggregate_features(os.path.join(DATA_DIR, 'grouped_experiments'), BIN_SIZE)
+
+    compare_features(read_features_csv(os.path.join(DATA_DIR, 'aggregated_features.csv')), table, rtol=1e-12)
+
+
+def test_traffic_features_empty_trace():
+    empty = np.zeros(0, dtype=np.uint64)
+    features, edges = traffic_features(empty, empty, empty, empty.astype(np.uint32), BIN_SIZE)
+
+    assert all(len(features[name]) == 0 for name in FEATURE_NAMES)
+    assert len(edges) == 1
+
+
+def test_bin_features_match_naive_reference():
+    """ Features of the eBPF bin counters, the IAT variance being computed on floored us (as the kernel) """
+    trace = make_trace(seed=2)
+    for packets in naive_bins(trace, BIN_SIZE):
+        if not packets:
+            continue
+
+        per_cpu = []
+        for cpu in range(2):
+            subset = packets[cpu::2]
+            iat = [packet[1] for packet in subset]
+            length = [packet[2] for packet in subset]
+            per_cpu.append(SimpleNamespace(
+                tx_bytes=sum(packet[2] for packet in subset if packet[3] == 1),
+                rx_bytes=sum(packet[2] for packet in subset if packet[3] != 1),
+                tx_count=sum(1 for packet in subset if packet[3] == 1),
+                rx_count=sum(1 for packet in subset if packet[3] != 1),
+                iat_sum=sum(iat), iat_us_sum=sum(value // 1000 for value in iat),
+                iat_sq_sum=sum((value // 1000) ** 2 for value in iat),
+                iat_min=min(iat, default=0), iat_max=max(iat, default=0),
+                len_max=max(length, default=0), len_sq_sum=sum(value ** 2 for value in length),
+                len_cube_sum=sum(value ** 3 for value in length),
+                len_p4_lo=sum(value ** 4 for value in length) & (2 ** 64 - 1),
+                len_p4_hi=sum(value ** 4 for value in length) >> 64))
+
+        features = bin_features(merge_bin_stats(per_cpu), BIN_SIZE)
+        expected = naive_features(packets, BIN_SIZE)
+        expected['StdIAT'] = statistics.stdev(packet[1] // 1000 / 1e6 for packet in packets) if len(packets) > 1 else 0
+        expected['BurstinessIAT'] = expected['StdIAT'] / expected['MeanIAT'] if expected['MeanIAT'] != 0 else 0
+
+        for name in FEATURE_NAMES:
+            assert features[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-12, nan_ok=True), name
+
+
+def test_concat_features_removes_missing_rows():
+    tables = []
+    for i, rows in enumerate([3, 2]):
+        columns = {name: np.arange(rows, dtype=np.float64) + 10 * i for name in COLUMN_NAMES}
+        columns['ExperimentID'] = np.full(rows, i + 1.0)
+        tables.append(ColumnarTrace(columns, {'experiment': f'exp{i}'}))
+    tables[0]['MeanPower'][1] = np.nan
+    tables[1]['SkewPacketLength'][0] = np.nan
+
+    table = concat_features(tables)
+
+    np.testing.assert_array_equal(table['TXBytes'], [0, 2, 11])
+    np.testing.assert_array_equal(table['ExperimentID'], [1, 1, 2])
+    assert table.names == COLUMN_NAMES
+    assert table.meta['experiment_settings'] == ['exp0', 'exp1']
+
+
+def test_concat_features_no_table():
+    table = concat_features([])
+
+    assert len(table) == 0